@@ -0,0 +1,95 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Micro-benchmark comparing the buffered text read path of ``PkgAPI``/``DramAPI`` with the raw file descriptor read path
+(``Sensor(raw=True)``)
+
+usage::
+
+    python benchmarks/device_api_read.py [number_of_reads]
+
+On a machine without RAPL interface (or without the permission to read it), the two read paths are compared on
+temporary counter files.
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+import pyRAPL
+from pyRAPL.device_api import RawEnergyReader
+
+
+def bench(name, function, number):
+    duration = min(timeit.repeat(function, number=number, repeat=5))
+    print(f'{name:>12} : {duration / number * 1e9:10.1f} ns/read')
+
+
+def bench_sensor(number):
+    text_sensor = pyRAPL.Sensor(raw=False)
+    raw_sensor = pyRAPL.Sensor(raw=True)
+    bench('text', text_sensor.energy, number)
+    bench('raw', raw_sensor.energy, number)
+
+
+def bench_temporary_files(number, counter_number=4):
+    with tempfile.TemporaryDirectory() as directory:
+        file_names = []
+        for i in range(counter_number):
+            file_name = os.path.join(directory, f'energy_uj_{i}')
+            with open(file_name, 'w') as counter_file:
+                counter_file.write('262143328850\n')
+            file_names.append(file_name)
+
+        text_files = [open(file_name, 'r') for file_name in file_names]
+
+        def text_read():
+            result = [-1] * counter_number
+            for i, counter_file in enumerate(text_files):
+                counter_file.seek(0, 0)
+                result[i] = float(counter_file.readline())
+            return result
+
+        reader = RawEnergyReader(file_names, list(range(counter_number)))
+
+        def raw_read():
+            result = [-1] * counter_number
+            reader.read_into(result)
+            return result
+
+        bench('text', text_read, number)
+        bench('raw', raw_read, number)
+
+        reader.close()
+        for counter_file in text_files:
+            counter_file.close()
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    try:
+        bench_sensor(number)
+    except (pyRAPL.PyRAPLException, OSError):
+        print('no readable RAPL interface, compare read paths on temporary files')
+        bench_temporary_files(number)
+
+
+if __name__ == '__main__':
+    main()
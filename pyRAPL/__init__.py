@@ -20,11 +20,22 @@
 from pyRAPL.device import Device
 from pyRAPL.exception import PyRAPLException, PyRAPLCantInitDeviceAPI, PyRAPLBadSocketIdException
 from pyRAPL.exception import PyRAPLCantRecordEnergyConsumption
-from pyRAPL.device_api import DeviceAPI, PkgAPI, DramAPI, DeviceAPIFactory
-from pyRAPL.sensor import Sensor
-from pyRAPL.result import Result
+from pyRAPL.topology import Topology
+from pyRAPL.device_api import DeviceAPI, PkgAPI, DramAPI, CoreAPI, UncoreAPI, PsysAPI, RawEnergyReader
+from pyRAPL.device_api import MsrAPI, MsrPkgAPI, MsrDramAPI, MsrCoreAPI, MsrUncoreAPI, AmdEnergyAPI, AmdMsrAPI
+from pyRAPL.backend import Backend, BackendRegistry, BackendSelection, DeviceAPIFactory, REGISTRY
+from pyRAPL.perf_event import PerfEventAPI, PerfEventSyscalls
+from pyRAPL.sensor import Sensor, Snapshot
+from pyRAPL.result import Result, Summary
 from pyRAPL.pyRAPL import setup
+from pyRAPL.attribution import MarkerRecorder
+from pyRAPL.hierarchy import MeasurementTree, RegionNode, PathEnergy
+from pyRAPL.sampling import SamplingPolicy, OneInN, RandomSampling, TimeBudgetSampling, SampledCalls, EnergyEstimate
+from pyRAPL import calibration
 from pyRAPL.measurement import Measurement, measureit
+from pyRAPL.sampler import Sampler, RingBuffer
+from pyRAPL import aio, bench
+from pyRAPL.shm import SensorPublisher, SharedCounters, ShmAPI
 
 __version__ = "0.2.3.1"
 
@@ -0,0 +1,320 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+asyncio support : measurements, decorator and sampler that never block the event loop
+
+Sensor reads are offloaded to a dedicated thread (a single thread, the sensor is never read concurrently) and results
+are exported by a background writer task that calls the ``add`` method of the outputs in another thread::
+
+    pyRAPL.setup()
+
+    @pyRAPL.aio.measureit
+    async def handler(request):
+        ...
+
+    async def other_handler(request):
+        async with pyRAPL.aio.AsyncMeasurement('other'):
+            ...
+"""
+import asyncio
+import functools
+import logging
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from pyRAPL.attribution import MarkerRecorder
+from pyRAPL.measurement import Measurement
+from pyRAPL.outputs import Output
+from pyRAPL.sampler import Sampler
+from pyRAPL.sensor import Sensor, Snapshot
+
+_read_executor = None
+
+
+def _get_read_executor() -> ThreadPoolExecutor:
+    global _read_executor
+    if _read_executor is None:
+        _read_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pyRAPL-read')
+    return _read_executor
+
+
+async def read_sensor(sensor: Sensor) -> Snapshot:
+    """
+    Read a sensor in the read thread
+
+    :return: the snapshot of the sensor counters (see ``Sensor.snapshot``)
+    """
+    return await asyncio.get_running_loop().run_in_executor(_get_read_executor(), sensor.snapshot)
+
+
+class ExportWriter:
+    """
+    Background task exporting results to outputs
+
+    Results are queued without blocking, the writer task calls the ``add`` method of the outputs in a dedicated thread,
+    in the order of submission
+
+    :param max_size: maximum number of queued results (0 for no limit)
+    """
+
+    def __init__(self, max_size: int = 0):
+        self._queue = asyncio.Queue(max_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pyRAPL-writer')
+        self._task = None
+
+    def submit(self, output: Output, result):
+        """
+        Queue a result to be exported to an output, start the writer task if needed
+
+        :raise asyncio.QueueFull: if the queue is full
+        """
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._queue.put_nowait((output, result))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            output, result = await self._queue.get()
+            try:
+                await loop.run_in_executor(self._executor, output.add, result)
+            except Exception:
+                logging.exception('pyRAPL : can\'t export result %s', result)
+            finally:
+                self._queue.task_done()
+
+    async def flush(self):
+        """
+        Wait until all the queued results are exported
+        """
+        await self._queue.join()
+
+    async def close(self):
+        """
+        Export the queued results and stop the writer task
+        """
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=False)
+
+
+_writers = weakref.WeakKeyDictionary()
+
+
+def get_writer() -> ExportWriter:
+    """
+    :return: the export writer of the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _writers:
+        _writers[loop] = ExportWriter()
+    return _writers[loop]
+
+
+class AsyncMeasurement(Measurement):
+    """
+    Measurement used with ``async with`` in a coroutine
+
+    The sensor is read in the read thread (or directly in the event loop if ``offload`` is False, for sensors with a
+    low read latency) and the result is exported by the export writer of the event loop
+
+    :param label: measurement label
+    :param output: default output to export the recorded energy consumption. If None, the PrintOutput will be used
+    :param markers: if not None, only record a marker in this recorder (see ``Measurement``)
+    :param offload: if True, read the sensor in the read thread
+    :param sensor: sensor used to measure the energy consumption, if None, the sensor configured by ``pyRAPL.setup``
+                   is used
+    """
+
+    def __init__(self, label: str, output: Output = None, markers: MarkerRecorder = None, offload: bool = True,
+                 sensor: Sensor = None):
+        Measurement.__init__(self, label, output, markers, sensor)
+        self._offload = offload
+
+    async def abegin(self):
+        """
+        Start energy consumption recording without blocking the event loop
+        """
+        if self._markers is not None or not self._offload:
+            self.begin()
+            return
+        self._snapshot_begin = await read_sensor(self._sensor)
+        self._energy_begin = self._snapshot_begin.energy
+        self._ts_begin = self._snapshot_begin.timestamp
+
+    async def aend(self, number: int = 1):
+        """
+        End energy consumption recording without blocking the event loop
+
+        :param number: in marker mode, number of runs of the measured code between ``abegin`` and ``aend``
+        """
+        if self._markers is not None or not self._offload:
+            self.end(number)
+            return
+        self._compute_result(await read_sensor(self._sensor))
+
+    def aexport(self, output: Output = None):
+        """
+        Queue the result to be exported by the export writer of the event loop
+
+        :param output: output that will handle the measure, if None, the default output will be used
+        """
+        if self._markers is not None:
+            return
+        get_writer().submit(output if output is not None else self._output, self._results)
+
+    async def __aenter__(self):
+        await self.abegin()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aend()
+        if exc_type is None:
+            self.aexport()
+
+
+def measureit(_func=None, *, output: Output = None, number: int = 1, markers: MarkerRecorder = None,
+              offload: bool = True, sensor: Sensor = None):
+    """
+    Measure the energy consumption of monitored devices during the execution of the decorated coroutine function (see
+    ``pyRAPL.measureit``)
+
+    :param output: output instance that will receive the power consummation data
+    :param number: number of awaits of the coroutine function in the loop
+    :param markers: if not None, only record a marker for each call of the decorated function in this recorder
+    :param offload: if True, read the sensor in the read thread
+    :param sensor: sensor used to measure the energy consumption, if None, the sensor configured by ``pyRAPL.setup``
+                   is used
+    """
+
+    def decorator_measure_energy(func):
+        @functools.wraps(func)
+        async def wrapper_measure(*args, **kwargs):
+            measure = AsyncMeasurement(func.__name__, output, markers, offload, sensor)
+            await measure.abegin()
+            for _ in range(number):
+                val = await func(*args, **kwargs)
+            await measure.aend(number)
+            if markers is not None:
+                return val
+            measure._results = measure._results / number
+            measure.aexport()
+            return val
+        return wrapper_measure
+
+    if _func is None:
+        return decorator_measure_energy
+    return decorator_measure_energy(_func)
+
+
+class AsyncSampler(Sampler):
+    """
+    Sampler driven by an asyncio task instead of a thread
+
+    Sampling instants are scheduled with ``asyncio.sleep``, the sampling frequency is limited by the event loop latency
+    (about 1 kHz at best). Use it with ``async with`` or with ``start`` and ``await astop()``
+
+    The sensor isn't read by the constructor : the ring buffer (``buffer``) is created by the sampling task, before its
+    first sample, with a first read done in the read thread (or in the event loop if ``offload`` is False)
+
+    :param frequency: number of samples per second
+    :param capacity: number of samples stored in the ring buffer, if None, the buffer stores 10 seconds of samples
+    :param sensor: sensor to sample, if None, the sensor configured by ``pyRAPL.setup`` is used
+    :param offload: if True, read the sensor in the read thread
+    """
+
+    def __init__(self, frequency: float = 100, capacity: Optional[int] = None, sensor: Optional[Sensor] = None,
+                 offload: bool = True):
+        Sampler.__init__(self, frequency, capacity, sensor)
+        self._offload = offload
+        self._task = None
+
+    def _create_buffer(self):
+        # created by the sampling task, the constructor may run on the event loop
+        return None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """
+        Start the sampling task on the running event loop
+        """
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run_async())
+
+    def stop(self):
+        raise RuntimeError('use "await astop()" to stop an AsyncSampler')
+
+    async def astop(self):
+        """
+        Stop the sampling task
+
+        :raise Exception: the exception that stopped the sampling task, if any
+        """
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        if not task.done():
+            task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.astop()
+
+    async def _run_async(self):
+        loop = asyncio.get_running_loop()
+        if self.buffer is None:
+            if self._offload:
+                self.buffer = await loop.run_in_executor(_get_read_executor(), Sampler._create_buffer, self)
+            else:
+                self.buffer = Sampler._create_buffer(self)
+        deadline = time.monotonic_ns()
+        while True:
+            if self._offload:
+                await loop.run_in_executor(_get_read_executor(), self.sample)
+            else:
+                self.sample()
+            deadline += self._period
+            now = time.monotonic_ns()
+            if now >= deadline:
+                missed = (now - deadline) // self._period
+                self.missed_samples += missed
+                deadline += missed * self._period
+                await asyncio.sleep(0)
+                continue
+            await asyncio.sleep((deadline - now) / 1000000000)
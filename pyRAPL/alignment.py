@@ -0,0 +1,88 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Alignment of short measures on the updates of the RAPL counters
+
+The RAPL counters are only updated about once per millisecond, so a measure whose boundaries fall anywhere between two
+updates can be off by a whole update interval. An aligned measure waits for a counter update at its beginning (the
+measure begins exactly on an update) and at its end (the energy between the two updates is exact), and scales the
+energy consumption to the part of this period covered by the measure
+
+The counters of the different devices and sockets are not updated at the same time : each counter is waited for and
+scaled with its own update times
+"""
+from time import perf_counter_ns
+from typing import List, Tuple
+
+from pyRAPL.sensor import Sensor, SubstractableList
+
+#: default maximum busy-wait time at each boundary of an aligned measure (in micro seconds), two update intervals
+MAX_SPIN = 2000
+
+
+def wait_update(sensor: Sensor, max_spin: float = MAX_SPIN) -> Tuple[SubstractableList, List[int], int, bool]:
+    """
+    Read the sensor in a busy loop until each of its monitored counters is updated
+
+    :param sensor: sensor to read
+    :param max_spin: maximum busy-wait time (in micro seconds)
+    :return: the value of each counter just after its update, the time of the update of each counter
+             (``time.perf_counter_ns``, middle of the two reads around the update), the busy-wait time (in nano
+             seconds) and False if some counters weren't updated during ``max_spin`` (their returned values and
+             update times are then the ones of the last read)
+    """
+    start = perf_counter_ns()
+    deadline = start + int(max_spin * 1000)
+    first = sensor.energy()
+    before = perf_counter_ns()
+    values = SubstractableList(first, first.max_energy_ranges)
+    updates = [None] * len(first)
+    # unmonitored counters (-1) are never updated
+    waited = sum(1 for value in first if value >= 0)
+    while True:
+        energy = sensor.energy()
+        after = perf_counter_ns()
+        for i, value in enumerate(energy):
+            if updates[i] is None and value != first[i]:
+                values[i] = value
+                updates[i] = (before + after) // 2
+                waited -= 1
+        if waited <= 0:
+            return values, [after if update is None else update for update in updates], after - start, True
+        if after >= deadline:
+            for i, update in enumerate(updates):
+                if update is None:
+                    values[i] = energy[i]
+            return values, [after if update is None else update for update in updates], after - start, False
+        before = after
+
+
+def scale_energy(energy: List[float], covered: int, periods: List[int]) -> List[float]:
+    """
+    Scale the energy consumed by each counter between two of its updates to the part of this period covered by a
+    measure, assuming a constant power
+
+    :param energy: energy consumed by each counter between its two updates, in the sensor layout
+    :param covered: duration of the measure (in nano seconds)
+    :param periods: time between the two updates of each counter (in nano seconds)
+    :return: the energy consumed during the measure (-1 values are left unchanged)
+    """
+    return [-1 if value < 0 else value * min(covered / period, 1) if period > 0 else value
+            for value, period in zip(energy, periods)]
@@ -0,0 +1,203 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Attribution of the energy consumption of the machine to cgroups (containers, systemd services, ...)
+
+The CPU usage of each cgroup is read from the ``cpu.stat`` file of the cgroup (cgroup v2) and the CPU usage of the
+machine from ``/proc/stat``. The energy consumed by each device on each socket is split between the cgroups
+proportionally to their share of the machine CPU usage, the remaining energy (other processes, idle) is attributed to
+the label None::
+
+    attribution = CgroupAttribution(['system.slice/docker-1234.scope', 'system.slice/docker-5678.scope'])
+    for results in attribution.stream(interval=1):
+        output.add(...)
+
+The given cgroups must not be nested, otherwise the CPU usage of a child cgroup is counted twice.
+"""
+import os
+import time
+from typing import Dict, Iterator, List, Optional
+
+import pyRAPL
+from pyRAPL import Result
+from pyRAPL.attribution.split import split_energy, build_result
+from pyRAPL.sensor import Sensor
+
+CGROUP_DIRECTORY = '/sys/fs/cgroup'
+PROC_STAT_FILE_NAME = '/proc/stat'
+
+#: size of the buffer used to read a cpu.stat file
+READ_SIZE = 4096
+
+#: index of the busy time fields (user, nice, system, irq, softirq, steal) in the cpu line of /proc/stat
+BUSY_FIELDS = (1, 2, 3, 6, 7, 8)
+
+
+def read_machine_usage() -> float:
+    """
+    :return: CPU time (in micro seconds) used by all the cpus of the machine since the boot, without idle and iowait
+             time
+    """
+    with open(PROC_STAT_FILE_NAME, 'r') as stat_file:
+        fields = stat_file.readline().split()
+    return sum(int(fields[i]) for i in BUSY_FIELDS if i < len(fields)) * 1000000 / os.sysconf('SC_CLK_TCK')
+
+
+def parse_usage_usec(content: bytes) -> int:
+    """
+    :param content: content of a cgroup v2 ``cpu.stat`` file
+    :return: CPU time (in micro seconds) used by the cgroup
+    """
+    for line in content.split(b'\n'):
+        if line.startswith(b'usage_usec '):
+            return int(line[11:])
+    raise ValueError('no usage_usec in cpu.stat')
+
+
+class CgroupAttribution:
+    """
+    Split the energy consumption of the machine between cgroups proportionally to their CPU usage
+
+    The ``cpu.stat`` file of each cgroup is opened once, each collect reads all the files in a single pass (one seek
+    and one read by cgroup)
+
+    :param cgroups: path of the cgroups, relative to the cgroup file system root (or absolute)
+    :param sensor: sensor used to measure the energy consumption, if None, the sensor configured by ``pyRAPL.setup``
+                   is used
+    """
+
+    def __init__(self, cgroups: List[str], sensor: Optional[Sensor] = None):
+        self._sensor = sensor if sensor is not None else pyRAPL._sensor
+        self._fds = {}
+        self._usages = {}
+        for cgroup in cgroups:
+            self.add_cgroup(cgroup)
+        self._ts_begin = time.time_ns()
+        self._monotonic_begin = time.monotonic_ns()
+        self._machine_usage = read_machine_usage()
+        self._energy_begin = self._sensor.energy()
+
+    @staticmethod
+    def _stat_file_name(cgroup: str) -> str:
+        directory_name = cgroup if cgroup.startswith('/') else CGROUP_DIRECTORY + '/' + cgroup
+        return directory_name.rstrip('/') + '/cpu.stat'
+
+    @property
+    def cgroups(self) -> List[str]:
+        """
+        monitored cgroups
+        """
+        return list(self._fds.keys())
+
+    def add_cgroup(self, cgroup: str):
+        """
+        Monitor a new cgroup, its CPU usage is counted from now
+
+        :raise OSError: if the cpu.stat file of the cgroup can't be read
+        """
+        if cgroup in self._fds:
+            return
+        fd = os.open(self._stat_file_name(cgroup), os.O_RDONLY)
+        self._fds[cgroup] = fd
+        self._usages[cgroup] = self._read_usage(fd)
+
+    def remove_cgroup(self, cgroup: str):
+        """
+        Stop monitoring a cgroup
+        """
+        fd = self._fds.pop(cgroup, None)
+        self._usages.pop(cgroup, None)
+        if fd is not None:
+            os.close(fd)
+
+    @staticmethod
+    def _read_usage(fd: int) -> int:
+        os.lseek(fd, 0, os.SEEK_SET)
+        return parse_usage_usec(os.read(fd, READ_SIZE))
+
+    def _read_usages(self) -> Dict[str, int]:
+        usages = {}
+        for cgroup, fd in list(self._fds.items()):
+            try:
+                usages[cgroup] = self._read_usage(fd)
+            except OSError:
+                # the cgroup was removed
+                self.remove_cgroup(cgroup)
+        return usages
+
+    def collect(self) -> List[Result]:
+        """
+        Measure the energy consumed since the last collect (or the creation of the engine) and split it between the
+        cgroups
+
+        :return: a Result for each cgroup that used CPU time (labeled with the cgroup path) and a Result labeled None
+                 for the energy consumed by the rest of the machine. The energy of the results sum to the measured
+                 energy
+        """
+        energy_end = self._sensor.energy()
+        usages = self._read_usages()
+        machine_usage = read_machine_usage()
+        ts_end = time.time_ns()
+        monotonic_end = time.monotonic_ns()
+
+        delta = self._sensor.per_device(energy_end - self._energy_begin)
+        weights = {cgroup: usage - self._usages.get(cgroup, usage) for cgroup, usage in usages.items()}
+        machine_delta = machine_usage - self._machine_usage
+        weights[None] = max(machine_delta - sum(weights.values()), 0)
+        if sum(weights.values()) <= 0:
+            # no CPU usage measured, the energy is attributed to the rest of the machine
+            weights[None] = 1
+
+        timestamp = self._ts_begin / 1000000000
+        duration = (monotonic_end - self._monotonic_begin) / 1000
+        self._ts_begin = ts_end
+        self._monotonic_begin = monotonic_end
+        self._usages = usages
+        self._machine_usage = machine_usage
+        self._energy_begin = energy_end
+
+        parts = split_energy(delta, weights)
+        return [build_result(cgroup, timestamp, duration, parts[cgroup]) for cgroup in parts]
+
+    def stream(self, interval: float) -> Iterator[List[Result]]:
+        """
+        Collect the energy consumption of the cgroups periodically
+
+        :param interval: time between two collects (in seconds)
+        :return: an iterator over the results of each collect
+        """
+        period = int(interval * 1000000000)
+        deadline = time.monotonic_ns()
+        while True:
+            deadline += period
+            now = time.monotonic_ns()
+            if deadline > now:
+                time.sleep((deadline - now) / 1000000000)
+            else:
+                # late : skip the missed collects
+                deadline = now
+            yield self.collect()
+
+    def close(self):
+        """
+        Close the cpu.stat files of the cgroups
+        """
+        for cgroup in self.cgroups:
+            self.remove_cgroup(cgroup)
@@ -0,0 +1,197 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Marker mode : ``Measurement`` and ``measureit`` only record timestamp markers, the energy consumption of each marker
+is computed after the measure from the timeline recorded by a ``Sampler``::
+
+    markers = pyRAPL.MarkerRecorder()
+    with pyRAPL.Sampler(frequency=1000) as sampler:
+        for request in requests:
+            with pyRAPL.Measurement('request', markers=markers):
+                handle(request)
+    results = markers.attribute(sampler)
+
+The energy consumed at the beginning and at the end of a marker is linearly interpolated between the two surrounding
+samples.
+"""
+import threading
+import time
+from bisect import bisect_right
+from typing import List, Tuple
+
+from pyRAPL.result import Result, DEVICE_FIELDS
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#: a marker : (label, start (monotonic time in ns), end (monotonic time in ns), number of runs of the measured code)
+Marker = Tuple[str, int, int, int]
+
+
+class MarkerRecorder:
+    """
+    Record markers in per-thread buffers
+
+    Recording a marker only appends a tuple to the buffer of the current thread (no lock, no sensor read). Buffers are
+    drained by ``drain`` or ``attribute``
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._buffers = []
+        self._buffers_lock = threading.Lock()
+        self._pending = []
+        #: number of markers that were dropped because they started before the first available sample
+        self.dropped = 0
+        # offset between the monotonic clock and the epoch clock, used to compute the timestamp of the results
+        self._epoch_offset = time.time_ns() - time.monotonic_ns()
+
+    def _thread_buffer(self) -> list:
+        buffer = []
+        self._local.buffer = buffer
+        with self._buffers_lock:
+            self._buffers.append(buffer)
+        return buffer
+
+    def record(self, label: str, start: int, end: int, number: int = 1):
+        """
+        Record a marker in the buffer of the current thread
+
+        :param label: label of the marker
+        :param start: beginning of the marker (``time.monotonic_ns``)
+        :param end: end of the marker (``time.monotonic_ns``)
+        :param number: number of runs of the measured code during the marker, the attributed energy is divided by this
+                       number
+        """
+        try:
+            buffer = self._local.buffer
+        except AttributeError:
+            buffer = self._thread_buffer()
+        buffer.append((label, start, end, number))
+
+    def drain(self) -> List[Marker]:
+        """
+        Remove the recorded markers from the buffers of all the threads
+
+        :return: the removed markers, sorted by beginning
+        """
+        with self._buffers_lock:
+            buffers = list(self._buffers)
+        markers = self._pending
+        self._pending = []
+        for buffer in buffers:
+            # markers appended by the owner thread between the copy and the deletion are kept in the buffer
+            recorded = buffer[:]
+            del buffer[:len(recorded)]
+            markers.extend(recorded)
+        markers.sort(key=lambda marker: marker[1])
+        return markers
+
+    def attribute(self, sampler) -> List[Result]:
+        """
+        Drain the recorded markers and compute their energy consumption from the samples of a sampler
+
+        Markers that end after the last sample are kept for the next call. Markers that begin before the first sample
+        of the sampler buffer are dropped (and counted in ``dropped``)
+
+        :param sampler: Sampler that recorded the energy consumption during the markers
+        :return: a Result for each attributed marker (sorted by beginning)
+        """
+        markers = self.drain()
+        # the sampler thread may append samples during the attribution
+        timestamps, values = sampler.buffer.copy()
+        if len(timestamps) < 2:
+            self._pending = markers
+            return []
+        first, last = timestamps[0], timestamps[-1]
+
+        attributed = []
+        for marker in markers:
+            if marker[1] < first:
+                self.dropped += 1
+            elif marker[2] > last:
+                self._pending.append(marker)
+            else:
+                attributed.append(marker)
+        if not attributed:
+            return []
+
+        instants = [marker[1] for marker in attributed] + [marker[2] for marker in attributed]
+        energy = interpolate_energy(timestamps, values, sampler.buffer.width, instants)
+        return self._build_results(attributed, energy, sampler.sensor)
+
+    def _build_results(self, markers: List[Marker], energy, sensor) -> List[Result]:
+        n = len(markers)
+        width = len(energy[0]) if n else 0
+        devices = list(sensor.per_device(range(width)).items())
+        if numpy is not None:
+            energy = numpy.asarray(energy)
+            deltas = energy[n:] - energy[:n]
+            deltas[energy[:n] < 0] = -1
+            deltas = deltas.tolist()
+        else:
+            deltas = [[end - begin if begin >= 0 else -1 for begin, end in zip(energy[i], energy[n + i])]
+                      for i in range(n)]
+
+        results = []
+        for (label, start, end, number), delta in zip(markers, deltas):
+            values = {}
+            for device, columns in devices:
+                device_values = [delta[column] / number if delta[column] >= 0 else -1 for column in columns]
+                values[DEVICE_FIELDS[device]] = device_values if max(device_values) >= 0 else None
+            results.append(Result(label, (start + self._epoch_offset) / 1000000000, (end - start) / 1000 / number,
+                                  **values))
+        return results
+
+
+def interpolate_energy(timestamps, values, width: int, instants: List[int]):
+    """
+    Compute the energy consumed at given instants by linear interpolation of samples
+
+    :param timestamps: sorted timestamps of the samples
+    :param values: flat sequence of the sample values (``width`` values by sample)
+    :param width: number of values of a sample
+    :param instants: instants to compute, between the first and the last timestamp
+    :return: for each instant, the interpolated value of each column (-1 for the columns containing negative values).
+             A 2D NumPy array if NumPy is installed, a list of lists otherwise
+    """
+    if numpy is not None:
+        timestamps = numpy.asarray(timestamps)
+        values = numpy.asarray(values).reshape(-1, width)
+        instants = numpy.asarray(instants, dtype=numpy.int64)
+        indexes = numpy.clip(numpy.searchsorted(timestamps, instants, side='right'), 1, len(timestamps) - 1)
+        before = timestamps[indexes - 1]
+        ratios = ((instants - before) / (timestamps[indexes] - before))[:, None]
+        result = values[indexes - 1] + ratios * (values[indexes] - values[indexes - 1])
+        return numpy.where(values[indexes] < 0, -1, result)
+
+    result = []
+    last_index = len(timestamps) - 1
+    for instant in instants:
+        index = min(max(bisect_right(timestamps, instant), 1), last_index)
+        before, after = timestamps[index - 1], timestamps[index]
+        ratio = (instant - before) / (after - before)
+        begin = (index - 1) * width
+        end = index * width
+        result.append([values[begin + j] + ratio * (values[end + j] - values[begin + j])
+                       if values[end + j] >= 0 else -1 for j in range(width)])
+    return result
@@ -0,0 +1,80 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Proportional split of an energy consumption between consumers (tasks, threads, cgroups, ...)
+"""
+from typing import Dict, Hashable, List, Optional
+
+from pyRAPL import Device, Result
+from pyRAPL.result import DEVICE_FIELDS
+
+
+def split_energy(energy: Dict[Device, List[float]],
+                 weights: Dict[Hashable, float]) -> Dict[Hashable, Dict[Device, List[float]]]:
+    """
+    Split the energy consumption of each device of each socket between consumers, proportionally to their weight
+
+    The parts of a value always sum to the value (the rounding error is given to the last consumer). Negative values
+    (unmonitored sockets) are not split, all the consumers get -1
+
+    :param energy: energy consumption of each device on each socket
+    :param weights: weight of each consumer (CPU time for example)
+    :return: energy consumption of each device on each socket for each consumer with a positive weight. An empty
+             dictionary if no consumer has a positive weight
+    """
+    weights = {key: weight for key, weight in weights.items() if weight > 0}
+    total_weight = sum(weights.values())
+    if total_weight <= 0:
+        return {}
+
+    keys = list(weights.keys())
+    shares = [weights[key] / total_weight for key in keys]
+    parts = {key: {} for key in keys}
+    for device, values in energy.items():
+        for key in keys:
+            parts[key][device] = []
+        for value in values:
+            if value < 0:
+                for key in keys:
+                    parts[key][device].append(-1)
+                continue
+            remainder = value
+            for key, share in zip(keys[:-1], shares[:-1]):
+                part = value * share
+                parts[key][device].append(part)
+                remainder -= part
+            parts[keys[-1]][device].append(max(remainder, 0))
+    return parts
+
+
+def build_result(label: str, timestamp: float, duration: float,
+                 energy: Optional[Dict[Device, List[float]]]) -> Result:
+    """
+    :param label: result label
+    :param timestamp: beginning of the measure (in seconds since the epoch)
+    :param duration: duration of the measure (in micro seconds)
+    :param energy: energy consumption of each device on each socket, devices whose values are all negative are not
+                   recorded
+    :return: the corresponding Result
+    """
+    fields = {}
+    for device, values in (energy or {}).items():
+        fields[DEVICE_FIELDS[device]] = values if max(values, default=-1) >= 0 else None
+    return Result(label, timestamp, duration, **fields)
@@ -0,0 +1,208 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Attribution of the energy consumption of an event loop to the labels of its asyncio tasks
+
+The label of a task is stored in a context variable (``TaskAttribution.label``), it is inherited by the tasks created
+by the task. The attribution engine wraps the coroutine of every task created on the event loop to measure the CPU
+time of each step of the task and accumulates it on the current label. The energy consumed between two collects is
+split between the labels proportionally to their CPU time::
+
+    attribution = TaskAttribution()
+    attribution.install()          # in a coroutine, before creating the tasks
+
+    async def handle(request):
+        with attribution.label('request ' + str(request.id)):
+            ...
+
+    ...
+    results = attribution.collect()  # one Result by label
+
+The CPU time of the process that wasn't spent in a task step (other threads, code outside of the tasks, ...) is
+attributed to the label None, so the energy of the results always sum to the measured energy.
+"""
+import asyncio
+import collections.abc
+import contextlib
+import contextvars
+import time
+from typing import Callable, Dict, Hashable, List, Optional
+
+import pyRAPL
+from pyRAPL import Result
+from pyRAPL.attribution.split import split_energy, build_result
+from pyRAPL.sensor import Sensor
+
+#: label of the current task
+CURRENT_LABEL = contextvars.ContextVar('pyRAPL_task_label', default=None)
+
+
+class _MeasuredCoroutine(collections.abc.Coroutine):
+    """
+    Coroutine wrapper measuring the CPU time of each step of the wrapped coroutine
+    """
+
+    def __init__(self, coro, attribution: 'TaskAttribution'):
+        self._coro = coro
+        self._attribution = attribution
+
+    def send(self, value):
+        self._attribution._step_begin()
+        try:
+            return self._coro.send(value)
+        finally:
+            self._attribution._step_end()
+
+    def throw(self, typ, val=None, tb=None):
+        self._attribution._step_begin()
+        try:
+            if val is None and tb is None:
+                return self._coro.throw(typ)
+            return self._coro.throw(typ, val, tb)
+        finally:
+            self._attribution._step_end()
+
+    def close(self):
+        return self._coro.close()
+
+    def __await__(self):
+        return self._coro.__await__()
+
+    def __getattr__(self, name):
+        # cr_code, cr_frame, __name__, ... used by asyncio to display tasks
+        return getattr(self._coro, name)
+
+
+class TaskAttribution:
+    """
+    Split the energy consumption of the machine between the labels of the asyncio tasks of an event loop
+
+    :param sensor: sensor used to measure the energy consumption, if None, the sensor configured by ``pyRAPL.setup``
+                   is used
+    :param clock: clock used to measure the CPU time of the task steps (in nano seconds). ``time.thread_time_ns`` by
+                  default, ``time.perf_counter_ns`` is cheaper but counts the time spent in blocking calls
+    """
+
+    def __init__(self, sensor: Optional[Sensor] = None, clock: Callable[[], int] = time.thread_time_ns):
+        self._sensor = sensor if sensor is not None else pyRAPL._sensor
+        self._clock = clock
+        self._loop = None
+        self._previous_factory = None
+        self._cpu_times = {}
+        self._step_start = None
+        self._step_label = None
+        self._window_start()
+
+    def _window_start(self):
+        self._ts_begin = time.time_ns()
+        self._monotonic_begin = time.monotonic_ns()
+        self._process_time_begin = time.process_time_ns()
+        self._energy_begin = self._sensor.energy()
+        self._cpu_times = {}
+
+    @property
+    def cpu_times(self) -> Dict[Hashable, int]:
+        """
+        CPU time (in nano seconds) accumulated by each label since the last collect
+        """
+        return dict(self._cpu_times)
+
+    def install(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """
+        Install the task factory of the attribution engine on an event loop. Only the tasks created after the
+        installation are measured
+
+        :param loop: event loop, if None, the running event loop
+        """
+        self._loop = loop if loop is not None else asyncio.get_running_loop()
+        self._previous_factory = self._loop.get_task_factory()
+        self._loop.set_task_factory(self._task_factory)
+
+    def uninstall(self):
+        """
+        Restore the previous task factory of the event loop
+        """
+        if self._loop is not None:
+            self._loop.set_task_factory(self._previous_factory)
+            self._loop = None
+
+    def _task_factory(self, loop, coro, **kwargs):
+        coro = _MeasuredCoroutine(coro, self)
+        if self._previous_factory is not None:
+            return self._previous_factory(loop, coro, **kwargs)
+        return asyncio.Task(coro, loop=loop, **kwargs)
+
+    def _step_begin(self):
+        self._step_start = self._clock()
+        self._step_label = CURRENT_LABEL.get()
+
+    def _step_end(self):
+        self._account(self._clock())
+        self._step_start = None
+
+    def _account(self, now: int):
+        if self._step_start is None:
+            return
+        label = self._step_label
+        self._cpu_times[label] = self._cpu_times.get(label, 0) + now - self._step_start
+
+    @contextlib.contextmanager
+    def label(self, label: Hashable):
+        """
+        Set the label of the current task (and of the tasks it creates) in a with block
+        """
+        self._switch_label(label)
+        token = CURRENT_LABEL.set(label)
+        try:
+            yield
+        finally:
+            self._switch_label(token.old_value if token.old_value is not contextvars.Token.MISSING else None)
+            CURRENT_LABEL.reset(token)
+
+    def _switch_label(self, label: Hashable):
+        # the CPU time of the current step before the label change is accounted to the previous label
+        if self._step_start is None:
+            return
+        now = self._clock()
+        self._account(now)
+        self._step_start = now
+        self._step_label = label
+
+    def collect(self) -> List[Result]:
+        """
+        Measure the energy consumed since the last collect (or the creation of the engine) and split it between the
+        labels proportionally to their CPU time
+
+        :return: a Result for each label that used CPU time (the label None contains the CPU time of the process spent
+                 outside of the measured tasks)
+        """
+        monotonic_end = time.monotonic_ns()
+        process_time = time.process_time_ns() - self._process_time_begin
+        energy_end = self._sensor.energy()
+        delta = self._sensor.per_device(energy_end - self._energy_begin)
+        cpu_times = self._cpu_times
+        ts_begin = self._ts_begin
+        monotonic_begin = self._monotonic_begin
+        self._window_start()
+
+        cpu_times[None] = cpu_times.get(None, 0) + max(process_time - sum(cpu_times.values()), 0)
+        duration = (monotonic_end - monotonic_begin) / 1000
+        parts = split_energy(delta, cpu_times)
+        return [build_result(label, ts_begin / 1000000000, duration, parts[label]) for label in parts]
@@ -0,0 +1,198 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Attribution of the energy consumption of a process to its threads and to labels
+
+The CPU time of all the threads of the process is read in one pass over ``/proc/<pid>/task`` (``schedstat`` files, in
+nano seconds, or ``stat`` files, in clock ticks, if schedstat isn't available). The CPU time of the labels is measured
+with the CPU clock of the threads that set them::
+
+    attribution = ThreadAttribution()
+
+    def worker(job):
+        with attribution.label(job.name):
+            ...
+
+    ...
+    thread_results, label_results = attribution.collect()
+"""
+import contextlib
+import os
+import threading
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import pyRAPL
+from pyRAPL import Result
+from pyRAPL.attribution.split import split_energy, build_result
+from pyRAPL.sensor import Sensor
+
+PROC_DIRECTORY = '/proc'
+
+#: size of the buffer used to read a stat or schedstat file
+READ_SIZE = 1024
+
+
+def _read_file(file_name: str) -> bytes:
+    fd = os.open(file_name, os.O_RDONLY)
+    try:
+        return os.read(fd, READ_SIZE)
+    finally:
+        os.close(fd)
+
+
+def parse_stat_cpu_time(content: bytes, clock_ticks: int) -> int:
+    """
+    :param content: content of a ``/proc/<pid>/task/<tid>/stat`` file
+    :param clock_ticks: number of clock ticks per second
+    :return: CPU time (user and system) of the task in nano seconds
+    """
+    # the command name can contain spaces and parenthesis, the following fields begin after the last parenthesis
+    fields = content[content.rindex(b')') + 2:].split()
+    # utime and stime are the fields 14 and 15 of the file, the state (field 3) is the first field after the name
+    return (int(fields[11]) + int(fields[12])) * 1000000000 // clock_ticks
+
+
+def read_task_cpu_times(pid='self') -> Dict[int, int]:
+    """
+    Read the CPU time of all the threads of a process
+
+    :param pid: process id, the current process by default
+    :return: CPU time (in nano seconds) of each thread, indexed by thread id. Threads that exit during the read are
+             ignored
+    """
+    task_directory = PROC_DIRECTORY + '/' + str(pid) + '/task/'
+    cpu_times = {}
+    clock_ticks = None
+    for tid in os.listdir(task_directory):
+        try:
+            try:
+                cpu_times[int(tid)] = int(_read_file(task_directory + tid + '/schedstat').split()[0])
+            except FileNotFoundError:
+                if not os.path.exists(task_directory + tid):
+                    raise
+                if clock_ticks is None:
+                    clock_ticks = os.sysconf('SC_CLK_TCK')
+                cpu_times[int(tid)] = parse_stat_cpu_time(_read_file(task_directory + tid + '/stat'), clock_ticks)
+        except (FileNotFoundError, ProcessLookupError):
+            # the thread exited
+            continue
+    return cpu_times
+
+
+def _thread_names() -> Dict[int, str]:
+    return {thread.native_id: thread.name for thread in threading.enumerate()
+            if getattr(thread, 'native_id', None) is not None}
+
+
+class ThreadAttribution:
+    """
+    Split the energy consumption of the machine between the threads of a process and between labels, proportionally to
+    their CPU time
+
+    :param sensor: sensor used to measure the energy consumption, if None, the sensor configured by ``pyRAPL.setup``
+                   is used
+    :param pid: process whose threads are measured, the current process by default
+    """
+
+    def __init__(self, sensor: Optional[Sensor] = None, pid='self'):
+        self._sensor = sensor if sensor is not None else pyRAPL._sensor
+        self._pid = pid
+        self._label_lock = threading.Lock()
+        self._label_times = {}
+        # label, thread CPU clock and CPU time at the last collect (or at the label start) of each open label block
+        self._open_labels = {}
+        self._window_start()
+
+    def _window_start(self):
+        self._ts_begin = time.time_ns()
+        self._monotonic_begin = time.monotonic_ns()
+        self._task_times_begin = read_task_cpu_times(self._pid)
+        self._energy_begin = self._sensor.energy()
+
+    @contextlib.contextmanager
+    def label(self, label: Hashable):
+        """
+        Accumulate the CPU time used by the current thread in a with block on a label
+
+        The CPU time of a block that is still running during a collect is split : the part used before the collect is
+        attributed by this collect, the remaining part by the following ones
+        """
+        clock_id = time.pthread_getcpuclockid(threading.get_ident())
+        block = [label, clock_id, time.clock_gettime_ns(clock_id)]
+        with self._label_lock:
+            self._open_labels[id(block)] = block
+        try:
+            yield
+        finally:
+            with self._label_lock:
+                del self._open_labels[id(block)]
+                self._add_label_time(block)
+
+    def _add_label_time(self, block: list):
+        # add the CPU time used by an open label block since its last accounting, must be called with the label lock
+        label, clock_id, begin = block
+        end = time.clock_gettime_ns(clock_id)
+        self._label_times[label] = self._label_times.get(label, 0) + end - begin
+        block[2] = end
+
+    def collect(self) -> Tuple[List[Result], List[Result]]:
+        """
+        Measure the energy consumed since the last collect (or the creation of the engine) and split it between the
+        threads and between the labels
+
+        The CPU time of a thread created after the last collect is counted from its creation. Threads that exited
+        since the last collect are not measured. Label blocks that are still open are counted up to the collect
+
+        :return: a tuple containing a Result for each thread that used CPU time (labeled with the thread name, or its
+                 id if it isn't a Python thread) and a Result for each label (the label None contains the CPU time of
+                 the threads spent outside of the labels). The energy of the results of each list sum to the measured
+                 energy
+        """
+        energy_end = self._sensor.energy()
+        task_times_end = read_task_cpu_times(self._pid)
+        ts_end = time.time_ns()
+        monotonic_end = time.monotonic_ns()
+        delta = self._sensor.per_device(energy_end - self._energy_begin)
+        with self._label_lock:
+            for block in self._open_labels.values():
+                self._add_label_time(block)
+            label_times, self._label_times = self._label_times, {}
+        task_times_begin = self._task_times_begin
+        ts_begin = self._ts_begin
+        monotonic_begin = self._monotonic_begin
+        self._ts_begin = ts_end
+        self._monotonic_begin = monotonic_end
+        self._task_times_begin = task_times_end
+        self._energy_begin = energy_end
+
+        names = _thread_names()
+        thread_times = {}
+        for tid, cpu_time in task_times_end.items():
+            name = names.get(tid, str(tid))
+            thread_times[name] = thread_times.get(name, 0) + cpu_time - task_times_begin.get(tid, 0)
+        label_times[None] = label_times.get(None, 0) + max(sum(thread_times.values()) - sum(label_times.values()), 0)
+
+        timestamp = ts_begin / 1000000000
+        duration = (monotonic_end - monotonic_begin) / 1000
+        thread_parts = split_energy(delta, thread_times)
+        label_parts = split_energy(delta, label_times)
+        return ([build_result(name, timestamp, duration, thread_parts[name]) for name in thread_parts],
+                [build_result(label, timestamp, duration, label_parts[label]) for label in label_parts])
@@ -0,0 +1,254 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Registry of the backends (interfaces used to read the energy consumption) known by pyRAPL
+
+Each backend declares the devices it can read and an estimated cost of a read. When no backend is given, the registry
+probes the backends that support a device from the cheapest to the most expensive one and use the first one that
+works. The ``PYRAPL_BACKEND`` environment variable gives the backend used when no backend is given (ex:
+``PYRAPL_BACKEND=powercap`` to always read the powercap files, as pyRAPL did before the registry existed).
+
+Third party packages can register their own backends with a ``pyRAPL.backends`` entry point referencing a ``Backend``
+instance::
+
+    [options.entry_points]
+    pyRAPL.backends =
+        my_backend = my_package.module:MY_BACKEND
+"""
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Type
+
+from pyRAPL import Device, PyRAPLCantInitDeviceAPI
+from pyRAPL.device_api import DeviceAPI, PkgAPI, DramAPI, CoreAPI, UncoreAPI, PsysAPI
+from pyRAPL.device_api import MsrPkgAPI, MsrDramAPI, MsrCoreAPI, MsrUncoreAPI, AmdEnergyAPI, AmdMsrAPI
+from pyRAPL.topology import Topology
+
+ENTRY_POINT_GROUP = 'pyRAPL.backends'
+
+#: environment variable giving the backend used when no backend is given
+BACKEND_ENVIRONMENT_VARIABLE = 'PYRAPL_BACKEND'
+
+#: number of reads used to measure the read latency of a probed device API
+PROBE_READS = 5
+
+
+@dataclass(frozen=True)
+class Backend:
+    """
+    Interface used to read the energy consumption of some devices
+
+    :var name: name of the backend
+    :vartype name: str
+    :var device_api_classes: DeviceAPI class used to read each device supported by the backend
+    :vartype device_api_classes: Dict[Device, Type[DeviceAPI]]
+    :var read_cost: estimated cost of a read of a device on a socket (in micro seconds), backends with the lowest cost
+                    are probed first
+    :vartype read_cost: float
+    :var probed: if False, the backend is only used when it is explicitly given, it is never probed
+    :vartype probed: bool
+    """
+    name: str
+    device_api_classes: Dict[Device, Type[DeviceAPI]]
+    read_cost: float
+    probed: bool = True
+
+    @property
+    def devices(self) -> List[Device]:
+        """
+        sorted list of the devices supported by the backend
+        """
+        return sorted(self.device_api_classes.keys())
+
+
+@dataclass(frozen=True)
+class BackendSelection:
+    """
+    Backend chosen to read a device
+
+    :var device: the device
+    :vartype device: Device
+    :var backend: name of the backend
+    :vartype backend: str
+    :var read_latency: median latency of a read of the device measured when the backend was probed (in micro seconds)
+    :vartype read_latency: float
+    :var device_api: DeviceAPI used to read the device
+    :vartype device_api: DeviceAPI
+    """
+    device: Device
+    backend: str
+    read_latency: float
+    device_api: DeviceAPI
+
+
+def _load_entry_points():
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return []
+
+    all_entry_points = entry_points()
+    if hasattr(all_entry_points, 'select'):
+        return list(all_entry_points.select(group=ENTRY_POINT_GROUP))
+    return list(all_entry_points.get(ENTRY_POINT_GROUP, []))
+
+
+def measure_read_latency(device_api: DeviceAPI, reads: int = PROBE_READS) -> float:
+    """
+    :param device_api: DeviceAPI to measure
+    :param reads: number of reads
+    :return: median latency of a read of the device API (in micro seconds)
+    """
+    latencies = []
+    for _ in range(reads):
+        begin = time.perf_counter_ns()
+        device_api.energy()
+        latencies.append(time.perf_counter_ns() - begin)
+    latencies.sort()
+    return latencies[len(latencies) // 2] / 1000
+
+
+class BackendRegistry:
+    """
+    Registry of the known backends
+
+    Backends declared with entry points are loaded on the first probe or lookup
+    """
+
+    def __init__(self):
+        self._backends = {}
+        self._entry_points_loaded = False
+
+    def register(self, backend: Backend):
+        """
+        Register a backend, replace the backend with the same name if it exists
+        """
+        self._backends[backend.name] = backend
+
+    def unregister(self, name: str):
+        """
+        Remove a backend from the registry
+        :raise ValueError: if the backend is unknown
+        """
+        self._load_entry_points()
+        if name not in self._backends:
+            raise ValueError('unknown backend : ' + str(name))
+        del self._backends[name]
+
+    def _load_entry_points(self):
+        if self._entry_points_loaded:
+            return
+        self._entry_points_loaded = True
+        for entry_point in _load_entry_points():
+            backend = entry_point.load()
+            if not isinstance(backend, Backend):
+                raise TypeError('entry point ' + entry_point.name + ' does not reference a Backend instance')
+            if backend.name not in self._backends:
+                self._backends[backend.name] = backend
+
+    def backend(self, name: str) -> Backend:
+        """
+        :return: the backend with the given name
+        :raise ValueError: if the backend is unknown
+        """
+        self._load_entry_points()
+        if name not in self._backends:
+            raise ValueError('unknown backend : ' + str(name))
+        return self._backends[name]
+
+    def backends(self, device: Optional[Device] = None) -> List[Backend]:
+        """
+        :param device: if not None, only return the backends that support this device
+        :return: the registered backends sorted by read cost
+        """
+        self._load_entry_points()
+        backends = [backend for backend in self._backends.values()
+                    if device is None or device in backend.device_api_classes]
+        return sorted(backends, key=lambda backend: backend.read_cost)
+
+    def probe(self, device: Device, socket_ids: Optional[List[int]] = None, backend: Optional[str] = None,
+              topology: Optional[Topology] = None) -> BackendSelection:
+        """
+        Create a DeviceAPI for the device with the given backend, or with the cheapest backend that works
+
+        A backend works if its DeviceAPI can be initialised and read
+
+        :param device: the device corresponding to the DeviceAPI to be created
+        :param socket_ids: param that will be passed to the constructor of the DeviceAPI instance
+        :param backend: name of the backend to use, if None, the backend given by the ``PYRAPL_BACKEND`` environment
+                        variable is used. If this variable isn't set, all the probed backends supporting the device are
+                        probed from the cheapest to the most expensive one
+        :param topology: topology of the machine, if None, the DeviceAPI will discover it
+        :return: the chosen backend, its DeviceAPI and its measured read latency
+        :raise ValueError: if the backend is unknown
+        :raise PyRAPLCantInitDeviceAPI: if no backend can read the energy consumption of the device
+        """
+        if backend is None:
+            backend = os.environ.get(BACKEND_ENVIRONMENT_VARIABLE) or None
+        if backend is not None:
+            candidates = [self.backend(backend)]
+        else:
+            candidates = [candidate for candidate in self.backends(device) if candidate.probed]
+        for candidate in candidates:
+            device_api_class = candidate.device_api_classes.get(device)
+            if device_api_class is None:
+                continue
+            try:
+                device_api = device_api_class(None if socket_ids is None else list(socket_ids), topology)
+                read_latency = measure_read_latency(device_api)
+            except (PyRAPLCantInitDeviceAPI, OSError, ValueError):
+                continue
+            return BackendSelection(device, candidate.name, read_latency, device_api)
+        raise PyRAPLCantInitDeviceAPI()
+
+
+#: registry used by pyRAPL
+REGISTRY = BackendRegistry()
+
+REGISTRY.register(Backend('msr', {Device.PKG: MsrPkgAPI, Device.DRAM: MsrDramAPI, Device.CORE: MsrCoreAPI,
+                                  Device.UNCORE: MsrUncoreAPI}, read_cost=3))
+REGISTRY.register(Backend('amd-msr', {Device.PKG: AmdMsrAPI}, read_cost=3))
+REGISTRY.register(Backend('powercap', {Device.PKG: PkgAPI, Device.DRAM: DramAPI, Device.CORE: CoreAPI,
+                                       Device.UNCORE: UncoreAPI, Device.PSYS: PsysAPI}, read_cost=10))
+REGISTRY.register(Backend('amd', {Device.PKG: AmdEnergyAPI}, read_cost=10))
+
+
+class DeviceAPIFactory:
+    """
+    Factory Returning DeviceAPI
+    """
+
+    @staticmethod
+    def create_device_api(device: Device, socket_ids: Optional[int], backend: Optional[str] = None,
+                          topology: Optional[Topology] = None) -> DeviceAPI:
+        """
+        :param device: the device corresponding to the DeviceAPI to be created
+        :param socket_ids: param that will be passed to the constructor of the DeviceAPI instance
+        :param backend: name of a registered backend: ``'powercap'`` (sysfs powercap files), ``'msr'`` (RAPL Model
+                        Specific Registers), ``'amd'`` (amd_energy hwmon driver), ``'amd-msr'`` (AMD RAPL Model
+                        Specific Registers), ``'perf'`` (power PMU events read with ``perf_event_open``) or a third
+                        party backend. If None, the cheapest working backend is used
+        :param topology: topology of the machine, if None, the DeviceAPI will discover it
+        :return: a DeviceAPI instance
+        :raise ValueError: if the backend is unknown
+        :raise PyRAPLCantInitDeviceAPI: if the backend can't read the energy consumption of the device
+        """
+        return REGISTRY.probe(device, socket_ids, backend, topology).device_api
@@ -0,0 +1,593 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Energy benchmarks : the energy counterpart of ``timeit``
+
+A benchmark runs a function several times after some warmup runs, measures each run with a ``Measurement``, rejects
+the outlier runs and computes the statistics (mean, median, standard deviation and 95% confidence interval) of the
+duration and of the energy consumption of each device on each socket. The statistics are vectorized with NumPy if it is
+installed. Benchmark results can be stored in a JSON file to be compared later::
+
+    result = pyRAPL.bench.bench(foo, warmup=2, repeat=20)
+    print(result.energy[pyRAPL.Device.PKG].mean)
+    pyRAPL.bench.save([result], 'foo.json')
+
+Several implementations can be compared with ``compare`` : their runs are interleaved (or shuffled) to cancel the
+thermal and frequency drifts, and the differences with the first implementation are tested for significance::
+
+    comparison = pyRAPL.bench.compare({'list': with_list, 'set': with_set}, repeat=30)
+    for test in comparison.tests:
+        print(test.candidate, test.metric, test.relative_difference, test.significant)
+"""
+import json
+import math
+import random
+import statistics
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pyRAPL import Device, Result
+from pyRAPL.measurement import Measurement
+from pyRAPL.sensor import Sensor
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#: default threshold of the modified z-score above which a run is rejected as an outlier
+OUTLIER_THRESHOLD = 3.5
+
+# quantiles of the Student t distribution for two-sided 95% confidence intervals, for 1 to 30 degrees of freedom
+_T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131,
+         2.120, 2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def t_quantile(degrees_of_freedom: int) -> float:
+    """
+    :return: the quantile of the Student t distribution used for a two-sided 95% confidence interval
+    """
+    if degrees_of_freedom <= len(_T_95):
+        return _T_95[degrees_of_freedom - 1]
+    return 1.96
+
+
+@dataclass(frozen=True)
+class Statistics:
+    """
+    Statistics of a vector of values (one value for each socket) over the runs of a benchmark. Each attribute contains
+    one element for each value of the vector (-1 for the values that weren't measured)
+
+    :var mean: mean of the values
+    :vartype mean: List[float]
+    :var median: median of the values
+    :vartype median: List[float]
+    :var stddev: sample standard deviation of the values (0 for a single run)
+    :vartype stddev: List[float]
+    :var ci_low: lower bound of the 95% confidence interval of the mean
+    :vartype ci_low: List[float]
+    :var ci_high: upper bound of the 95% confidence interval of the mean
+    :vartype ci_high: List[float]
+    """
+    mean: List[float]
+    median: List[float]
+    stddev: List[float]
+    ci_low: List[float]
+    ci_high: List[float]
+
+
+def describe(values: List[List[float]]) -> Statistics:
+    """
+    Compute the statistics of each column of a list of vectors
+
+    :param values: one vector for each run, columns containing a negative value are not measured
+    :return: the statistics of each column
+    """
+    n = len(values)
+    if numpy is not None:
+        array = numpy.asarray(values, dtype=float)
+        measured = (array >= 0).all(axis=0)
+        mean = array.mean(axis=0)
+        median = numpy.median(array, axis=0)
+        stddev = array.std(axis=0, ddof=1) if n > 1 else numpy.zeros(array.shape[1])
+        mean, median, stddev = [numpy.where(measured, column, -1).tolist() for column in (mean, median, stddev)]
+    else:
+        columns = list(zip(*values))
+        measured = [min(column) >= 0 for column in columns]
+        mean = [statistics.mean(column) if ok else -1 for ok, column in zip(measured, columns)]
+        median = [statistics.median(column) if ok else -1 for ok, column in zip(measured, columns)]
+        stddev = [(statistics.stdev(column) if n > 1 else 0) if ok else -1 for ok, column in zip(measured, columns)]
+
+    half_width = [t_quantile(n - 1) * s / math.sqrt(n) if n > 1 else 0 for s in stddev]
+    ci_low = [m - h if m >= 0 else -1 for m, h in zip(mean, half_width)]
+    ci_high = [m + h if m >= 0 else -1 for m, h in zip(mean, half_width)]
+    return Statistics(mean, median, stddev, ci_low, ci_high)
+
+
+def outliers(values: List[float], threshold: float = OUTLIER_THRESHOLD) -> List[int]:
+    """
+    Find the outliers of a list of values with the modified z-score (distance to the median divided by the median
+    absolute deviation)
+
+    :param values: values to check
+    :param threshold: modified z-score above which a value is an outlier
+    :return: the indices of the outliers
+    """
+    if len(values) < 3:
+        return []
+    median = statistics.median(values)
+    mad = statistics.median([abs(value - median) for value in values])
+    if mad == 0:
+        return []
+    return [i for i, value in enumerate(values) if 0.6745 * abs(value - median) / mad > threshold]
+
+
+def _energy(result: Result) -> Dict[Device, List[float]]:
+    return {device: result.energy(device) for device in Device if result.energy(device) is not None}
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    """
+    Result of a benchmark
+
+    :var name: benchmark name
+    :vartype name: str
+    :var number: number of calls of the function in each run (the results are given for one call)
+    :vartype number: int
+    :var runs: result of each run, including the rejected ones
+    :vartype runs: List[Result]
+    :var rejected: indices of the runs rejected as outliers
+    :vartype rejected: List[int]
+    :var duration: statistics of the duration of the kept runs (in micro seconds)
+    :vartype duration: Statistics
+    :var energy: statistics of the energy consumption of each device on each socket during the kept runs (in micro
+                 Joules)
+    :vartype energy: Dict[Device, Statistics]
+    """
+    name: str
+    number: int
+    runs: List[Result]
+    rejected: List[int] = field(default_factory=list)
+    duration: Optional[Statistics] = None
+    energy: Dict[Device, Statistics] = field(default_factory=dict)
+
+    @property
+    def kept_runs(self) -> List[Result]:
+        """
+        results of the runs that weren't rejected
+        """
+        rejected = set(self.rejected)
+        return [run for i, run in enumerate(self.runs) if i not in rejected]
+
+    def to_dict(self) -> dict:
+        """
+        :return: a JSON serializable representation of the benchmark result
+        """
+        return {
+            'name': self.name,
+            'number': self.number,
+            'runs': [_result_to_dict(run) for run in self.runs],
+            'rejected': list(self.rejected),
+            'duration': vars(self.duration),
+            'energy': {device.name: vars(stats) for device, stats in self.energy.items()},
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'BenchmarkResult':
+        """
+        :param data: representation of a benchmark result created by ``to_dict``
+        :return: the benchmark result
+        """
+        return BenchmarkResult(data['name'], data['number'], [_result_from_dict(run) for run in data['runs']],
+                               data['rejected'], Statistics(**data['duration']),
+                               {Device[name]: Statistics(**stats) for name, stats in data['energy'].items()})
+
+
+def _result_to_dict(result: Result) -> dict:
+    data = dict(vars(result))
+    if result.error is not None:
+        data['error'] = {device.name: values for device, values in result.error.items()}
+    return data
+
+
+def _result_from_dict(data: dict) -> Result:
+    data = dict(data)
+    if data.get('error') is not None:
+        data['error'] = {Device[name]: values for name, values in data['error'].items()}
+    return Result(**data)
+
+
+def analyze(name: str, number: int, runs: List[Result],
+            threshold: Optional[float] = OUTLIER_THRESHOLD) -> BenchmarkResult:
+    """
+    Reject the outlier runs and compute the statistics of the kept runs
+
+    :param name: benchmark name
+    :param number: number of calls of the function in each run
+    :param runs: result of each run
+    :param threshold: modified z-score above which a run is rejected (on its duration or on its total energy
+                      consumption), if None, no run is rejected
+    :return: the benchmark result
+    """
+    rejected = []
+    if threshold is not None:
+        total_energy = [sum(value for values in _energy(run).values() for value in values if value > 0) for run in runs]
+        rejected = sorted(set(outliers([run.duration for run in runs], threshold) +
+                              outliers(total_energy, threshold)))
+    kept = [run for i, run in enumerate(runs) if i not in rejected]
+
+    energy = {}
+    for device in Device:
+        values = [run.energy(device) for run in kept]
+        if values and all(value is not None for value in values):
+            energy[device] = describe(values)
+    return BenchmarkResult(name, number, runs, rejected, describe([[run.duration] for run in kept]), energy)
+
+
+class Benchmark:
+    """
+    Measure the energy consumption of a function over several runs
+
+    :param func: function to benchmark, called without argument
+    :param name: benchmark name, if None, the name of the function is used
+    :param warmup: number of runs done before the measured runs (to fill the caches, trigger the JIT, ...)
+    :param repeat: number of measured runs
+    :param number: number of calls of the function in each run (the results are divided by this number)
+    :param sensor: sensor used to measure the energy consumption, if None, the sensor configured by ``pyRAPL.setup``
+                   is used
+    :param outlier_threshold: modified z-score above which a run is rejected as an outlier, if None, no run is rejected
+    """
+
+    def __init__(self, func: Callable, name: Optional[str] = None, warmup: int = 1, repeat: int = 10, number: int = 1,
+                 sensor: Sensor = None, outlier_threshold: Optional[float] = OUTLIER_THRESHOLD):
+        if repeat < 1 or number < 1 or warmup < 0:
+            raise ValueError('repeat and number must be positive and warmup must not be negative')
+        self.func = func
+        self.name = name if name is not None else func.__name__
+        self.warmup = warmup
+        self.repeat = repeat
+        self.number = number
+        self.outlier_threshold = outlier_threshold
+        self._sensor = sensor
+
+    def measure_run(self) -> Result:
+        """
+        Measure one run of the benchmark
+
+        :return: the energy consumption of one call of the function
+        """
+        func = self.func
+        measure = Measurement(self.name, sensor=self._sensor)
+        measure.begin()
+        for _ in range(self.number):
+            func()
+        measure.end()
+        return measure.result / self.number
+
+    def run(self) -> BenchmarkResult:
+        """
+        Run the warmup runs and the measured runs
+
+        :return: the benchmark result
+        """
+        for _ in range(self.warmup * self.number):
+            self.func()
+        runs = [self.measure_run() for _ in range(self.repeat)]
+        return analyze(self.name, self.number, runs, self.outlier_threshold)
+
+
+def bench(func: Callable, name: Optional[str] = None, warmup: int = 1, repeat: int = 10, number: int = 1,
+          sensor: Sensor = None, outlier_threshold: Optional[float] = OUTLIER_THRESHOLD) -> BenchmarkResult:
+    """
+    Benchmark a function (see ``Benchmark``)
+
+    :return: the benchmark result
+    """
+    return Benchmark(func, name, warmup, repeat, number, sensor, outlier_threshold).run()
+
+
+def save(results: List[BenchmarkResult], filename: str):
+    """
+    Store benchmark results in a JSON file
+
+    :param results: benchmark results to store
+    :param filename: name of the file, overwritten if it exists
+    """
+    with open(filename, 'w') as json_file:
+        json.dump([result.to_dict() for result in results], json_file, indent=2)
+
+
+def load(filename: str) -> List[BenchmarkResult]:
+    """
+    Load benchmark results stored by ``save``
+
+    :param filename: name of the file
+    :return: the benchmark results
+    """
+    with open(filename) as json_file:
+        return [BenchmarkResult.from_dict(data) for data in json.load(json_file)]
+
+
+#: default significance level of the comparison tests
+ALPHA = 0.05
+
+#: default number of bootstrap resamples
+BOOTSTRAP_RESAMPLES = 10000
+
+
+def _normal_sf(z: float) -> float:
+    # survival function of the standard normal distribution
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def _rank(values: List[tuple]) -> Tuple[List[float], int]:
+    """
+    :param values: sorted tuples, ranked on their first element
+    :return: the rank of each tuple (average rank for the ties) and the sum of ``t^3 - t`` over the groups of ``t`` ties
+    """
+    ranks = [0.0] * len(values)
+    tie_correction = 0
+    i = 0
+    while i < len(values):
+        j = i
+        while j + 1 < len(values) and values[j + 1][0] == values[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        tie_correction += (j - i + 1) ** 3 - (j - i + 1)
+        i = j + 1
+    return ranks, tie_correction
+
+
+def mann_whitney(a: List[float], b: List[float]) -> float:
+    """
+    Two-sided Mann-Whitney U test, with the normal approximation (corrected for ties and for continuity)
+
+    :param a: first sample
+    :param b: second sample
+    :return: the p-value of the hypothesis that the two samples come from the same distribution
+    """
+    n_a, n_b = len(a), len(b)
+    values = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    ranks, tie_correction = _rank(values)
+
+    rank_sum_a = sum(rank for rank, (_, sample) in zip(ranks, values) if sample == 0)
+    u = rank_sum_a - n_a * (n_a + 1) / 2
+    n = n_a + n_b
+    variance = n_a * n_b / 12 * ((n + 1) - tie_correction / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - n_a * n_b / 2) - 0.5) / math.sqrt(variance)
+    return min(1.0, 2 * _normal_sf(max(z, 0)))
+
+
+def wilcoxon(a: List[float], b: List[float]) -> float:
+    """
+    Two-sided Wilcoxon signed-rank test of paired samples, with the normal approximation (corrected for ties and for
+    continuity). The pairs without difference are discarded
+
+    :param a: first sample
+    :param b: second sample, ``b[i]`` is paired with ``a[i]``
+    :return: the p-value of the hypothesis that the differences ``b[i] - a[i]`` are symmetric around 0
+    """
+    differences = sorted((abs(y - x), y > x) for x, y in zip(a, b) if y != x)
+    n = len(differences)
+    if n == 0:
+        return 1.0
+    ranks, tie_correction = _rank(differences)
+
+    positive_rank_sum = sum(rank for rank, (_, positive) in zip(ranks, differences) if positive)
+    variance = n * (n + 1) * (2 * n + 1) / 24 - tie_correction / 48
+    if variance <= 0:
+        return 1.0
+    z = (abs(positive_rank_sum - n * (n + 1) / 4) - 0.5) / math.sqrt(variance)
+    return min(1.0, 2 * _normal_sf(max(z, 0)))
+
+
+def bootstrap_difference(a: List[float], b: List[float], paired: bool = True,
+                         resamples: int = BOOTSTRAP_RESAMPLES, seed=None) -> Tuple[float, float, float]:
+    """
+    Bootstrap 95% confidence interval of the difference of the means of two samples (``b - a``)
+
+    :param a: first sample
+    :param b: second sample
+    :param paired: if True, ``a[i]`` and ``b[i]`` are paired (measured in the same round) and the pairs are resampled,
+                   otherwise the two samples are resampled independently
+    :param resamples: number of bootstrap resamples
+    :param seed: seed of the random generator
+    :return: the difference of the means and the bounds of its confidence interval
+    """
+    difference = statistics.mean(b) - statistics.mean(a)
+    if numpy is not None:
+        generator = numpy.random.default_rng(seed)
+        a_array, b_array = numpy.asarray(a, dtype=float), numpy.asarray(b, dtype=float)
+        if paired:
+            indices = generator.integers(0, len(a), (resamples, len(a)))
+            differences = (b_array[indices] - a_array[indices]).mean(axis=1)
+        else:
+            differences = (b_array[generator.integers(0, len(b), (resamples, len(b)))].mean(axis=1) -
+                           a_array[generator.integers(0, len(a), (resamples, len(a)))].mean(axis=1))
+        low, high = numpy.percentile(differences, [2.5, 97.5]).tolist()
+        return difference, low, high
+
+    generator = random.Random(seed)
+    differences = []
+    for _ in range(resamples):
+        if paired:
+            indices = [generator.randrange(len(a)) for _ in a]
+            differences.append(statistics.mean(b[i] - a[i] for i in indices))
+        else:
+            differences.append(statistics.mean(generator.choices(b, k=len(b))) -
+                               statistics.mean(generator.choices(a, k=len(a))))
+    differences.sort()
+    return difference, differences[int(0.025 * (resamples - 1))], differences[int(0.975 * (resamples - 1))]
+
+
+@dataclass(frozen=True)
+class ComparisonTest:
+    """
+    Comparison of a metric between the baseline and a candidate
+
+    :var baseline: name of the baseline
+    :vartype baseline: str
+    :var candidate: name of the candidate
+    :vartype candidate: str
+    :var metric: ``'duration'`` (in micro seconds) or the name of a device (energy consumption summed over the
+                 sockets, in micro Joules)
+    :vartype metric: str
+    :var baseline_mean: mean of the metric for the baseline
+    :vartype baseline_mean: float
+    :var difference: mean of the candidate minus mean of the baseline
+    :vartype difference: float
+    :var relative_difference: difference divided by the baseline mean
+    :vartype relative_difference: float
+    :var ci_low: lower bound of the bootstrap 95% confidence interval of the difference
+    :vartype ci_low: float
+    :var ci_high: upper bound of the bootstrap 95% confidence interval of the difference
+    :vartype ci_high: float
+    :var p_value: p-value of the Mann-Whitney U test (the runs are treated as independent)
+    :vartype p_value: float
+    :var paired_p_value: p-value of the Wilcoxon signed-rank test of the differences between the runs of a same round,
+                         None if the runs aren't paired
+    :vartype paired_p_value: Optional[float]
+    :var significant: True if the p-value (the paired one if the runs are paired) is under the significance level and
+                      the confidence interval doesn't contain 0
+    :vartype significant: bool
+    """
+    baseline: str
+    candidate: str
+    metric: str
+    baseline_mean: float
+    difference: float
+    relative_difference: float
+    ci_low: float
+    ci_high: float
+    p_value: float
+    paired_p_value: Optional[float]
+    significant: bool
+
+
+@dataclass(frozen=True)
+class Comparison:
+    """
+    Result of the comparison of several candidates
+
+    :var results: benchmark result of each candidate
+    :vartype results: Dict[str, BenchmarkResult]
+    :var order: names of the candidates in the order of their runs
+    :vartype order: List[str]
+    :var tests: comparison of each candidate with the baseline (the first candidate), for the duration and for the
+                energy consumption of each device
+    :vartype tests: List[ComparisonTest]
+    """
+    results: Dict[str, BenchmarkResult]
+    order: List[str]
+    tests: List[ComparisonTest]
+
+
+def _metrics(run: Result) -> Dict[str, float]:
+    metrics = {'duration': run.duration}
+    for device, values in _energy(run).items():
+        metrics[device.name] = sum(value for value in values if value >= 0)
+    return metrics
+
+
+def compare_runs(baseline: str, candidate: str, baseline_runs: List[Result], candidate_runs: List[Result],
+                 alpha: float = ALPHA, resamples: int = BOOTSTRAP_RESAMPLES, seed=None) -> List[ComparisonTest]:
+    """
+    Test the differences of duration and of energy consumption between the runs of two candidates. The runs with the
+    same index are paired if the two candidates have the same number of runs
+
+    :param alpha: significance level
+    :return: one test for the duration and one test for each device measured for both candidates
+    """
+    baseline_metrics = [_metrics(run) for run in baseline_runs]
+    candidate_metrics = [_metrics(run) for run in candidate_runs]
+    names = [name for name in baseline_metrics[0] if name in candidate_metrics[0]]
+    paired = len(baseline_runs) == len(candidate_runs)
+    tests = []
+    for name in names:
+        a = [metrics[name] for metrics in baseline_metrics]
+        b = [metrics[name] for metrics in candidate_metrics]
+        difference, low, high = bootstrap_difference(a, b, paired, resamples, seed)
+        p_value = mann_whitney(a, b)
+        paired_p_value = wilcoxon(a, b) if paired else None
+        baseline_mean = statistics.mean(a)
+        relative_difference = difference / baseline_mean if baseline_mean != 0 else math.inf
+        tested_p_value = paired_p_value if paired else p_value
+        tests.append(ComparisonTest(baseline, candidate, name, baseline_mean, difference, relative_difference, low,
+                                    high, p_value, paired_p_value, tested_p_value < alpha and not low <= 0 <= high))
+    return tests
+
+
+def compare(candidates: Dict[str, Callable], repeat: int = 20, number: int = 1, warmup: int = 1,
+            order: str = 'interleaved', sensor: Sensor = None, alpha: float = ALPHA,
+            resamples: int = BOOTSTRAP_RESAMPLES, seed=None) -> Comparison:
+    """
+    Compare the duration and the energy consumption of several functions
+
+    The measured runs are done in ``repeat`` rounds, each round contains one run of each candidate. With the
+    ``'interleaved'`` order, the order of the candidates is rotated at each round, with the ``'random'`` order, it is
+    shuffled at each round. The runs of a round are paired in the bootstrap confidence interval and in the Wilcoxon
+    signed-rank test, which decide if a difference is significant
+
+    :param candidates: functions to compare, called without argument, by name. The first one is the baseline
+    :param repeat: number of rounds
+    :param number: number of calls of the function in each run (the results are divided by this number)
+    :param warmup: number of warmup runs of each candidate
+    :param order: ``'interleaved'`` or ``'random'``
+    :param sensor: sensor used to measure the energy consumption, if None, the sensor configured by ``pyRAPL.setup``
+                   is used
+    :param alpha: significance level of the tests
+    :param resamples: number of bootstrap resamples
+    :param seed: seed of the random generators (run order and bootstrap)
+    :return: the comparison of the candidates
+    :raise ValueError: if there are less than two candidates or if the order is unknown
+    """
+    if len(candidates) < 2:
+        raise ValueError('at least two candidates are needed')
+    if order not in ('interleaved', 'random'):
+        raise ValueError('unknown order : ' + str(order))
+
+    benchmarks = {name: Benchmark(func, name, warmup, repeat, number, sensor) for name, func in candidates.items()}
+    names = list(benchmarks)
+    generator = random.Random(seed)
+    for name in names:
+        for _ in range(warmup * number):
+            benchmarks[name].func()
+
+    runs = {name: [] for name in names}
+    run_order = []
+    for i in range(repeat):
+        if order == 'interleaved':
+            round_order = names[i % len(names):] + names[:i % len(names)]
+        else:
+            round_order = list(names)
+            generator.shuffle(round_order)
+        for name in round_order:
+            runs[name].append(benchmarks[name].measure_run())
+        run_order += round_order
+
+    results = {name: analyze(name, number, runs[name]) for name in names}
+    tests = []
+    for name in names[1:]:
+        tests += compare_runs(names[0], name, runs[names[0]], runs[name], alpha, resamples, seed)
+    return Comparison(results, run_order, tests)
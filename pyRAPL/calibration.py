@@ -0,0 +1,224 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Automatic choice of the number of runs of a measured function and calibration of the measurement overhead
+"""
+import dataclasses
+import weakref
+from dataclasses import dataclass
+from time import monotonic_ns, time_ns
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from pyRAPL import Device, Result
+from pyRAPL.attribution.split import build_result
+from pyRAPL.sensor import Sensor
+import pyRAPL
+
+#: time between two updates of the RAPL counters (in seconds)
+RAPL_UPDATE_INTERVAL = 0.001
+
+#: usual RAPL energy unit (in micro Joules)
+RAPL_ENERGY_UNIT = 61.04
+
+#: minimum duration of an automatically ranged measure (in seconds)
+MIN_DURATION = 0.2
+
+#: minimum energy consumption of an automatically ranged measure (in micro Joules)
+MIN_ENERGY = 100 * RAPL_ENERGY_UNIT
+
+#: maximum duration of an automatically ranged measure (in seconds), whatever its energy consumption
+MAX_DURATION = 10
+
+
+def _numbers() -> Iterator[int]:
+    # 1, 2, 5, 10, 20, 50, ... like timeit.Timer.autorange
+    i = 1
+    while True:
+        for j in 1, 2, 5:
+            yield i * j
+        i *= 10
+
+
+def measure_runs(func: Callable, number: int, label: str, sensor: Sensor = None) -> Result:
+    """
+    Measure ``number`` successive runs of a function, the way the calibration and ``autorange`` measure them
+
+    :param func: function to measure, called without argument
+    :param number: number of runs
+    :param label: label of the result
+    :param sensor: sensor used to measure the energy consumption, if None, the sensor configured by ``pyRAPL.setup``
+                   is used
+    :return: the energy consumption of all the runs (not divided by the number of runs)
+    """
+    sensor = sensor if sensor is not None else pyRAPL._sensor
+    timestamp = time_ns()
+    energy_begin = sensor.energy()
+    begin = monotonic_ns()
+    for _ in range(number):
+        func()
+    end = monotonic_ns()
+    energy_end = sensor.energy()
+    return build_result(label, timestamp / 1000000000, (end - begin) / 1000,
+                        sensor.per_device(energy_end - energy_begin))
+
+
+def _energy(result: Result) -> Dict[Device, List[float]]:
+    return {device: result.energy(device) for device in Device if result.energy(device) is not None}
+
+
+def quantization_error(result: Result) -> Dict[Device, List[float]]:
+    """
+    Maximum error of a measure caused by the discrete updates of the RAPL counters : each of the two reads of the
+    measure can miss the energy consumed during one update interval, plus one energy unit
+
+    :param result: measure
+    :return: the maximum error of the energy consumption of each device on each socket (-1 for unmeasured sockets)
+    """
+    duration = max(result.duration / 1000000, RAPL_UPDATE_INTERVAL)
+    return {device: [2 * (value * RAPL_UPDATE_INTERVAL / duration + RAPL_ENERGY_UNIT) if value >= 0 else -1
+                     for value in values]
+            for device, values in _energy(result).items()}
+
+
+def autorange(func: Callable, label: Optional[str] = None, sensor: Sensor = None, min_duration: float = MIN_DURATION,
+              min_energy: float = MIN_ENERGY, max_duration: float = MAX_DURATION) -> Tuple[int, Result]:
+    """
+    Measure ``number`` successive runs of a function, with ``number`` in 1, 2, 5, 10, 20, 50, ... until the measure
+    lasts at least ``min_duration`` seconds and consumes at least ``min_energy`` micro Joules (on all the devices and
+    sockets), or lasts more than ``max_duration`` seconds
+
+    :param func: function to measure, called without argument
+    :param label: label of the result, if None, the name of the function is used
+    :param sensor: sensor used to measure the energy consumption, if None, the sensor configured by ``pyRAPL.setup``
+                   is used
+    :return: the number of runs and the energy consumption of all these runs (not divided by the number of runs)
+    """
+    sensor = sensor if sensor is not None else pyRAPL._sensor
+    label = label if label is not None else func.__name__
+    for number in _numbers():
+        result = measure_runs(func, number, label, sensor)
+        duration = result.duration / 1000000
+        energy = sum(value for values in _energy(result).values() for value in values if value > 0)
+        if duration >= max_duration or (duration >= min_duration and energy >= min_energy):
+            return number, result
+
+
+@dataclass(frozen=True)
+class Calibration:
+    """
+    Overhead of a measure, subtracted from the automatically ranged measures (see ``correct``)
+
+    :var read_duration: duration of an empty measure, i.e. the two sensor reads (in micro seconds)
+    :vartype read_duration: float
+    :var read_energy: energy consumption of an empty measure (in micro Joules, for each device on each socket)
+    :vartype read_energy: Dict[Device, List[float]]
+    :var read_error: uncertainty of the energy consumption of an empty measure
+    :vartype read_error: Dict[Device, List[float]]
+    :var call_duration: duration of one iteration of the measure loop with an empty function (in micro seconds)
+    :vartype call_duration: float
+    :var call_energy: energy consumption of one iteration of the measure loop with an empty function
+    :vartype call_energy: Dict[Device, List[float]]
+    :var call_error: uncertainty of the energy consumption of one iteration of the measure loop
+    :vartype call_error: Dict[Device, List[float]]
+    """
+    read_duration: float
+    read_energy: Dict[Device, List[float]]
+    read_error: Dict[Device, List[float]]
+    call_duration: float
+    call_energy: Dict[Device, List[float]]
+    call_error: Dict[Device, List[float]]
+
+
+def _per_run(values: Dict[Device, List[float]], number: int) -> Dict[Device, List[float]]:
+    return {device: [value / number if value >= 0 else -1 for value in device_values]
+            for device, device_values in values.items()}
+
+
+def calibrate(sensor: Sensor = None, min_duration: float = MIN_DURATION, min_energy: float = MIN_ENERGY,
+              max_duration: float = MAX_DURATION) -> Calibration:
+    """
+    Measure the overhead of an empty measure and of an empty measure loop iteration, each one with ``autorange``
+
+    :param sensor: sensor to calibrate, if None, the sensor configured by ``pyRAPL.setup`` is used
+    :return: the overhead of the measures done with this sensor
+    """
+    sensor = sensor if sensor is not None else pyRAPL._sensor
+
+    def empty_measure():
+        sensor.energy()
+        sensor.energy()
+
+    def empty_function():
+        pass
+
+    read_number, read_result = autorange(empty_measure, '', sensor, min_duration, min_energy, max_duration)
+    call_number, call_result = autorange(empty_function, '', sensor, min_duration, min_energy, max_duration)
+    return Calibration(read_result.duration / read_number, _per_run(_energy(read_result), read_number),
+                       _per_run(quantization_error(read_result), read_number),
+                       call_result.duration / call_number, _per_run(_energy(call_result), call_number),
+                       _per_run(quantization_error(call_result), call_number))
+
+
+_CALIBRATIONS = weakref.WeakKeyDictionary()
+
+
+def get_calibration(sensor: Sensor = None) -> Calibration:
+    """
+    :param sensor: sensor to calibrate, if None, the sensor configured by ``pyRAPL.setup`` is used
+    :return: the calibration of the given sensor, computed with ``calibrate`` on the first call
+    """
+    sensor = sensor if sensor is not None else pyRAPL._sensor
+    if sensor not in _CALIBRATIONS:
+        _CALIBRATIONS[sensor] = calibrate(sensor)
+    return _CALIBRATIONS[sensor]
+
+
+def correct(result: Result, number: int, calibration: Calibration) -> Result:
+    """
+    Subtract the measure overhead from a measure of several runs of a function and divide it by the number of runs
+
+    :param result: measure of ``number`` runs of a function
+    :param number: number of runs
+    :param calibration: overhead of the measures
+    :return: the energy consumption of one run, with its uncertainty (quantization error of the measure and
+             uncertainty of the calibration)
+    """
+    energy = {}
+    error = {}
+    quantization = quantization_error(result)
+    for device, values in _energy(result).items():
+        read_energy = calibration.read_energy.get(device, [0] * len(values))
+        read_error = calibration.read_error.get(device, [0] * len(values))
+        call_energy = calibration.call_energy.get(device, [0] * len(values))
+        call_error = calibration.call_error.get(device, [0] * len(values))
+        energy[device] = []
+        error[device] = []
+        for i, value in enumerate(values):
+            if value < 0:
+                energy[device].append(-1)
+                error[device].append(-1)
+                continue
+            overhead = max(read_energy[i], 0) + number * max(call_energy[i], 0)
+            energy[device].append(max(value - overhead, 0) / number)
+            value_error = quantization[device][i] + max(read_error[i], 0) + number * max(call_error[i], 0)
+            error[device].append(value_error / number)
+
+    duration = max(result.duration - calibration.read_duration - number * calibration.call_duration, 0) / number
+    return dataclasses.replace(build_result(result.label, result.timestamp, duration, energy), error=error)
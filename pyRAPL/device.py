@@ -27,6 +27,17 @@ class Device(IntEnum):
     Device.PKG : to monitor the CPU energy consumption
 
     Device.DRAM : to monitor the RAM energy consumption
+
+    Device.CORE : to monitor the energy consumption of the CPU cores (RAPL PP0 domain)
+
+    Device.UNCORE : to monitor the energy consumption of the CPU uncore devices, like the integrated GPU (RAPL PP1
+    domain)
+
+    Device.PSYS : to monitor the energy consumption of the whole platform (RAPL psys domain). This domain isn't
+    related to a socket, its energy consumption is reported on the first monitored socket
     """
     PKG = 0
     DRAM = 1
+    CORE = 2
+    UNCORE = 3
+    PSYS = 4
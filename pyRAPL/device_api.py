@@ -19,53 +19,71 @@
 # SOFTWARE.
 import os
 import re
-from typing import Optional, Tuple, List
+import struct
+import threading
+import weakref
+from typing import Dict, Optional, Tuple, List
 
-from pyRAPL import Device, PyRAPLCantInitDeviceAPI, PyRAPLBadSocketIdException
+from pyRAPL import Device, PyRAPLCantInitDeviceAPI, PyRAPLBadSocketIdException, PyRAPLCantRecordEnergyConsumption
+from pyRAPL.topology import Topology, get_topology, read_cpu_ids, read_cpu_socket_ids
 
 
 def cpu_ids() -> List[int]:
     """
     return the cpu id of this machine
     """
-    api_file = open('/sys/devices/system/cpu/present', 'r')
-
-    cpu_id_tmp = re.findall('\d+|-', api_file.readline().strip())
-    cpu_id_list = []
-    for i in range(len(cpu_id_tmp)):
-        if cpu_id_tmp[i] == '-':
-            for cpu_id in range(int(cpu_id_tmp[i - 1]) + 1, int(cpu_id_tmp[i + 1])):
-                cpu_id_list.append(int(cpu_id))
-        else:
-            cpu_id_list.append(int(cpu_id_tmp[i]))
-    return cpu_id_list
+    return read_cpu_ids()
 
 
 def get_socket_ids() -> List[int]:
     """
     return cpu socket id present on the machine
     """
-    socket_id_list = []
-    for cpu_id in cpu_ids():
-        api_file = open('/sys/devices/system/cpu/cpu' + str(cpu_id) + '/topology/physical_package_id')
-        socket_id_list.append(int(api_file.readline().strip()))
-    return list(set(socket_id_list))
+    return sorted(set(read_cpu_socket_ids().values()))
+
+
+#: objects whose files must be reopened in the child process after a fork (their file offsets are shared with the
+#: parent process)
+_FORK_REOPENED = weakref.WeakSet()
+
+
+def _reopen_after_fork():
+    for reopened in list(_FORK_REOPENED):
+        try:
+            reopened._reopen()
+        except OSError:
+            # keep the inherited files
+            pass
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reopen_after_fork)
 
 
 class DeviceAPI:
     """
     API to read energy consumption from sysfs
+
+    The API reads the ``energy_uj`` file of the powercap zone named ``DOMAIN`` on each monitored socket. Implement the
+    ``DOMAIN`` class attribute to define which zone must be read
     """
 
-    def __init__(self, socket_ids: Optional[List[int]] = None):
+    #: True if the API read its values from text files containing an energy counter in micro Joules
+    TEXT_COUNTER = True
+    #: name of the powercap zone of the device (``'package'``, ``'dram'``, ...)
+    DOMAIN = None
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
         """
         :param int socket_ids: if None, the API will get the energy consumption of the whole machine otherwise, it will
                                get the energy consumption of the device on the given socket package
+        :param topology: topology of the machine, if None, the topology is discovered by scanning sysfs
         :raise PyRAPLCantInitDeviceAPI: the machine where is initialised the DeviceAPI have no rapl interface for the
                                         target device
         :raise PyRAPLBadSocketIdException: the machine where is initialised the DeviceAPI has no the requested socket
         """
-        all_socket_id = get_socket_ids()
+        self._topology = topology if topology is not None else get_topology()
+        all_socket_id = self._topology.socket_ids()
         if socket_ids is None:
             self._socket_ids = all_socket_id
         else:
@@ -76,45 +94,86 @@ class DeviceAPI:
 
         self._socket_ids.sort()
 
+        self._sys_file_names = self._get_rapl_file_names()
         self._sys_files = self._open_rapl_files()
-
-    def _open_rapl_files(self):
-        raise NotImplementedError()
-
-    def _get_socket_directory_names(self) -> List[Tuple[str, int]]:
+        self._max_energy_ranges = self._read_max_energy_ranges()
+        # text files are read with seek + readline : each thread uses its own file objects
+        self._local = threading.local()
+        self._local.files = self._sys_files
+        if self.TEXT_COUNTER:
+            _FORK_REOPENED.add(self)
+
+    def _thread_files(self) -> list:
         """
-        :return (str, int): directory name, rapl_id
+        :return: the files of the device opened for the current thread
         """
+        try:
+            return self._local.files
+        except AttributeError:
+            self._local.files = self._open_rapl_files()
+            return self._local.files
 
-        def add_to_result(directory_info, result):
-            """
-            check if the directory info could be added to the result list and add it
-            """
-            dirname, _ = directory_info
-            f_name = open(dirname + '/name', 'r')
-            pkg_str = f_name.readline()
-            if 'package' not in pkg_str:
-                return
-            package_id = int(pkg_str[:-1].split('-')[1])
-
-            if self._socket_ids is not None and package_id not in self._socket_ids:
-                return
-            result.append((package_id, ) + directory_info)
+    def _reopen(self):
+        """
+        Reopen the files of the device, called in the child process after a fork
+        """
+        old_files = self._sys_files
+        self._local = threading.local()
+        self._sys_files = self._open_rapl_files()
+        self._local.files = self._sys_files
+        for old_file in old_files:
+            old_file.close()
 
-        rapl_id = 0
-        result_list = []
-        while os.path.exists('/sys/class/powercap/intel-rapl/intel-rapl:' + str(rapl_id)):
-            dirname = '/sys/class/powercap/intel-rapl/intel-rapl:' + str(rapl_id)
-            add_to_result((dirname, rapl_id), result_list)
-            rapl_id += 1
+    def _get_rapl_file_names(self) -> List[str]:
+        """
+        :return: name of the energy_uj file of the device for each monitored socket (sorted by socket id)
+        """
+        return [directory_name + '/energy_uj' for directory_name in self._get_zone_directory_names(self.DOMAIN)]
 
-        if len(result_list) != len(self._socket_ids):
+    def _open_rapl_files(self):
+        try:
+            return [open(file_name, 'r') for file_name in self._sys_file_names]
+        except PermissionError:
+            # recent kernels restrict the read of energy_uj files to root
             raise PyRAPLCantInitDeviceAPI()
 
-        # sort the result list
-        result_list.sort(key=lambda t: t[0])
-        # return info without socket ids
-        return list(map(lambda t: (t[1], t[2]), result_list))
+    def _read_max_energy_ranges(self) -> List[float]:
+        """
+        :return: value of the max_energy_range_uj file next to each energy_uj file (-1 if the file doesn't exist)
+        """
+        max_energy_ranges = []
+        for file_name in self._sys_file_names:
+            try:
+                with open(os.path.dirname(file_name) + '/max_energy_range_uj', 'r') as range_file:
+                    max_energy_ranges.append(float(range_file.readline()))
+            except (OSError, ValueError):
+                max_energy_ranges.append(-1)
+        return max_energy_ranges
+
+    def max_energy_range(self) -> Tuple[float, ...]:
+        """
+        Get the range of the energy counter of the device, the counter wraps around to 0 when it exceed this value
+        :return float tuple: a tuple containing the counter range (in micro Joules) of the device on each socket. The
+                             value is -1 if the range is unknown or if the socket isn't monitored
+        """
+        result = [-1] * (self._socket_ids[-1] + 1)
+        for i in range(len(self._max_energy_ranges)):
+            result[self._socket_ids[i]] = self._max_energy_ranges[i]
+        return tuple(result)
+
+    def _get_zone_directory_names(self, domain: str) -> List[str]:
+        """
+        :param domain: name of the powercap zone of the device (``'package'``, ``'dram'``, ...)
+        :return: directory of the powercap zone of the device for each monitored socket
+        :raise PyRAPLCantInitDeviceAPI: if a monitored socket has no zone for this device
+        """
+        directory_names = []
+        for socket_id in self._socket_ids:
+            directory_name = self._topology.zone(socket_id, domain)
+            if directory_name is None:
+                raise PyRAPLCantInitDeviceAPI()
+            directory_names.append(directory_name)
+        return directory_names
 
     def energy(self) -> Tuple[float, ...]:
         """
@@ -124,65 +183,430 @@ class DeviceAPI:
                              socket
         """
         result = [-1] * (self._socket_ids[-1] + 1)
-        for i in range(len(self._sys_files)):
-            device_file = self._sys_files[i]
+        for i, device_file in enumerate(self._thread_files()):
             device_file.seek(0, 0)
             result[self._socket_ids[i]] = float(device_file.readline())
         return tuple(result)
 
 
 class PkgAPI(DeviceAPI):
+    DOMAIN = 'package'
 
-    def __init__(self, socket_ids: Optional[int] = None):
-        DeviceAPI.__init__(self, socket_ids)
+    def __init__(self, socket_ids: Optional[int] = None, topology: Optional[Topology] = None):
+        DeviceAPI.__init__(self, socket_ids, topology)
 
-    def _open_rapl_files(self):
-        directory_name_list = self._get_socket_directory_names()
 
-        rapl_files = []
-        for (directory_name, _) in directory_name_list:
-            rapl_files.append(open(directory_name + '/energy_uj', 'r'))
-        return rapl_files
+class DramAPI(DeviceAPI):
+    DOMAIN = 'dram'
 
+    def __init__(self, socket_ids: Optional[int] = None, topology: Optional[Topology] = None):
+        DeviceAPI.__init__(self, socket_ids, topology)
 
-class DramAPI(DeviceAPI):
 
-    def __init__(self, socket_ids: Optional[int] = None):
-        DeviceAPI.__init__(self, socket_ids)
+class CoreAPI(DeviceAPI):
+    DOMAIN = 'core'
 
-    def _open_rapl_files(self):
-        directory_name_list = self._get_socket_directory_names()
-
-        def get_dram_file(socket_directory_name, rapl_socket_id, ):
-            rapl_device_id = 0
-            while os.path.exists(socket_directory_name + '/intel-rapl:' + str(rapl_socket_id) + ':' +
-                                 str(rapl_device_id)):
-                dirname = socket_directory_name + '/intel-rapl:' + str(rapl_socket_id) + ':' + str(rapl_device_id)
-                f_device = open(dirname + '/name', 'r')
-                if f_device.readline() == 'dram\n':
-                    return open(dirname + '/energy_uj', 'r')
-                rapl_device_id += 1
+    def __init__(self, socket_ids: Optional[int] = None, topology: Optional[Topology] = None):
+        DeviceAPI.__init__(self, socket_ids, topology)
+
+
+class UncoreAPI(DeviceAPI):
+    DOMAIN = 'uncore'
+
+    def __init__(self, socket_ids: Optional[int] = None, topology: Optional[Topology] = None):
+        DeviceAPI.__init__(self, socket_ids, topology)
+
+
+class PsysAPI(DeviceAPI):
+    """
+    API to read the energy consumption of the whole platform
+
+    The psys zone isn't related to a socket, its energy consumption is reported on the first monitored socket
+    """
+    DOMAIN = 'psys'
+
+    def __init__(self, socket_ids: Optional[int] = None, topology: Optional[Topology] = None):
+        DeviceAPI.__init__(self, socket_ids, topology)
+
+    def _get_rapl_file_names(self):
+        directory_name = self._topology.platform_zones.get(self.DOMAIN)
+        if directory_name is None:
             raise PyRAPLCantInitDeviceAPI()
+        self._socket_ids = self._socket_ids[:1]
+        return [directory_name + '/energy_uj']
+
 
-        rapl_files = []
-        for (socket_directory_name, rapl_socket_id) in directory_name_list:
-            rapl_files.append(get_dram_file(socket_directory_name, rapl_socket_id))
+MSR_RAPL_POWER_UNIT = 0x606
+MSR_PKG_ENERGY_STATUS = 0x611
+MSR_DRAM_ENERGY_STATUS = 0x619
+MSR_PP0_ENERGY_STATUS = 0x639
+MSR_PP1_ENERGY_STATUS = 0x641
 
-        return rapl_files
+CPUINFO_FILE_NAME = '/proc/cpuinfo'
 
+#: models of the Intel server cpus (family 6) whose dram energy status register uses a fixed 2^-16 J unit instead of
+#: the unit of the MSR_RAPL_POWER_UNIT register (``rapl_defaults.dram_domain_energy_unit`` of the linux intel_rapl
+#: driver) : Haswell-EP, Broadwell-EP, Xeon Phi (KNL, KNM), Skylake-SP, Ice Lake-SP and D, Sapphire Rapids, Granite
+#: Rapids and Emerald Rapids
+SERVER_DRAM_MODELS = {0x3f, 0x4f, 0x57, 0x85, 0x55, 0x6a, 0x6c, 0x8f, 0xad, 0xcf}
+SERVER_DRAM_ENERGY_UNIT = 1000000 / (1 << 16)
 
-class DeviceAPIFactory:
+
+def read_cpu_model() -> Optional[Tuple[str, int, int]]:
+    """
+    :return: vendor, family and model of the first cpu of the machine, None if they can't be read
     """
-    Factory Returning DeviceAPI
+    fields = {}
+    try:
+        with open(CPUINFO_FILE_NAME, 'r') as cpuinfo_file:
+            for line in cpuinfo_file:
+                if not line.strip():
+                    # end of the first cpu
+                    break
+                key, _, value = line.partition(':')
+                fields[key.strip()] = value.strip()
+        return fields['vendor_id'], int(fields['cpu family']), int(fields['model'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class MsrAPI(DeviceAPI):
+    """
+    API to read energy consumption from the RAPL Model Specific Registers (``/dev/cpu/<cpu_id>/msr`` files)
+
+    The registers of a socket are read on the first cpu of this socket. Each read is a single 8 bytes ``pread`` on the
+    msr file. The energy unit is read once from the ``MSR_RAPL_POWER_UNIT`` register
+
+    Reading msr files requires the ``msr`` kernel module and the read permission on ``/dev/cpu/*/msr``
+
+    Implement the ``ENERGY_STATUS_MSR`` class attribute to define which register must be read
     """
+
+    MSR_FILE_NAME = '/dev/cpu/{}/msr'
+    POWER_UNIT_MSR = MSR_RAPL_POWER_UNIT
+    ENERGY_STATUS_MSR = None
+    TEXT_COUNTER = False
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        DeviceAPI.__init__(self, socket_ids, topology)
+
+    def _read_max_energy_ranges(self):
+        # the energy status register is a 32 bits counter
+        self._energy_units = [self._read_energy_unit(fd) for fd in self._sys_files]
+        return [(1 << 32) * energy_unit for energy_unit in self._energy_units]
+
+    def _get_rapl_file_names(self):
+        socket_cpus = self._topology.socket_cpus()
+        return [self.MSR_FILE_NAME.format(min(socket_cpus[socket_id])) for socket_id in self._socket_ids]
+
+    def _open_rapl_files(self):
+        fds = []
+        try:
+            for file_name in self._sys_file_names:
+                fds.append(os.open(file_name, os.O_RDONLY))
+                # check that the register is available on this cpu
+                self._read_msr(fds[-1], self.ENERGY_STATUS_MSR)
+        except OSError:
+            for fd in fds:
+                os.close(fd)
+            raise PyRAPLCantInitDeviceAPI()
+        return fds
+
     @staticmethod
-    def create_device_api(device: Device, socket_ids: Optional[int]) -> DeviceAPI:
+    def _read_msr(fd: int, msr: int) -> int:
+        return struct.unpack('<Q', os.pread(fd, 8, msr))[0]
+
+    def _read_energy_unit(self, fd: int) -> float:
+        """
+        :return: energy unit of the energy status register (in micro Joules)
+        """
+        energy_status_unit = (self._read_msr(fd, self.POWER_UNIT_MSR) >> 8) & 0x1f
+        return 1000000 / (1 << energy_status_unit)
+
+    def raw_energy(self) -> Tuple[int, ...]:
+        """
+        Get the raw value of the 32 bits energy status register of the device
+        :return int tuple: a tuple containing the register value of the device on each socket (-1 if the socket isn't
+                           monitored)
+        """
+        result = [-1] * (self._socket_ids[-1] + 1)
+        for i in range(len(self._sys_files)):
+            result[self._socket_ids[i]] = self._read_msr(self._sys_files[i], self.ENERGY_STATUS_MSR) & 0xffffffff
+        return tuple(result)
+
+    def energy(self) -> Tuple[float, ...]:
+        result = [-1] * (self._socket_ids[-1] + 1)
+        for i in range(len(self._sys_files)):
+            counter = self._read_msr(self._sys_files[i], self.ENERGY_STATUS_MSR) & 0xffffffff
+            result[self._socket_ids[i]] = counter * self._energy_units[i]
+        return tuple(result)
+
+
+class MsrPkgAPI(MsrAPI):
+    ENERGY_STATUS_MSR = MSR_PKG_ENERGY_STATUS
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        MsrAPI.__init__(self, socket_ids, topology)
+
+
+class MsrDramAPI(MsrAPI):
+    """
+    The energy unit of the dram register is fixed to 2^-16 J on the Intel server cpus listed in ``SERVER_DRAM_MODELS``
+    """
+    ENERGY_STATUS_MSR = MSR_DRAM_ENERGY_STATUS
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        MsrAPI.__init__(self, socket_ids, topology)
+
+    def _read_energy_unit(self, fd: int) -> float:
+        model = read_cpu_model()
+        if model is not None and model[:2] == ('GenuineIntel', 6) and model[2] in SERVER_DRAM_MODELS:
+            return SERVER_DRAM_ENERGY_UNIT
+        return MsrAPI._read_energy_unit(self, fd)
+
+
+class MsrCoreAPI(MsrAPI):
+    ENERGY_STATUS_MSR = MSR_PP0_ENERGY_STATUS
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        MsrAPI.__init__(self, socket_ids, topology)
+
+
+class MsrUncoreAPI(MsrAPI):
+    ENERGY_STATUS_MSR = MSR_PP1_ENERGY_STATUS
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        MsrAPI.__init__(self, socket_ids, topology)
+
+
+MSR_AMD_RAPL_POWER_UNIT = 0xc0010299
+MSR_AMD_CORE_ENERGY_STATUS = 0xc001029a
+MSR_AMD_PKG_ENERGY_STATUS = 0xc001029b
+
+HWMON_DIRECTORY = '/sys/class/hwmon'
+AMD_ENERGY_HWMON_NAME = 'amd_energy'
+
+
+def _core_indexes(topology: Topology, cpu_ids: List[int]) -> Dict[int, int]:
+    """
+    Compute the index of the physical core of each given cpu. Cores are numbered in the order of their first cpu id
+    and cpus of a same core (SMT siblings) are identified with the ``core_id`` sysfs file
+
+    :return: index of the core of each cpu
+    """
+    def read_core_id(cpu_id):
+        with open('/sys/devices/system/cpu/cpu' + str(cpu_id) + '/topology/core_id', 'r') as core_id_file:
+            return int(core_id_file.readline())
+
+    core_indexes = {}
+    cpu_cores = {}
+    for cpu_id in sorted(topology.cpus):
+        core = (topology.cpus[cpu_id], read_core_id(cpu_id))
+        if core not in core_indexes:
+            core_indexes[core] = len(core_indexes)
+        cpu_cores[cpu_id] = core_indexes[core]
+    return {cpu_id: cpu_cores[cpu_id] for cpu_id in cpu_ids}
+
+
+def get_amd_energy_files() -> Dict[str, str]:
+    """
+    Find the counter files of the ``amd_energy`` hwmon driver
+
+    :return: name of the energy input file of each counter indexed by counter label (``'Esocket0'``, ``'Ecore000'``,
+             ...), an empty dictionary if the driver isn't loaded
+    """
+    try:
+        hwmon_names = sorted(os.listdir(HWMON_DIRECTORY))
+    except OSError:
+        return {}
+
+    for hwmon_name in hwmon_names:
+        hwmon_directory = HWMON_DIRECTORY + '/' + hwmon_name
+        try:
+            with open(hwmon_directory + '/name', 'r') as name_file:
+                if name_file.readline().strip() != AMD_ENERGY_HWMON_NAME:
+                    continue
+        except OSError:
+            continue
+
+        energy_files = {}
+        for file_name in os.listdir(hwmon_directory):
+            match = re.match(r'(energy\d+)_label$', file_name)
+            if match is None:
+                continue
+            with open(hwmon_directory + '/' + file_name, 'r') as label_file:
+                energy_files[label_file.readline().strip()] = hwmon_directory + '/' + match.group(1) + '_input'
+        return energy_files
+    return {}
+
+
+class AmdEnergyAPI(DeviceAPI):
+    """
+    API to read the energy consumption of AMD cpu sockets from the ``amd_energy`` hwmon driver (``Esocket<N>``
+    counters, in micro Joules)
+
+    The per-core counters of the driver (``Ecore<N>``) are available with the ``core_energy`` method
+    """
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        DeviceAPI.__init__(self, socket_ids, topology)
+
+    def _get_rapl_file_names(self):
+        self._energy_files = get_amd_energy_files()
+        rapl_file_names = []
+        for socket_id in self._socket_ids:
+            label = 'Esocket' + str(socket_id)
+            if label not in self._energy_files:
+                raise PyRAPLCantInitDeviceAPI()
+            rapl_file_names.append(self._energy_files[label])
+        return rapl_file_names
+
+    def _read_max_energy_ranges(self):
+        # the driver accumulates the hardware counters in 64 bits counters
+        return [-1] * len(self._sys_file_names)
+
+    def core_energy(self, cpu_ids: List[int]) -> Dict[int, float]:
+        """
+        Get the energy consumption of the physical core of each given cpu
+
+        cpus of a same physical core (SMT siblings) have the same value
+
+        :param cpu_ids: cpus whose core energy consumption is returned (ex: ``os.sched_getaffinity(0)``)
+        :return: energy consumption (in micro Joules) of the core of each cpu, indexed by cpu id
+        :raise PyRAPLCantRecordEnergyConsumption: if the driver has no counter for the core of a given cpu
+        """
+        core_files = getattr(self._local, 'core_files', None)
+        if core_files is None:
+            core_files = self._local.core_files = {}
+        result = {}
+        for cpu_id in cpu_ids:
+            if cpu_id not in core_files:
+                core_files[cpu_id] = self._open_core_file(cpu_id)
+            core_file = core_files[cpu_id]
+            core_file.seek(0, 0)
+            result[cpu_id] = float(core_file.readline())
+        return result
+
+    def _open_core_file(self, cpu_id: int):
+        label = 'Ecore{:03d}'.format(_core_indexes(self._topology, [cpu_id])[cpu_id])
+        if label not in self._energy_files:
+            raise PyRAPLCantRecordEnergyConsumption(Device.CORE)
+        return open(self._energy_files[label], 'r')
+
+
+class AmdMsrAPI(MsrAPI):
+    """
+    API to read the energy consumption of AMD cpu sockets from the AMD RAPL Model Specific Registers
+
+    The per-core energy status registers are available with the ``core_energy`` method
+    """
+    POWER_UNIT_MSR = MSR_AMD_RAPL_POWER_UNIT
+    ENERGY_STATUS_MSR = MSR_AMD_PKG_ENERGY_STATUS
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        MsrAPI.__init__(self, socket_ids, topology)
+        self._core_fds = {}
+
+    def core_energy(self, cpu_ids: List[int]) -> Dict[int, float]:
+        """
+        Get the energy consumption of the physical core of each given cpu, read in the core energy status register of
+        this cpu
+
+        :param cpu_ids: cpus whose core energy consumption is returned (ex: ``os.sched_getaffinity(0)``)
+        :return: energy consumption (in micro Joules) of the core of each cpu, indexed by cpu id. The value wraps
+                 around after ``2^32`` energy units, as the package counter
+        :raise PyRAPLCantRecordEnergyConsumption: if the msr file of a given cpu can't be read
+        """
+        result = {}
+        for cpu_id in cpu_ids:
+            if cpu_id not in self._core_fds:
+                try:
+                    self._core_fds[cpu_id] = os.open(self.MSR_FILE_NAME.format(cpu_id), os.O_RDONLY)
+                except OSError:
+                    raise PyRAPLCantRecordEnergyConsumption(Device.CORE)
+            counter = self._read_msr(self._core_fds[cpu_id], MSR_AMD_CORE_ENERGY_STATUS) & 0xffffffff
+            result[cpu_id] = counter * self._energy_units[0]
+        return result
+
+
+class RawEnergyReader:
+    """
+    Read a batch of sysfs energy counters with positional reads on raw file descriptors
+
+    Each file is opened once with ``os.open``. A read is a single ``preadv`` per counter into a preallocated buffer,
+    which avoid the seek + readline + decode sequence of buffered text files
+
+    :param file_names: name of the energy counter files to read
+    :param slots: for each file, index of the list given to ``read_into`` where the counter value must be written
+    """
+
+    BUFFER_SIZE = 32
+
+    def __init__(self, file_names: List[str], slots: List[int]):
+        if len(file_names) != len(slots):
+            raise ValueError("file_names and slots are not of the same length")
+        self._file_names = list(file_names)
+        self._slots = list(slots)
+        self._fds = [os.open(file_name, os.O_RDONLY) for file_name in self._file_names]
+        self._local = threading.local()
+        _FORK_REOPENED.add(self)
+
+    def _thread_counters(self):
+        # each thread uses its own buffers, buffers are padded with whitespaces that are ignored by float()
+        buffers = [bytearray(b' ' * self.BUFFER_SIZE) for _ in self._fds]
+        self._local.lengths = [0] * len(self._fds)
+        self._local.counters = [(i, fd, (buffers[i],), self._slots[i]) for i, fd in enumerate(self._fds)]
+        return self._local.counters
+
+    def _reopen(self):
+        """
+        Reopen the file descriptors of the reader, called in the child process after a fork
+
+        The old file descriptors are only closed once all the files are reopened, they are kept if a file can't be
+        reopened
+
+        :raise OSError: if a file can't be reopened
+        """
+        fds = []
+        try:
+            for file_name in self._file_names:
+                fds.append(os.open(file_name, os.O_RDONLY))
+        except OSError:
+            for fd in fds:
+                os.close(fd)
+            raise
+        old_fds = self._fds
+        self._fds = fds
+        self._local = threading.local()
+        for fd in old_fds:
+            os.close(fd)
+
+    def read_into(self, result: list):
+        """
+        Read every counter and write its value (in micro Joules) in the given list
+
+        :param result: list where values are written, at the slot given for each file
+        """
+        local = self._local
+        try:
+            counters = local.counters
+        except AttributeError:
+            counters = self._thread_counters()
+        lengths = local.lengths
+        for i, fd, buffers, slot in counters:
+            size = os.preadv(fd, buffers, 0)
+            if size < lengths[i]:
+                # the counter has less digits than on the previous read (counter wraparound), clean the old digits
+                buffers[0][size:lengths[i]] = b' ' * (lengths[i] - size)
+            lengths[i] = size
+            result[slot] = float(buffers[0])
+
+    def close(self):
         """
-        :param device: the device corresponding to the DeviceAPI to be created
-        :param socket_ids: param that will be passed to the constructor of the DeviceAPI instance
-        :return: a DeviceAPI instance
+        Close the file descriptors of the reader
         """
-        if device == Device.PKG:
-            return PkgAPI(socket_ids)
-        if device == Device.DRAM:
-            return DramAPI(socket_ids)
+        for fd in self._fds:
+            os.close(fd)
+        self._fds = []
+        self._local = threading.local()
+        _FORK_REOPENED.discard(self)
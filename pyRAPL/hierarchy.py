@@ -0,0 +1,303 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Nested measurements organized as a call tree
+"""
+import contextlib
+import contextvars
+import dataclasses
+import threading
+from dataclasses import dataclass
+from time import monotonic_ns
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pyRAPL import Result
+from pyRAPL.attribution.split import build_result
+from pyRAPL.outputs import Output
+from pyRAPL.sensor import Sensor, Snapshot
+import pyRAPL
+
+#: default maximum age (in micro seconds) of a snapshot reused at a region boundary
+SNAPSHOT_WINDOW = 100
+
+
+def _add(values: List[float], other: List[float]) -> List[float]:
+    return [a + b if a >= 0 and b >= 0 else -1 for a, b in zip(values, other)]
+
+
+def _sub(values: List[float], other: List[float]) -> List[float]:
+    return [a - b if a >= 0 and b >= 0 else -1 for a, b in zip(values, other)]
+
+
+class RegionNode:
+    """
+    Region measured by a ``MeasurementTree``
+
+    :var label: region label
+    :vartype label: str
+    :var path: labels of the enclosing regions and of this region, from the root of the tree
+    :vartype path: Tuple[str, ...]
+    :var timestamp: beginning of the region (in seconds since the epoch)
+    :vartype timestamp: float
+    :var duration: duration of the region (in micro seconds), None while the region is running
+    :vartype duration: Optional[float]
+    :var duration_error: uncertainty of the duration caused by the sensor reads at the region boundaries (in micro
+                         seconds), None while the region is running
+    :vartype duration_error: Optional[float]
+    :var inclusive: energy consumed during the region, in the sensor layout (see ``Sensor``), None while the region
+                    is running
+    :vartype inclusive: Optional[List[float]]
+    :var children: regions nested in this region
+    :vartype children: List[RegionNode]
+    """
+
+    def __init__(self, tree: 'MeasurementTree', label: str, path: Tuple[str, ...], snapshot_begin: Snapshot):
+        self.label = label
+        self.path = path
+        self.timestamp = snapshot_begin.timestamp / 1000000000
+        self.duration = None
+        self.duration_error = None
+        self.inclusive = None
+        self.children = []
+        self._tree = tree
+        self._snapshot_begin = snapshot_begin
+
+    def _end(self, snapshot_end: Snapshot):
+        self.duration = (snapshot_end.middle - self._snapshot_begin.middle) / 1000
+        self.duration_error = (snapshot_end.window + self._snapshot_begin.window) / 2000
+        self.inclusive = snapshot_end.energy - self._snapshot_begin.energy
+        self._snapshot_begin = None
+
+    @property
+    def exclusive(self) -> Optional[List[float]]:
+        """
+        energy consumed during the region but outside of its children, in the sensor layout. Only meaningful if the
+        children don't overlap (regions of concurrent tasks sharing the same parent may overlap)
+        """
+        if self.inclusive is None:
+            return None
+        exclusive = self.inclusive
+        for child in self.children:
+            if child.inclusive is not None:
+                exclusive = _sub(exclusive, child.inclusive)
+        return exclusive
+
+    def result(self, exclusive: bool = False) -> Result:
+        """
+        :param exclusive: if True, return the exclusive energy consumption of the region, otherwise its inclusive
+                          energy consumption
+        :return: energy consumption of the region, labeled with its path (labels separated by ``/``)
+        """
+        energy = self.exclusive if exclusive else self.inclusive
+        result = build_result('/'.join(self.path), self.timestamp, self.duration,
+                              self._tree.sensor.per_device(energy) if energy is not None else None)
+        return dataclasses.replace(result, duration_error=self.duration_error)
+
+    def walk(self) -> Iterator['RegionNode']:
+        """
+        iterate over this region and all its descendants, depth first
+        """
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+@dataclass(frozen=True)
+class PathEnergy:
+    """
+    Energy consumption of all the regions with the same path
+
+    :var path: path of the regions
+    :vartype path: Tuple[str, ...]
+    :var count: number of regions
+    :vartype count: int
+    :var inclusive: total inclusive energy consumption of the regions (the duration of the result is the total duration
+                    of the regions)
+    :vartype inclusive: Result
+    :var exclusive: total exclusive energy consumption of the regions (the duration of the result is the total duration
+                    of the regions)
+    :vartype exclusive: Result
+    """
+    path: Tuple[str, ...]
+    count: int
+    inclusive: Result
+    exclusive: Result
+
+
+class MeasurementTree:
+    """
+    Measure nested regions of code and organize them as a call tree
+
+    Each thread (and each asyncio task) has its own stack of running regions : a region that begins while another one
+    is running in the same context becomes its child. Only one sensor read is done at each region boundary, and
+    boundaries of different regions closer than ``snapshot_window`` micro seconds (the end of a region followed by the
+    end of its parent for example) share the same read. The end of a region is never read from the snapshot of its own
+    beginning, so short regions are still measured
+
+    The tree keeps every measured region until ``clear`` is called, its size isn't bounded : long running programs must
+    periodically export (or aggregate) the ended regions and clear the tree. Regions nested in a top level region that
+    is still running are only forgotten once this top level region ended
+
+    :param sensor: sensor used to measure the energy consumption, if None, the sensor configured by ``pyRAPL.setup``
+                   is used
+    :param snapshot_window: maximum age (in micro seconds) of the last snapshot of a context to be reused at a boundary,
+                            0 to read the sensor at each boundary
+    """
+
+    def __init__(self, sensor: Sensor = None, snapshot_window: float = SNAPSHOT_WINDOW):
+        self._sensor = sensor if sensor is not None else pyRAPL._sensor
+        self._snapshot_window = int(snapshot_window * 1000)
+        # (stack of running regions, last snapshot) of the current context
+        self._state = contextvars.ContextVar('pyRAPL_tree_state', default=((), None))
+        self._roots = []
+        self._lock = threading.Lock()
+
+    @property
+    def sensor(self) -> Sensor:
+        """
+        sensor used by the tree
+        """
+        return self._sensor
+
+    @property
+    def roots(self) -> List[RegionNode]:
+        """
+        top level regions
+        """
+        with self._lock:
+            return list(self._roots)
+
+    @property
+    def current(self) -> Optional[RegionNode]:
+        """
+        innermost running region of the current context, None if no region is running
+        """
+        stack, _ = self._state.get()
+        return stack[-1] if stack else None
+
+    def _snapshot(self, snapshot: Optional[Snapshot]) -> Snapshot:
+        if snapshot is not None and monotonic_ns() - snapshot.after <= self._snapshot_window:
+            return snapshot
+        return self._sensor.snapshot()
+
+    def begin(self, label: str) -> RegionNode:
+        """
+        Begin a region nested in the innermost running region of the current context
+
+        :param label: region label
+        :return: the new region
+        """
+        stack, snapshot = self._state.get()
+        snapshot = self._snapshot(snapshot)
+        parent = stack[-1] if stack else None
+        path = parent.path + (label,) if parent is not None else (label,)
+        node = RegionNode(self, label, path, snapshot)
+        with self._lock:
+            (parent.children if parent is not None else self._roots).append(node)
+        self._state.set((stack + (node,), snapshot))
+        return node
+
+    def end(self) -> RegionNode:
+        """
+        End the innermost running region of the current context
+
+        :return: the ended region
+        :raise RuntimeError: if no region is running in the current context
+        """
+        stack, snapshot = self._state.get()
+        if not stack:
+            raise RuntimeError('no running region to end')
+        node = stack[-1]
+        # the snapshot is only shared between boundaries of different regions, a region never ends on the snapshot
+        # it began with
+        snapshot = self._snapshot(snapshot if snapshot is not node._snapshot_begin else None)
+        node._end(snapshot)
+        self._state.set((stack[:-1], snapshot))
+        return node
+
+    @contextlib.contextmanager
+    def region(self, label: str) -> Iterator[RegionNode]:
+        """
+        Measure a block of code as a region of the tree::
+
+            with tree.region('request'):
+                with tree.region('parse'):
+                    ...
+                with tree.region('query'):
+                    ...
+        """
+        node = self.begin(label)
+        try:
+            yield node
+        finally:
+            self.end()
+
+    def nodes(self) -> Iterator[RegionNode]:
+        """
+        iterate over all the regions of the tree, depth first
+        """
+        for root in self.roots:
+            yield from root.walk()
+
+    def aggregate(self) -> Dict[Tuple[str, ...], PathEnergy]:
+        """
+        Sum the energy consumption and the duration of the ended regions with the same path
+
+        :return: the aggregated energy consumption of each path, in depth first order
+        """
+        totals = {}
+        for node in self.nodes():
+            if node.inclusive is None:
+                continue
+            if node.path not in totals:
+                totals[node.path] = [node.timestamp, 1, node.duration, node.inclusive, node.exclusive]
+                continue
+            total = totals[node.path]
+            total[1] += 1
+            total[2] += node.duration
+            total[3] = _add(total[3], node.inclusive)
+            total[4] = _add(total[4], node.exclusive)
+
+        aggregated = {}
+        for path, (timestamp, count, duration, inclusive, exclusive) in totals.items():
+            label = '/'.join(path)
+            aggregated[path] = PathEnergy(path, count,
+                                          build_result(label, timestamp, duration, self._sensor.per_device(inclusive)),
+                                          build_result(label, timestamp, duration, self._sensor.per_device(exclusive)))
+        return aggregated
+
+    def export(self, output: Output, exclusive: bool = False):
+        """
+        Export the result of each ended region to an output
+
+        :param output: output that will handle the results
+        :param exclusive: if True, export the exclusive energy consumption of the regions, otherwise their inclusive
+                          energy consumption
+        """
+        for node in self.nodes():
+            if node.inclusive is not None:
+                output.add(node.result(exclusive))
+
+    def clear(self):
+        """
+        Forget the ended top level regions (and all their nested regions), to bound the memory used by the tree
+        """
+        with self._lock:
+            self._roots = [root for root in self._roots if root.inclusive is None]
@@ -19,8 +19,15 @@
 # SOFTWARE.
 import functools
 
-from time import time_ns
+from time import time_ns, monotonic_ns, perf_counter_ns
 from pyRAPL import Result
+from pyRAPL.attribution import MarkerRecorder
+from pyRAPL.sensor import Sensor, Snapshot
+from pyRAPL.hierarchy import MeasurementTree
+from pyRAPL.sampling import SamplingPolicy, SampledCalls
+from pyRAPL.calibration import autorange as autorange_runs, correct, get_calibration, measure_runs
+from pyRAPL.alignment import MAX_SPIN, scale_energy, wait_update
+from pyRAPL.result import DEVICE_FIELDS
 from pyRAPL.outputs import PrintOutput, Output
 import pyRAPL
 
@@ -41,23 +48,71 @@ class Measurement:
     :param label: measurement label
 
     :param output: default output to export the recorded energy consumption. If None, the PrintOutput will be used
+
+    :param markers: if not None, the measurement doesn't read the energy counters, it only records a marker (label,
+                    beginning and end timestamps) in this recorder. The energy consumption of the marker is computed
+                    later from the samples of a ``Sampler`` (see ``MarkerRecorder.attribute``) and the measurement has
+                    no result
+
+    :param sensor: sensor used to measure the energy consumption, if None, the sensor configured by ``pyRAPL.setup``
+                   is used
+
+    :param tree: if not None, the measurement is a region of this tree, nested in the running region of the current
+                 context (the sensor of the tree is used). The result of the measurement is the inclusive energy
+                 consumption of the region
+
+    :param precise: if True, ``begin`` and ``end`` busy-wait until each energy counter is updated, so the measurement
+                    is aligned on the counter updates (see ``pyRAPL.alignment``). The measurement begins once every
+                    counter was updated and the energy consumed by each counter between its two updates is scaled to
+                    the duration of the measurement. Ignored in marker and tree modes
+
+    :param max_spin: in precise mode, maximum busy-wait time of ``begin`` and of ``end`` (in micro seconds). If the
+                     counters aren't updated during this time, the measurement isn't aligned on this boundary
+
+    :var spin_time: in precise mode, total busy-wait time of the measurement (in micro seconds)
+    :vartype spin_time: float
+    :var aligned: in precise mode, True if the measurement is aligned on the counter updates at both boundaries
+    :vartype aligned: bool
     """
 
-    def __init__(self, label: str, output: Output = None):
+    def __init__(self, label: str, output: Output = None, markers: MarkerRecorder = None, sensor: Sensor = None,
+                 tree: MeasurementTree = None, precise: bool = False, max_spin: float = MAX_SPIN):
         self.label = label
         self._energy_begin = None
+        self._snapshot_begin = None
         self._ts_begin = None
         self._results = None
         self._output = output if output is not None else PrintOutput()
+        self._markers = markers
+        self._tree = tree
+        self._precise = precise
+        self._max_spin = max_spin
+        self._updates_begin = None
+        self._update_begin = None
+        self.spin_time = 0
+        self.aligned = False
 
-        self._sensor = pyRAPL._sensor
+        self._sensor = sensor if sensor is not None else pyRAPL._sensor
 
     def begin(self):
         """
         Start energy consumption recording
         """
-        self._energy_begin = self._sensor.energy()
-        self._ts_begin = time_ns()
+        if self._markers is not None:
+            self._ts_begin = monotonic_ns()
+            return
+        if self._tree is not None:
+            self._tree.begin(self.label)
+            return
+        if self._precise:
+            self._energy_begin, self._updates_begin, spin, self.aligned = wait_update(self._sensor, self._max_spin)
+            self._update_begin = max(self._updates_begin)
+            self._ts_begin = time_ns()
+            self.spin_time = spin / 1000
+            return
+        self._snapshot_begin = self._sensor.snapshot()
+        self._energy_begin = self._snapshot_begin.energy
+        self._ts_begin = self._snapshot_begin.timestamp
 
     def __enter__(self):
         """use Measurement as a context """
@@ -69,21 +124,48 @@ class Measurement:
         if(exc_type is None):
             self.export()
 
-    def end(self):
+    def end(self, number: int = 1):
         """
         End energy consumption recording
+
+        :param number: in marker mode, number of runs of the measured code between ``begin`` and ``end``
         """
-        ts_end = time_ns()
-        energy_end = self._sensor.energy()
+        if self._markers is not None:
+            self._markers.record(self.label, self._ts_begin, monotonic_ns(), number)
+            return
+        if self._tree is not None:
+            self._results = self._tree.end().result()
+            return
+        if self._precise:
+            self._end_precise()
+            return
+        self._compute_result(self._sensor.snapshot())
+
+    def _end_precise(self):
+        end = perf_counter_ns()
+        energy_end, updates_end, spin, aligned = wait_update(self._sensor, self._max_spin)
+        self.spin_time += spin / 1000
+        self.aligned = self.aligned and aligned
+
+        periods = [update_end - update_begin for update_begin, update_end in zip(self._updates_begin, updates_end)]
+        delta = scale_energy(energy_end - self._energy_begin, end - self._update_begin, periods)
+        energy = {}
+        for device, values in self._sensor.per_device(delta).items():
+            energy[DEVICE_FIELDS[device]] = values if empty_energy_result(values) else None
+        self._results = Result(self.label, self._ts_begin / 1000000000, (end - self._update_begin) / 1000, **energy)
 
-        delta = energy_end - self._energy_begin
-        duration = ts_end - self._ts_begin
-        pkg = delta[0::2]  # get odd numbers
-        pkg = pkg if empty_energy_result(pkg) else None  # set result to None if its contains only -1
-        dram = delta[1::2]  # get even numbers
-        dram = dram if empty_energy_result(dram) else None  # set result to None if its contains only -1
+    def _compute_result(self, snapshot_end: Snapshot):
+        delta = snapshot_end.energy - self._energy_begin
+        duration = snapshot_end.middle - self._snapshot_begin.middle
+        # each boundary is known up to half of its read window
+        duration_error = (self._snapshot_begin.window + snapshot_end.window) / 2
+        energy = {}
+        for device, values in self._sensor.per_device(delta).items():
+            # set result to None if its contains only -1
+            energy[DEVICE_FIELDS[device]] = values if empty_energy_result(values) else None
 
-        self._results = Result(self.label, self._ts_begin / 1000000000, duration / 1000, pkg, dram)
+        self._results = Result(self.label, self._ts_begin / 1000000000, duration / 1000,
+                               duration_error=duration_error / 1000, **energy)
 
     def export(self, output: Output = None):
         """
@@ -91,6 +173,9 @@ class Measurement:
 
         :param output: output that will handle the measure, if None, the default output will be used
         """
+        if self._markers is not None:
+            # the result is computed later from the recorded marker
+            return
         if output is None:
             self._output.add(self._results)
         else:
@@ -104,29 +189,109 @@ class Measurement:
         return self._results
 
 
-def measureit(_func=None, *, output: Output = None, number: int = 1):
+def measureit(_func=None, *, output: Output = None, number: int = 1, markers: MarkerRecorder = None,
+              sensor: Sensor = None, tree: MeasurementTree = None, sampling: SamplingPolicy = None,
+              autorange: bool = False):
     """
     Measure the energy consumption of monitored devices during the execution of the decorated function (if multiple runs it will measure the mean energy)
 
     :param output: output instance that will receive the power consummation data
     :param number: number of iteration in the loop in case you need multiple runs or the code is too fast to be measured
+    :param markers: if not None, only record a marker for each call of the decorated function in this recorder (see
+                    ``Measurement``)
+    :param sensor: sensor used to measure the energy consumption, if None, the sensor configured by ``pyRAPL.setup``
+                   is used
+    :param tree: if not None, measure each call of the decorated function as a region of this tree (see
+                 ``Measurement``)
+    :param sampling: if not None, only the calls chosen by this policy are measured and exported, the other calls only
+                     increment a counter. The ``sampling`` attribute of the decorated function (a ``SampledCalls``
+                     instance) gives an estimation of the energy consumption of all the calls (see
+                     ``SampledCalls.estimate``)
+    :param autorange: if True, the number of runs is chosen on the first call so that the measure lasts long enough to
+                      be well above the resolution of the RAPL counters (see ``pyRAPL.calibration.autorange``). The
+                      overhead of the measure, calibrated once for each sensor, is subtracted from the result and the
+                      uncertainty of the result is given in its ``error`` attribute. ``number``, ``markers``, ``tree``
+                      and ``sampling`` are ignored
     """
 
     def decorator_measure_energy(func):
         @functools.wraps(func)
         def wrapper_measure(*args, **kwargs):
-            sensor = Measurement(func.__name__, output)
-            sensor.begin()
+            measure = Measurement(func.__name__, output, markers, sensor, tree)
+            measure.begin()
+            for i in range(number):
+                val = func(*args, **kwargs)
+            measure.end(number)
+            if markers is not None:
+                return val
+            measure._results = measure._results / number
+            measure.export()
+            return val
+
+        if autorange:
+            return _autorange_wrapper(func, output, sensor)
+        if sampling is None:
+            return wrapper_measure
+
+        sampled_calls = SampledCalls(func.__name__, sampling)
+
+        @functools.wraps(func)
+        def wrapper_sample(*args, **kwargs):
+            sampled_calls.calls += 1
+            if sampled_calls.calls < sampled_calls.next_call:
+                if number == 1:
+                    return func(*args, **kwargs)
+                for i in range(number):
+                    val = func(*args, **kwargs)
+                return val
+
+            ts_begin = perf_counter_ns()
+            measure = Measurement(func.__name__, output, markers, sensor, tree)
+            measure.begin()
+            ts_func_begin = perf_counter_ns()
             for i in range(number):
                 val = func(*args, **kwargs)
-            sensor.end()
-            sensor._results = sensor._results / number
-            sensor.export()
+            ts_func_end = perf_counter_ns()
+            measure.end(number)
+            # energy consumption of the whole call (the exported result is the energy consumption of one run)
+            result = measure.result
+            if markers is None:
+                measure._results = measure._results / number
+                measure.export()
+            overhead = ts_func_begin - ts_begin + perf_counter_ns() - ts_func_end
+            sampled_calls.record(result, ts_begin, overhead)
             return val
-        return wrapper_measure
+
+        wrapper_sample.sampling = sampled_calls
+        return wrapper_sample
 
     if _func is None:
         # to ensure the working system when you call it with parameters or without parameters
         return decorator_measure_energy
     else:
         return decorator_measure_energy(_func)
+
+
+def _autorange_wrapper(func, output: Output, sensor: Sensor):
+    output = output if output is not None else PrintOutput()
+    numbers = []
+
+    @functools.wraps(func)
+    def wrapper_autorange(*args, **kwargs):
+        val = None
+
+        def run():
+            nonlocal val
+            val = func(*args, **kwargs)
+
+        calibration = get_calibration(sensor)
+        # the runs are measured like the calibration measures, so the calibrated overhead matches
+        if not numbers:
+            number, result = autorange_runs(run, func.__name__, sensor)
+            numbers.append(number)
+        else:
+            number = numbers[0]
+            result = measure_runs(run, number, func.__name__, sensor)
+        output.add(correct(result, number, calibration))
+        return val
+    return wrapper_autorange
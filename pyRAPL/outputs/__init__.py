@@ -47,6 +47,7 @@ from .output import Output
 from .buffered_output import BufferedOutput
 from .printoutput import PrintOutput
 from .csvoutput import CSVOutput
+from .aggregated_output import AggregatedOutput
 
 try:
     from .mongooutput import MongoOutput
@@ -0,0 +1,173 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import atexit
+import functools
+import logging
+import threading
+import weakref
+from typing import Dict, List, Optional
+
+from pyRAPL import Result
+from pyRAPL.result import DEVICE_FIELDS, Summary
+from pyRAPL.stats import RunningDistribution
+from pyRAPL.outputs import Output, BufferedOutput
+
+#: default upper bounds of the energy histogram buckets (in micro Joules, from 1uJ to 1kJ)
+DEFAULT_ENERGY_BUCKETS = [10.0 ** k for k in range(10)]
+
+#: default upper bounds of the duration histogram buckets (in micro seconds, from 1us to 1000s)
+DEFAULT_DURATION_BUCKETS = [10.0 ** k for k in range(10)]
+
+
+class _LabelAggregate:
+
+    def __init__(self, result: Result, energy_buckets: List[float], duration_buckets: List[float]):
+        self.timestamp = result.timestamp
+        self.count = 0
+        self.duration = RunningDistribution(1, duration_buckets)
+        self.energy = {}
+        self._energy_buckets = energy_buckets
+
+    def update(self, result: Result):
+        self.count += 1
+        self.duration.update([result.duration])
+        for field_name in DEVICE_FIELDS.values():
+            values = getattr(result, field_name)
+            if values is None:
+                continue
+            if field_name not in self.energy:
+                self.energy[field_name] = RunningDistribution(len(values), self._energy_buckets)
+            self.energy[field_name].update(values)
+
+    def summary(self, label: str) -> Summary:
+        energy = {field_name: distribution.distribution() for field_name, distribution in self.energy.items()}
+        return Summary(label, self.timestamp, self.count, self.duration.distribution(), **energy)
+
+
+def _close_at_exit(output_ref: weakref.ref):
+    output = output_ref()
+    if output is not None:
+        output.close()
+
+
+def _periodic_flush(output_ref: weakref.ref, stop_event: threading.Event, interval: float):
+    # the thread only holds a weak reference, the stop event is set once the output is garbage collected
+    while not stop_event.wait(interval):
+        output = output_ref()
+        if output is None:
+            return
+        try:
+            output.flush()
+        except Exception:
+            logging.exception('pyRAPL : can\'t export summaries')
+        del output
+
+
+class AggregatedOutput(Output):
+    """
+    Aggregate the results with the same label in memory and export one summary per label (see ``Summary``) to another
+    output, periodically and when the program exits
+
+    For each label, the summary contains the number of results and the distribution (sum, minimum, maximum, mean,
+    variance and histogram) of the duration and of the energy consumption of each device on each socket. The
+    aggregation is reset after each flush
+
+    The exit handler and the flush thread don't keep the output alive : the summaries of an output garbage collected
+    before being closed are lost
+
+    :param output: output that will handle the summaries (with its ``add_summary`` method). If this output is a
+                   ``BufferedOutput``, it is saved after each flush
+    :param interval: time between two flushes (in seconds), if None, the summaries are only exported when ``flush``
+                     or ``close`` is called and when the program exits
+    :param energy_buckets: sorted upper bounds of the energy histogram buckets (in micro Joules)
+    :param duration_buckets: sorted upper bounds of the duration histogram buckets (in micro seconds)
+    """
+
+    def __init__(self, output: Output, interval: Optional[float] = None,
+                 energy_buckets: List[float] = DEFAULT_ENERGY_BUCKETS,
+                 duration_buckets: List[float] = DEFAULT_DURATION_BUCKETS):
+        Output.__init__(self)
+        self._output = output
+        self._energy_buckets = list(energy_buckets)
+        self._duration_buckets = list(duration_buckets)
+        self._aggregates = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        if interval is not None:
+            self._thread = threading.Thread(target=_periodic_flush, args=(weakref.ref(self), self._stop_event, interval),
+                                            name='pyRAPL-aggregator', daemon=True)
+            self._thread.start()
+            weakref.finalize(self, self._stop_event.set)
+        self._close_at_exit = functools.partial(_close_at_exit, weakref.ref(self))
+        atexit.register(self._close_at_exit)
+
+    def add(self, result: Result):
+        """
+        Add the given result to the aggregation of its label
+
+        :param result: result to aggregate
+        """
+        with self._lock:
+            aggregate = self._aggregates.get(result.label)
+            if aggregate is None:
+                aggregate = _LabelAggregate(result, self._energy_buckets, self._duration_buckets)
+                self._aggregates[result.label] = aggregate
+            aggregate.update(result)
+
+    def summaries(self) -> Dict[str, Summary]:
+        """
+        :return: the current summary of each label, without resetting the aggregation
+        """
+        with self._lock:
+            return {label: aggregate.summary(label) for label, aggregate in self._aggregates.items()}
+
+    def flush(self):
+        """
+        Export the summary of each label to the output and reset the aggregation
+        """
+        with self._flush_lock:
+            with self._lock:
+                aggregates = self._aggregates
+                self._aggregates = {}
+            if not aggregates:
+                return
+            for label, aggregate in aggregates.items():
+                self._output.add_summary(aggregate.summary(label))
+            if isinstance(self._output, BufferedOutput):
+                self._output.save()
+
+    def close(self):
+        """
+        Stop the periodic flush and export the remaining summaries
+        """
+        atexit.unregister(self._close_at_exit)
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
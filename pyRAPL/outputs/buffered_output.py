@@ -20,8 +20,25 @@
 from typing import List
 
 from pyRAPL import Result
+from pyRAPL.result import DEVICE_FIELDS
 from pyRAPL.outputs import Output
 
+#: energy columns that are always present in the buffered data, even if the device energy consumption wasn't recorded
+DEFAULT_ENERGY_COLUMNS = ['pkg', 'dram']
+
+#: suffixes of the columns describing a distribution, added by ``add_summary`` to the column of the total value
+DISTRIBUTION_SUFFIXES = ['_min', '_max', '_mean', '_variance', '_buckets', '_histogram']
+
+
+def _add_distribution(line: dict, name: str, distribution, i: int):
+    line[name] = distribution.sums[i]
+    line[name + '_min'] = distribution.mins[i]
+    line[name + '_max'] = distribution.maxs[i]
+    line[name + '_mean'] = distribution.means[i]
+    line[name + '_variance'] = distribution.variances[i]
+    line[name + '_buckets'] = list(distribution.buckets)
+    line[name + '_histogram'] = list(distribution.histograms[i])
+
 
 class BufferedOutput(Output):
     """
@@ -41,15 +58,60 @@ class BufferedOutput(Output):
         """
         Add the given data to the buffer
 
+        One line is added for each socket. A line contains the energy consumption of the recorded devices and of the
+        devices in ``DEFAULT_ENERGY_COLUMNS`` (None if not recorded), the uncertainty of the duration and of the
+        energy consumption (``_error`` columns) if the result has one and the number of aggregated measures
+        (``count``) if the result is the total of several measures
+
         :param result: data that must be added to the buffer
         """
-        x = dict(vars(result))
-        x['timestamp'] = x['timestamp']
-        for i in range(len(result.pkg)):
+        energy = {}
+        for field_name in DEVICE_FIELDS.values():
+            values = getattr(result, field_name)
+            if values is not None or field_name in DEFAULT_ENERGY_COLUMNS:
+                energy[field_name] = values
+        socket_number = max([len(values) for values in energy.values() if values], default=0)
+
+        for i in range(socket_number):
+            x = {'label': result.label, 'timestamp': result.timestamp, 'duration': result.duration}
+            for field_name, values in energy.items():
+                x[field_name] = values[i] if values and i < len(values) else None
+            if result.count is not None:
+                x['count'] = result.count
+            if result.duration_error is not None:
+                x['duration_error'] = result.duration_error
+            if result.error is not None:
+                for device, values in result.error.items():
+                    x[DEVICE_FIELDS[device] + '_error'] = values[i] if i < len(values) else None
+            x['socket'] = i
+            self._buffer.append(x)
+
+    def add_summary(self, summary):
+        """
+        Add the given aggregated measures to the buffer
+
+        One line is added for each socket. A line contains the number of aggregated measures (``count``) and, for the
+        duration and the energy consumption of each recorded device, the total value (same column as ``add``) and the
+        ``_min``, ``_max``, ``_mean``, ``_variance`` and ``_histogram`` columns. The histogram buckets are stored in the
+        ``_buckets`` columns
+
+        :param summary: aggregated measures that must be added to the buffer
+        """
+        distributions = {field_name: getattr(summary, field_name) for field_name in DEVICE_FIELDS.values()}
+        distributions = {field_name: distribution for field_name, distribution in distributions.items()
+                         if distribution is not None}
+        socket_number = max([len(distribution.counts) for distribution in distributions.values()], default=0)
+
+        for i in range(socket_number):
+            x = {'label': summary.label, 'timestamp': summary.timestamp, 'count': summary.count}
+            _add_distribution(x, 'duration', summary.duration, 0)
+            for field_name in DEFAULT_ENERGY_COLUMNS:
+                x[field_name] = None
+            for field_name, distribution in distributions.items():
+                if i < len(distribution.counts) and distribution.counts[i] > 0:
+                    _add_distribution(x, field_name, distribution, i)
             x['socket'] = i
-            x['pkg'] = result.pkg[i]
-            x['dram'] = result.dram[i] if result.dram else None
-            self._buffer.append(x.copy())
+            self._buffer.append(x)
 
     @property
     def buffer(self) -> List[Result]:
@@ -18,9 +18,19 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import os
+from typing import List, Optional
 
-from pyRAPL import Result
-from pyRAPL.outputs import BufferedOutput
+import pyRAPL
+from pyRAPL import Device
+from pyRAPL.result import DEVICE_FIELDS
+from pyRAPL.outputs import BufferedOutput, Output
+from pyRAPL.outputs.buffered_output import DISTRIBUTION_SUFFIXES
+
+
+def _format(value) -> str:
+    if isinstance(value, list):
+        return ' '.join(str(item) for item in value)
+    return str(value)
 
 
 class CSVOutput(BufferedOutput):
@@ -37,19 +47,56 @@ class CSVOutput(BufferedOutput):
     :param separator: character used to separate columns in the csv file
 
     :param append: Turn it to False to delete file if it already exist.
+
+    :param devices: devices whose energy consumption is written in the file (one column per device). If None, the
+                    devices of the sensor configured by ``pyRAPL.setup`` are written (PKG and DRAM if ``pyRAPL.setup``
+                    wasn't called)
+
+    :param summary: Turn it to True to write the columns of the aggregated measures (see
+                    ``BufferedOutput.add_summary``) : ``count`` and the distribution columns of the duration and of
+                    each device. Histograms and buckets are written as space separated values. Otherwise, only the
+                    total duration and energy consumption of the aggregated measures are written, followed by the
+                    uncertainty of the duration (``duration_error``) and of the energy consumption of each device
+                    (``_error`` columns)
+
+    When results are appended to an existing file, the columns of its header are written
     """
-    def __init__(self, filename: str, separator: str = ',', append: bool = True):
+    def __init__(self, filename: str, separator: str = ',', append: bool = True,
+                 devices: Optional[List[Device]] = None, summary: bool = False):
         BufferedOutput.__init__(self)
         self._separator = separator
         self._buffer = []
         self._filename = filename
 
+        if devices is None:
+            devices = pyRAPL._sensor.devices if pyRAPL._sensor is not None else [Device.PKG, Device.DRAM]
+        self._summary = summary
+        energy_columns = [DEVICE_FIELDS[device] for device in devices]
+        if summary:
+            value_columns = ['count'] + [column + suffix for column in ['duration'] + energy_columns
+                                         for suffix in [''] + DISTRIBUTION_SUFFIXES]
+        else:
+            value_columns = (['duration'] + energy_columns + ['duration_error'] +
+                             [column + '_error' for column in energy_columns])
+        self._columns = ['label', 'timestamp'] + value_columns + ['socket']
+
         # Create file with header if it not exist or if append is False
         if not os.path.exists(self._filename) or not append:
-            header = separator.join(list(Result.__annotations__.keys()) + ['socket']) + '\n'
+            header = separator.join(self._columns) + '\n'
 
             with open(self._filename, 'w+') as csv_file:
                 csv_file.writelines(header)
+        else:
+            with open(self._filename, 'r') as csv_file:
+                header = csv_file.readline().rstrip('\n')
+            if header:
+                self._columns = header.split(separator)
+
+    def add_summary(self, summary):
+        if self._summary:
+            BufferedOutput.add_summary(self, summary)
+        else:
+            Output.add_summary(self, summary)
 
     def _output_buffer(self):
         """
@@ -58,5 +105,5 @@ class CSVOutput(BufferedOutput):
         """
         with open(self._filename, 'a+') as csv_file:
             for data in self._buffer:
-                line = self._separator.join([str(column) for column in data.values()]) + '\n'
+                line = self._separator.join([_format(data.get(column)) for column in self._columns]) + '\n'
                 csv_file.writelines(line)
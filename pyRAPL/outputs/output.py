@@ -18,6 +18,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 from pyRAPL import Result
+from pyRAPL.result import Summary
 
 
 class Output:
@@ -32,3 +33,14 @@ class Output:
         :param result: data to handle
         """
         raise NotImplementedError()
+
+    def add_summary(self, summary: Summary):
+        """
+        Handle the aggregation of several measures (see ``AggregatedOutput``)
+
+        By default, handle a ``Result`` containing the number of aggregated measures (``count``), their total duration
+        and their total energy consumption
+
+        :param summary: aggregated measures to handle
+        """
+        self.add(summary.result())
@@ -20,6 +20,7 @@
 import time
 
 from pyRAPL import Result
+from pyRAPL.result import DEVICE_FIELDS
 from pyRAPL.outputs import Output
 
 
@@ -51,10 +52,13 @@ class PrintOutput(Output):
             return str(result)
         else:
             s = f"""Label : {result.label}\nBegin : {time.ctime(result.timestamp)}\nDuration : {result.duration:10.4f} us"""
-            if result.pkg is not None:
-                s += f"""\n-------------------------------\nPKG :{print_energy(result.pkg)}"""
-            if result.dram is not None:
-                s += f"""\n-------------------------------\nDRAM :{print_energy(result.dram)}"""
+            close_section = False
+            for device, field_name in DEVICE_FIELDS.items():
+                energy = getattr(result, field_name)
+                if energy is not None:
+                    s += f"""\n-------------------------------\n{device.name} :{print_energy(energy)}"""
+                    close_section = close_section or field_name != 'pkg'
+            if close_section:
                 s += '\n-------------------------------'
             return s
 
@@ -0,0 +1,377 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+DeviceAPI reading the energy counters of the kernel ``power`` PMU with ``perf_event_open``
+
+The counters are 64 bits counters that don't wrap around. Opening them only requires the ``CAP_PERFMON`` capability
+or a ``kernel.perf_event_paranoid`` value lower or equal to 0, the read permission on powercap files isn't needed.
+
+All the power events of a socket are opened in the same event group (on the cpu of the socket given by the power PMU
+``cpumask``) and read with a single ``read`` syscall, so the values of the different devices of a socket are coherent.
+Groups are shared by the APIs of the process and closed when they are no longer used.
+
+System calls are done through a ``PerfEventSyscalls`` instance (class attribute ``PerfEventAPI.SYSCALLS``) that can be
+replaced to use the API without hardware support.
+"""
+import ctypes
+import os
+import platform
+import struct
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional
+
+from pyRAPL import Device, PyRAPLCantInitDeviceAPI
+from pyRAPL.device_api import DeviceAPI, _FORK_REOPENED
+from pyRAPL.backend import Backend, REGISTRY
+from pyRAPL.topology import Topology, parse_cpu_list
+
+POWER_PMU_DIRECTORY = '/sys/bus/event_source/devices/power'
+
+#: maximum age (in micro seconds) of the values of an event group shared between its users (RAPL update interval)
+SHARED_READ_WINDOW = 1000
+
+#: name of the power PMU event of each device
+POWER_EVENTS = {
+    Device.PKG: 'energy-pkg',
+    Device.DRAM: 'energy-ram',
+    Device.CORE: 'energy-cores',
+    Device.UNCORE: 'energy-gpu',
+    Device.PSYS: 'energy-psys',
+}
+
+PERF_FORMAT_GROUP = 1 << 3
+PERF_FLAG_FD_CLOEXEC = 1 << 3
+
+#: perf_event_open syscall number for each architecture
+PERF_EVENT_OPEN_SYSCALL_NUMBERS = {'x86_64': 298, 'i386': 336, 'i686': 336}
+
+
+class PerfEventAttr(ctypes.Structure):
+    """
+    First version (64 bytes) of the ``perf_event_attr`` structure
+    """
+    _fields_ = [
+        ('type', ctypes.c_uint32),
+        ('size', ctypes.c_uint32),
+        ('config', ctypes.c_uint64),
+        ('sample_period', ctypes.c_uint64),
+        ('sample_type', ctypes.c_uint64),
+        ('read_format', ctypes.c_uint64),
+        ('flags', ctypes.c_uint64),
+        ('wakeup_events', ctypes.c_uint32),
+        ('bp_type', ctypes.c_uint32),
+        ('config1', ctypes.c_uint64),
+    ]
+
+
+class PerfEventSyscalls:
+    """
+    System calls used by the ``PerfEventAPI``
+    """
+
+    def __init__(self):
+        self._syscall = None
+
+    def perf_event_open(self, attr: PerfEventAttr, pid: int, cpu: int, group_fd: int, flags: int) -> int:
+        """
+        Open a perf event
+
+        :return: file descriptor of the event
+        :raise OSError: if the event can't be opened
+        """
+        if self._syscall is None:
+            syscall_number = PERF_EVENT_OPEN_SYSCALL_NUMBERS.get(platform.machine())
+            if syscall_number is None:
+                raise OSError('perf_event_open is not supported on ' + platform.machine())
+            libc = ctypes.CDLL(None, use_errno=True)
+            libc.syscall.restype = ctypes.c_long
+
+            def syscall(*args):
+                return libc.syscall(syscall_number, *args)
+            self._syscall = syscall
+
+        fd = self._syscall(ctypes.byref(attr), ctypes.c_int(pid), ctypes.c_int(cpu), ctypes.c_int(group_fd),
+                           ctypes.c_ulong(flags))
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return fd
+
+    def read(self, fd: int, size: int) -> bytes:
+        """
+        Read the value of an event (or of an event group)
+        """
+        return os.read(fd, size)
+
+    def close(self, fd: int):
+        """
+        Close an event
+        """
+        os.close(fd)
+
+
+def _read_first_line(file_name: str) -> str:
+    with open(file_name, 'r') as event_file:
+        return event_file.readline().strip()
+
+
+def read_power_events() -> Dict[str, tuple]:
+    """
+    Read the description of the power PMU events in sysfs
+
+    :return: for each available event (indexed by name), a tuple containing the event config and its scale to micro
+             Joules. An empty dictionary if the power PMU isn't available
+    """
+    try:
+        event_names = os.listdir(POWER_PMU_DIRECTORY + '/events')
+    except OSError:
+        return {}
+
+    events = {}
+    for event_name in POWER_EVENTS.values():
+        if event_name not in event_names:
+            continue
+        event_file_name = POWER_PMU_DIRECTORY + '/events/' + event_name
+        config = 0
+        for term in _read_first_line(event_file_name).split(','):
+            key, _, value = term.partition('=')
+            if key == 'event':
+                config |= int(value, 0)
+            elif key == 'umask':
+                config |= int(value, 0) << 8
+        scale = float(_read_first_line(event_file_name + '.scale'))
+        unit = _read_first_line(event_file_name + '.unit') if event_name + '.unit' in event_names else 'Joules'
+        events[event_name] = (config, scale * 1000000 if unit == 'Joules' else scale)
+    return events
+
+
+def read_power_pmu_cpus(topology: Topology) -> Dict[int, int]:
+    """
+    Read the cpus on which the power PMU events must be opened (power PMU ``cpumask``)
+
+    :param topology: topology of the machine
+    :return: for each cpu socket, the cpu on which its events are opened. The first cpu of the socket if the socket
+             isn't in the cpumask or if the cpumask can't be read
+    """
+    socket_cpus = {socket_id: min(cpus) for socket_id, cpus in topology.socket_cpus().items()}
+    try:
+        cpumask = parse_cpu_list(_read_first_line(POWER_PMU_DIRECTORY + '/cpumask'))
+    except (OSError, ValueError):
+        return socket_cpus
+    for cpu in reversed(cpumask):
+        if cpu in topology.cpus:
+            socket_cpus[topology.cpus[cpu]] = cpu
+    return socket_cpus
+
+
+def _close_events(syscalls: PerfEventSyscalls, fds: List[int]):
+    for fd in reversed(fds):
+        syscalls.close(fd)
+    fds.clear()
+
+
+class PerfEventGroup:
+    """
+    Group of the power events of a socket, read with a single ``read`` syscall
+
+    Values read are shared by the users of the group: a user gets the values of the last read if this read was done
+    after its own previous read and less than ``SHARED_READ_WINDOW`` micro seconds ago, otherwise, the group is read
+    again. When the APIs of all the devices are read one after another (as done by the ``Sensor``), the group is read
+    only once. Reads are serialized by a lock
+
+    Events that can't be opened are left out of the group, the events of the group are given by ``event_names``. The
+    events are closed with ``close`` or when the group is garbage collected
+
+    :param syscalls: system calls used to open and read the events
+    :param cpu: cpu on which the events are opened
+    :param power_type: type of the power PMU
+    :param events: config and scale of each event of the group, indexed by event name
+    :raise OSError: if none of the events can be opened
+    """
+
+    def __init__(self, syscalls: PerfEventSyscalls, cpu: int, power_type: int, events: Dict[str, tuple]):
+        self._syscalls = syscalls
+        self._fds = []
+        self.event_names = []
+        error = OSError('no power event')
+        for event_name, (config, _) in events.items():
+            attr = PerfEventAttr()
+            attr.type = power_type
+            attr.size = ctypes.sizeof(PerfEventAttr)
+            attr.config = config
+            attr.read_format = PERF_FORMAT_GROUP
+            group_fd = self._fds[0] if self._fds else -1
+            try:
+                self._fds.append(syscalls.perf_event_open(attr, -1, cpu, group_fd, PERF_FLAG_FD_CLOEXEC))
+            except OSError as open_error:
+                error = open_error
+                continue
+            self.event_names.append(event_name)
+        if not self._fds:
+            raise error
+        self._close_finalizer = weakref.finalize(self, _close_events, syscalls, self._fds)
+        self._scales = [events[event_name][1] for event_name in self.event_names]
+        self._read_size = 8 * (len(self._fds) + 1)
+        self._format = '<' + 'Q' * (len(self._fds) + 1)
+        self._values = {}
+        # number of reads of the group, time of the last read and read generation last used by each consumer
+        self._generation = 0
+        self._read_time = 0
+        self._consumers = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        _FORK_REOPENED.add(self)
+
+    def _reopen(self):
+        """
+        Called in the child process after a fork: the events are inherited, only the lock (that may have been held by
+        another thread of the parent) is renewed
+        """
+        self._lock = threading.Lock()
+
+    def read(self, consumer) -> Dict[str, float]:
+        """
+        :param consumer: object that use the values
+        :return: value of each event of the group in micro Joules
+        """
+        with self._lock:
+            if (not self._values or self._consumers.get(consumer, 0) >= self._generation or
+                    time.monotonic_ns() - self._read_time > SHARED_READ_WINDOW * 1000):
+                counters = struct.unpack(self._format, self._syscalls.read(self._fds[0], self._read_size))[1:]
+                self._values = {event_name: counter * scale
+                                for event_name, counter, scale in zip(self.event_names, counters, self._scales)}
+                self._generation += 1
+                self._read_time = time.monotonic_ns()
+            self._consumers[consumer] = self._generation
+            return self._values
+
+    def close(self):
+        """
+        Close the events of the group
+        """
+        self._close_finalizer()
+        _FORK_REOPENED.discard(self)
+
+
+#: event groups shared by the PerfEventAPI instances, indexed by syscall shim and cpu. Groups are only referenced by
+#: the APIs using them and are closed once all these APIs are garbage collected
+_GROUPS = weakref.WeakValueDictionary()
+
+
+def _get_group(syscalls: PerfEventSyscalls, cpu: int, power_type: int, events: Dict[str, tuple]) -> PerfEventGroup:
+    key = (id(syscalls), cpu)
+    group = _GROUPS.get(key)
+    if group is None:
+        group = PerfEventGroup(syscalls, cpu, power_type, events)
+        _GROUPS[key] = group
+    return group
+
+
+class PerfEventAPI(DeviceAPI):
+    """
+    API to read energy consumption from the kernel ``power`` PMU with ``perf_event_open``
+
+    Implement the ``DEVICE`` class attribute to define which device must be read
+    """
+
+    SYSCALLS = PerfEventSyscalls()
+    DEVICE = None
+    TEXT_COUNTER = False
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        DeviceAPI.__init__(self, socket_ids, topology)
+
+    def _get_rapl_file_names(self):
+        self._events = read_power_events()
+        self._event_name = POWER_EVENTS[self.DEVICE]
+        if self._event_name not in self._events:
+            raise PyRAPLCantInitDeviceAPI()
+        return [POWER_PMU_DIRECTORY + '/events/' + self._event_name] * len(self._socket_ids)
+
+    def _open_rapl_files(self):
+        try:
+            power_type = int(_read_first_line(POWER_PMU_DIRECTORY + '/type'))
+            pmu_cpus = read_power_pmu_cpus(self._topology)
+            groups = [_get_group(self.SYSCALLS, pmu_cpus[socket_id], power_type, self._events)
+                      for socket_id in self._socket_ids]
+        except OSError:
+            raise PyRAPLCantInitDeviceAPI()
+        if any(self._event_name not in group.event_names for group in groups):
+            # the event of the device couldn't be opened on one of the sockets
+            raise PyRAPLCantInitDeviceAPI()
+        return groups
+
+    def _read_max_energy_ranges(self):
+        # 64 bits counters
+        return [-1] * len(self._sys_files)
+
+    def energy(self):
+        result = [-1] * (self._socket_ids[-1] + 1)
+        for i in range(len(self._sys_files)):
+            result[self._socket_ids[i]] = self._sys_files[i].read(self)[self._event_name]
+        return tuple(result)
+
+
+class PerfPkgAPI(PerfEventAPI):
+    DEVICE = Device.PKG
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        PerfEventAPI.__init__(self, socket_ids, topology)
+
+
+class PerfDramAPI(PerfEventAPI):
+    DEVICE = Device.DRAM
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        PerfEventAPI.__init__(self, socket_ids, topology)
+
+
+class PerfCoreAPI(PerfEventAPI):
+    DEVICE = Device.CORE
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        PerfEventAPI.__init__(self, socket_ids, topology)
+
+
+class PerfUncoreAPI(PerfEventAPI):
+    DEVICE = Device.UNCORE
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        PerfEventAPI.__init__(self, socket_ids, topology)
+
+
+class PerfPsysAPI(PerfEventAPI):
+    """
+    The psys event isn't related to a socket, its energy consumption is reported on the first monitored socket
+    """
+    DEVICE = Device.PSYS
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        PerfEventAPI.__init__(self, socket_ids, topology)
+
+    def _get_rapl_file_names(self):
+        self._socket_ids = self._socket_ids[:1]
+        return PerfEventAPI._get_rapl_file_names(self)
+
+
+# a single read syscall for all the devices of a socket
+REGISTRY.register(Backend('perf', {Device.PKG: PerfPkgAPI, Device.DRAM: PerfDramAPI, Device.CORE: PerfCoreAPI,
+                                   Device.UNCORE: PerfUncoreAPI, Device.PSYS: PerfPsysAPI}, read_cost=1))
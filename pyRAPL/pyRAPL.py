@@ -19,10 +19,13 @@
 # SOFTWARE.
 from typing import List, Optional
 from pyRAPL import Sensor, Device
+from pyRAPL.topology import get_topology
 import pyRAPL
 
 
-def setup(devices: Optional[List[Device]] = None, socket_ids: Optional[List[int]] = None):
+def setup(devices: Optional[List[Device]] = None, socket_ids: Optional[List[int]] = None, raw: bool = False,
+          backend: Optional[str] = None, overflow_tracking: bool = False, topology_cache: Optional[str] = None,
+          read_cache_window: float = 0) -> Sensor:
     """
     Configure which device and CPU socket should be monitored by pyRAPL
 
@@ -32,8 +35,38 @@ def setup(devices: Optional[List[Device]] = None, socket_ids: Optional[List[int]
 
     :param socket_ids: list of monitored sockets, if None, all the available socket on the machine will be monitored
 
+    :param raw: if True, use the low latency read path that reads energy counters with positional reads on raw file
+                descriptors
+
+    :param backend: interface used to read the energy consumption : ``'powercap'`` (sysfs powercap files), ``'msr'``
+                    (RAPL Model Specific Registers, requires the read permission on ``/dev/cpu/*/msr``), ``'amd'``
+                    (amd_energy hwmon driver), ``'amd-msr'`` (AMD RAPL Model Specific Registers) or ``'perf'`` (power PMU
+                    events read with ``perf_event_open``, doesn't require the read permission on powercap files) or a
+                    backend registered by a third party package. If None, the backend given by the
+                    ``PYRAPL_BACKEND`` environment variable is used, if this variable isn't set, the backends are probed
+                    and the cheapest working one is used for each device (``pyRAPL._sensor.backends`` reports the
+                    chosen backends)
+
+    :param overflow_tracking: if True, the sensor keeps an accumulated value of each energy counter that doesn't wrap
+                              around. Use it for long measurements, the sensor must be read at least once per counter
+                              wrap period
+
+    :param topology_cache: name of a file used to persist the topology of the machine (cpus and RAPL zones) between
+                           processes. The topology is only discovered by the first process started after the machine
+                           boot
+
+    :param read_cache_window: if positive, the sensor shares its reads with the other sensors of the process that
+                              have a positive window : a counter read less than ``read_cache_window`` micro seconds ago
+                              by a sensor isn't read again
+
+    :return: the configured sensor, it can also be given to ``Measurement`` or ``measureit`` with their ``sensor``
+             parameter
+
     :raise PyRAPLCantRecordEnergyConsumption: if the sensor can't get energy information about the given device in parameter
 
     :raise PyRAPLBadSocketIdException: if the given socket in parameter doesn't exist
     """
-    pyRAPL._sensor = Sensor(devices=devices, socket_ids=socket_ids)
+    pyRAPL._sensor = Sensor(devices=devices, socket_ids=socket_ids, raw=raw, backend=backend,
+                            overflow_tracking=overflow_tracking, topology=get_topology(topology_cache),
+                            read_cache_window=read_cache_window)
+    return pyRAPL._sensor
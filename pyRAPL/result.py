@@ -17,9 +17,15 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
-from typing import Optional, List
+from typing import Dict, Optional, List
 from dataclasses import dataclass
 
+from pyRAPL import Device
+from pyRAPL.stats import Distribution
+
+#: name of the Result attribute containing the energy consumption of each device
+DEVICE_FIELDS = {device: device.name.lower() for device in Device}
+
 
 @dataclass(frozen=True)
 class Result:
@@ -36,12 +42,44 @@ class Result:
     :vartype pkg: Optional[List[float]]
     :var dram: list of the RAM energy consumption -expressed in micro Joules- (one value for each socket) if None, no RAM energy consumption was recorded
     :vartype dram: Optional[List[float]]
+    :var core: list of the CPU cores energy consumption -expressed in micro Joules- (one value for each socket) if None,
+               no CPU cores energy consumption was recorded
+    :vartype core: Optional[List[float]]
+    :var uncore: list of the CPU uncore energy consumption -expressed in micro Joules- (one value for each socket) if
+                 None, no CPU uncore energy consumption was recorded
+    :vartype uncore: Optional[List[float]]
+    :var psys: list of the platform energy consumption -expressed in micro Joules- (one value, for the first socket) if
+               None, no platform energy consumption was recorded
+    :vartype psys: Optional[List[float]]
+    :var error: uncertainty of the energy consumption of each recorded device -expressed in micro Joules- (one value for
+                each socket, the real energy consumption is in [value - error, value + error]) if None, the uncertainty
+                wasn't computed
+    :vartype error: Optional[Dict[Device, List[float]]]
+    :var duration_error: uncertainty of the duration and of the bounds of the measured period -expressed in micro
+                         seconds- caused by the time spent reading the energy counters at the beginning and at the end
+                         of the measure, if None, the uncertainty wasn't computed
+    :vartype duration_error: Optional[float]
+    :var count: number of aggregated measures if the result is the total of several measures (see ``Summary.result``), if None, the result is a single measure
+    :vartype count: Optional[int]
     """
     label: str
     timestamp: float
     duration: float
     pkg: Optional[List[float]] = None
     dram: Optional[List[float]] = None
+    core: Optional[List[float]] = None
+    uncore: Optional[List[float]] = None
+    psys: Optional[List[float]] = None
+    error: Optional[Dict[Device, List[float]]] = None
+    duration_error: Optional[float] = None
+    count: Optional[int] = None
+
+    def energy(self, device: Device) -> Optional[List[float]]:
+        """
+        :param device: device whose energy consumption is returned
+        :return: the energy consumption of the given device (one value for each socket), None if it wasn't recorded
+        """
+        return getattr(self, DEVICE_FIELDS[device])
 
     def __truediv__(self, number: int):
         """ devide all the attributes by the number number , used to measure one instance if we run the test inside a loop
@@ -49,6 +87,68 @@ class Result:
         """
 
         _duration = self.duration / number
-        _pkg = [j / number for j in self.pkg] if self.pkg else None
-        _dram = [j / number for j in self.dram] if self.dram else None
-        return Result(self.label, self.timestamp, _duration, _pkg, _dram)
+        _energy = {}
+        for field_name in DEVICE_FIELDS.values():
+            values = getattr(self, field_name)
+            _energy[field_name] = [j / number for j in values] if values else None
+        _error = None
+        if self.error is not None:
+            _error = {device: [j / number for j in values] for device, values in self.error.items()}
+        _duration_error = self.duration_error / number if self.duration_error is not None else None
+        return Result(self.label, self.timestamp, _duration, error=_error, duration_error=_duration_error,
+                      count=self.count, **_energy)
+
+
+@dataclass(frozen=True)
+class Summary:
+    """
+    A data class to represent the aggregation of several energy measures with the same label
+
+    :var label: label of the aggregated measures
+    :vartype label: str
+    :var timestamp: beginning time of the first aggregated measure (expressed in seconds since the epoch)
+    :vartype timestamp: float
+    :var count: number of aggregated measures
+    :vartype count: int
+    :var duration: distribution of the measures duration (in micro seconds)
+    :vartype duration: Distribution
+    :var pkg: distribution of the CPU energy consumption (one value for each socket) if None, no CPU energy consumption was recorded
+    :vartype pkg: Optional[Distribution]
+    :var dram: distribution of the RAM energy consumption (one value for each socket) if None, no RAM energy consumption was recorded
+    :vartype dram: Optional[Distribution]
+    :var core: distribution of the CPU cores energy consumption (one value for each socket) if None, no CPU cores energy consumption was recorded
+    :vartype core: Optional[Distribution]
+    :var uncore: distribution of the CPU uncore energy consumption (one value for each socket) if None, no CPU uncore energy consumption was recorded
+    :vartype uncore: Optional[Distribution]
+    :var psys: distribution of the platform energy consumption (one value, for the first socket) if None, no platform energy consumption was recorded
+    :vartype psys: Optional[Distribution]
+    """
+    label: str
+    timestamp: float
+    count: int
+    duration: Distribution
+    pkg: Optional[Distribution] = None
+    dram: Optional[Distribution] = None
+    core: Optional[Distribution] = None
+    uncore: Optional[Distribution] = None
+    psys: Optional[Distribution] = None
+
+    def energy(self, device: Device) -> Optional[Distribution]:
+        """
+        :param device: device whose energy consumption distribution is returned
+        :return: the energy consumption distribution of the given device, None if it wasn't recorded
+        """
+        return getattr(self, DEVICE_FIELDS[device])
+
+    def result(self) -> Result:
+        """
+        :return: a Result containing the number of aggregated measures, their total duration and their total energy
+                 consumption
+        """
+        energy = {}
+        for field_name in DEVICE_FIELDS.values():
+            distribution = getattr(self, field_name)
+            if distribution is not None:
+                energy[field_name] = [value if count > 0 else -1
+                                      for count, value in zip(distribution.counts, distribution.sums)]
+        return Result(self.label, self.timestamp, self.duration.sums[0], count=self.count, **energy)
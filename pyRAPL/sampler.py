@@ -0,0 +1,306 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Background sampling of the energy counters
+
+A ``Sampler`` reads a ``Sensor`` at a fixed frequency on a dedicated thread and stores the samples in a preallocated
+ring buffer. Each sample contains a monotonic timestamp (in nano seconds) and, for each monitored device of each socket
+(in the sensor layout), the energy consumed since the beginning of the sampling (in micro Joules). Counter wraparounds
+are handled when the samples are stored, the sampled values never decrease. Values of the unmonitored devices are -1.
+
+The latest samples can be accessed without copy, as memoryviews or NumPy arrays (if NumPy is installed)::
+
+    sampler = pyRAPL.Sampler(frequency=1000)
+    sampler.start()
+    ...
+    timestamps, energy = sampler.buffer.numpy(100)  # last 100 samples
+    timestamps, power = sampler.power(100)          # instantaneous power (in Watts) between these samples
+    sampler.stop()
+"""
+import threading
+import time
+from array import array
+from typing import Optional, Tuple
+
+import pyRAPL
+from pyRAPL.sensor import Sensor
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class RingBuffer:
+    """
+    Fixed size ring buffer of samples backed by two arrays (timestamps and values)
+
+    Each sample is written twice in the arrays (at its position and at its position plus the capacity of the buffer),
+    so the latest samples are always stored in a contiguous memory area and can be accessed without copy. Views may be
+    overwritten by the samples appended after their creation, use ``copy`` to get samples consistent with a writer
+    appending on another thread
+
+    :param width: number of values of a sample
+    :param capacity: maximum number of samples stored in the buffer
+    """
+
+    def __init__(self, width: int, capacity: int):
+        if capacity <= 0:
+            raise ValueError('capacity must be positive')
+        self.width = width
+        self.capacity = capacity
+        self._timestamps = array('q', [0]) * (2 * capacity)
+        self._values = array('d', [0]) * (2 * capacity * width)
+        self._count = 0
+        # number of samples whose writing started
+        self._started = 0
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    @property
+    def count(self) -> int:
+        """
+        number of samples appended since the creation of the buffer (including the overwritten samples)
+        """
+        return self._count
+
+    def append(self, timestamp: int, values: array):
+        """
+        Append a sample to the buffer, overwrite the oldest sample if the buffer is full
+
+        :param timestamp: timestamp of the sample
+        :param values: array('d') containing the ``width`` values of the sample
+        """
+        self._started = self._count + 1
+        position = self._count % self.capacity
+        mirror = position + self.capacity
+        self._timestamps[position] = timestamp
+        self._timestamps[mirror] = timestamp
+        self._values[position * self.width:(position + 1) * self.width] = values
+        self._values[mirror * self.width:(mirror + 1) * self.width] = values
+        # the sample is published once it is completely written
+        self._count += 1
+
+    def _window(self, n: Optional[int]) -> Tuple[int, int]:
+        length = len(self)
+        n = length if n is None else min(n, length)
+        return (self._count - n) % self.capacity, n
+
+    def timestamps(self, n: Optional[int] = None) -> memoryview:
+        """
+        :param n: number of samples, if None, all the samples of the buffer
+        :return: a view on the timestamps of the ``n`` latest samples (oldest first)
+        """
+        start, n = self._window(n)
+        return memoryview(self._timestamps)[start:start + n]
+
+    def values(self, n: Optional[int] = None) -> memoryview:
+        """
+        :param n: number of samples, if None, all the samples of the buffer
+        :return: a flat view on the values of the ``n`` latest samples (oldest first, ``width`` values per sample)
+        """
+        start, n = self._window(n)
+        return memoryview(self._values)[start * self.width:(start + n) * self.width]
+
+    def copy(self, n: Optional[int] = None) -> Tuple[array, array]:
+        """
+        Copy the latest samples, consistently with the samples appended during the copy
+
+        The number of samples is read once before the copy and the number of started appends is read again after it
+        (as a sequence lock) : the oldest samples that were overwritten during the copy are dropped
+
+        :param n: number of samples, if None, all the samples of the buffer
+        :return: a tuple containing the timestamps (array('q')) and the flat values (array('d'), ``width`` values per
+                 sample) of at most ``n`` latest samples (oldest first)
+        """
+        count = self._count
+        n = min(count, self.capacity) if n is None else min(n, count, self.capacity)
+        start = (count - n) % self.capacity
+        timestamps = self._timestamps[start:start + n]
+        values = self._values[start * self.width:(start + n) * self.width]
+        # a sample overwrites the sample appended ``capacity`` samples before it
+        overwritten = self._started - self.capacity - (count - n)
+        if overwritten > 0:
+            del timestamps[:overwritten]
+            del values[:overwritten * self.width]
+        return timestamps, values
+
+    def numpy(self, n: Optional[int] = None):
+        """
+        :param n: number of samples, if None, all the samples of the buffer
+        :return: a tuple containing a view on the timestamps of the ``n`` latest samples (1D int64 array) and a view on
+                 their values (2D float64 array, one row by sample)
+        :raise ImportError: if NumPy isn't installed
+        """
+        if numpy is None:
+            raise ImportError('You need to install numpy in order to use NumPy views')
+        start, n = self._window(n)
+        timestamps = numpy.frombuffer(self._timestamps, dtype=numpy.int64, count=n, offset=start * 8)
+        values = numpy.frombuffer(self._values, dtype=numpy.float64, count=n * self.width,
+                                  offset=start * self.width * 8)
+        return timestamps, values.reshape(n, self.width)
+
+
+class Sampler:
+    """
+    Read a sensor at a fixed frequency on a dedicated thread
+
+    The read instants are scheduled on a fixed grid (``start + k * period``) so the sampling period doesn't drift with
+    the read latency. If a read is late by more than one period, the missed instants are skipped and counted in
+    ``missed_samples``
+
+    The sensor can be read by other threads while it is sampled (sensor reads are thread safe), but these reads delay
+    the samples of a sensor with ``overflow_tracking`` (its reads are serialized)
+
+    :param frequency: number of samples per second
+    :param capacity: number of samples stored in the ring buffer, if None, the buffer stores 10 seconds of samples
+    :param sensor: sensor to sample, if None, the sensor configured by ``pyRAPL.setup`` is used
+    """
+
+    def __init__(self, frequency: float = 1000, capacity: Optional[int] = None, sensor: Optional[Sensor] = None):
+        if frequency <= 0:
+            raise ValueError('frequency must be positive')
+        self._sensor = sensor if sensor is not None else pyRAPL._sensor
+        self.frequency = frequency
+        self._period = int(1000000000 / frequency)
+        self._capacity = capacity if capacity is not None else int(frequency * 10)
+        self.buffer = self._create_buffer()
+        self.missed_samples = 0
+        self._last_counters = None
+        self._energy = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._error = None
+
+    def _create_buffer(self) -> Optional[RingBuffer]:
+        # the sensor is read once to get the number of values of a sample
+        return RingBuffer(len(self._sensor.energy()), self._capacity)
+
+    @property
+    def sensor(self) -> Sensor:
+        """
+        sampled sensor
+        """
+        return self._sensor
+
+    @property
+    def running(self) -> bool:
+        """
+        True if the sampling thread is running
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Start the sampling thread
+        """
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='pyRAPL-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the sampling thread and wait for its termination
+
+        :raise Exception: the exception that stopped the sampling thread, if any
+        """
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def sample(self):
+        """
+        Read the sensor and append a sample to the ring buffer
+        """
+        before = time.monotonic_ns()
+        counters = self._sensor.energy()
+        after = time.monotonic_ns()
+        if self._last_counters is None:
+            self._energy = array('d', [0 if value >= 0 else -1 for value in counters])
+        else:
+            for i, delta in enumerate(counters - self._last_counters):
+                if delta >= 0:
+                    self._energy[i] += delta
+        self._last_counters = counters
+        self.buffer.append(before + (after - before) // 2, self._energy)
+
+    def _run(self):
+        try:
+            deadline = time.monotonic_ns()
+            while not self._stop_event.is_set():
+                self.sample()
+                deadline += self._period
+                now = time.monotonic_ns()
+                if now >= deadline:
+                    # late : skip the instants already passed, except the last one which is sampled immediately
+                    missed = (now - deadline) // self._period
+                    self.missed_samples += missed
+                    deadline += missed * self._period
+                    continue
+                self._stop_event.wait((deadline - now) / 1000000000)
+        except Exception as error:
+            self._error = error
+
+    def power(self, n: Optional[int] = None):
+        """
+        Compute the instantaneous power between consecutive samples of the ``n`` latest samples
+
+        :param n: number of samples, if None, all the samples of the buffer
+        :return: a tuple containing the timestamps of the end of each interval and the average power (in Watts) of each
+                 monitored device of each socket on this interval (-1 for the unmonitored devices). NumPy arrays if
+                 NumPy is installed, lists otherwise (list of one list of values by interval)
+        """
+        if numpy is not None:
+            timestamps, values = self.buffer.numpy(n)
+            durations = numpy.diff(timestamps)[:, None]
+            power = numpy.diff(values, axis=0) * 1000 / durations
+            return timestamps[1:], numpy.where(values[1:] < 0, -1, power)
+
+        timestamps = self.buffer.timestamps(n)
+        values = self.buffer.values(n)
+        width = self.buffer.width
+        power = []
+        for i in range(1, len(timestamps)):
+            duration = timestamps[i] - timestamps[i - 1]
+            power.append([(values[i * width + j] - values[(i - 1) * width + j]) * 1000 / duration
+                          if values[i * width + j] >= 0 else -1 for j in range(width)])
+        return list(timestamps[1:]), power
+
+    def per_device(self, values) -> dict:
+        """
+        split a sample (or a power row) by device, see ``Sensor.per_device``
+        """
+        return self._sensor.per_device(values)
@@ -0,0 +1,227 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Sampling policies of ``measureit`` : only a subset of the calls of a function is measured and the energy consumption of
+all the calls is estimated from the measured ones
+"""
+import math
+import random
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from pyRAPL import Device, Result
+from pyRAPL.stats import RunningStats
+
+#: quantile of the normal distribution used for the error bounds of the estimates (95% confidence interval)
+CONFIDENCE_Z = 1.96
+
+
+class SamplingPolicy:
+    """
+    Choose the calls of a decorated function that are measured
+
+    A policy gives the number of calls to skip after each measured call, so the calls that aren't measured only
+    increment a counter
+    """
+
+    def first_skip(self) -> int:
+        """
+        :return: number of calls to skip before the first measured call
+        """
+        return 0
+
+    def next_skip(self, overhead: int, elapsed: int, calls: int) -> int:
+        """
+        :param overhead: time spent measuring the last measured call (in nano seconds)
+        :param elapsed: time between the beginning of the previous measured call and the beginning of the last one (in
+                        nano seconds), 0 for the first measured call
+        :param calls: number of calls between the previous measured call (included) and the last one (excluded)
+        :return: number of calls to skip before the next measured call
+        """
+        raise NotImplementedError()
+
+
+class OneInN(SamplingPolicy):
+    """
+    Measure one call every ``n`` calls
+
+    :param n: sampling period
+    """
+
+    def __init__(self, n: int):
+        if n < 1:
+            raise ValueError('the sampling period must be positive')
+        self.n = n
+
+    def next_skip(self, overhead: int, elapsed: int, calls: int) -> int:
+        return self.n - 1
+
+
+class RandomSampling(SamplingPolicy):
+    """
+    Measure each call with a given probability
+
+    The number of calls between two measured calls is drawn from a geometric distribution, so the sampling doesn't
+    draw a random number on each call
+
+    :param probability: probability to measure a call
+    :param seed: seed of the random generator
+    """
+
+    def __init__(self, probability: float, seed=None):
+        if not 0 < probability <= 1:
+            raise ValueError('the sampling probability must be in ]0, 1]')
+        self.probability = probability
+        self._random = random.Random(seed)
+
+    def _skip(self) -> int:
+        if self.probability == 1:
+            return 0
+        return int(math.log(1.0 - self._random.random()) / math.log(1.0 - self.probability))
+
+    def first_skip(self) -> int:
+        return self._skip()
+
+    def next_skip(self, overhead: int, elapsed: int, calls: int) -> int:
+        return self._skip()
+
+
+class TimeBudgetSampling(SamplingPolicy):
+    """
+    Measure as many calls as possible while keeping the time spent measuring under a fraction of the execution time
+
+    The number of calls to skip is computed from the overhead of the last measured call and from the call rate
+    observed between the two last measured calls
+
+    :param budget: maximum fraction of the execution time spent measuring (0.01 for 1%)
+    """
+
+    def __init__(self, budget: float = 0.01):
+        if not 0 < budget <= 1:
+            raise ValueError('the time budget must be in ]0, 1]')
+        self.budget = budget
+
+    def next_skip(self, overhead: int, elapsed: int, calls: int) -> int:
+        if elapsed <= 0 or calls <= 0:
+            return 0
+        # time to wait before the next measure, converted into a number of calls
+        wait = overhead / self.budget
+        return int(wait * calls / elapsed)
+
+
+@dataclass(frozen=True)
+class EnergyEstimate:
+    """
+    Estimation of the energy consumption of all the calls of a function, from the measured calls
+
+    Error bounds are the half width of the 95% confidence interval of the estimates (``inf`` if less than two calls
+    were measured)
+
+    :var label: function name
+    :vartype label: str
+    :var calls: number of calls of the function
+    :vartype calls: int
+    :var samples: number of measured calls
+    :vartype samples: int
+    :var duration: estimated total duration of the calls (in micro seconds)
+    :vartype duration: float
+    :var duration_error: error bound of the duration
+    :vartype duration_error: float
+    :var energy: estimated total energy consumption of each device on each socket (in micro Joules, -1 for the
+                 sockets that weren't measured)
+    :vartype energy: Dict[Device, List[float]]
+    :var energy_error: error bound of the energy consumption of each device on each socket
+    :vartype energy_error: Dict[Device, List[float]]
+    """
+    label: str
+    calls: int
+    samples: int
+    duration: float
+    duration_error: float
+    energy: Dict[Device, List[float]]
+    energy_error: Dict[Device, List[float]]
+
+
+def _scale(stats: RunningStats, calls: int):
+    totals = [calls * mean if mean >= 0 else -1 for mean in stats.mean]
+    errors = [calls * CONFIDENCE_Z * math.sqrt(variance / count) if count > 0 else -1
+              for count, variance in zip(stats.counts, stats.variance)]
+    return totals, errors
+
+
+class SampledCalls:
+    """
+    Calls of a function decorated by ``measureit`` with a sampling policy
+
+    The call counter isn't protected by a lock : with concurrent threads, some calls may not be counted
+
+    :var calls: number of calls of the function
+    :vartype calls: int
+    :var samples: number of measured calls
+    :vartype samples: int
+    """
+
+    def __init__(self, label: str, policy: SamplingPolicy):
+        self.label = label
+        self.calls = 0
+        self.samples = 0
+        self.next_call = 1 + policy.first_skip()
+        self._policy = policy
+        self._last_sample = None
+        self._last_sample_call = 0
+        self._duration = RunningStats(1)
+        self._energy = {}
+
+    def record(self, result: Optional[Result], begin: int, overhead: int):
+        """
+        record a measured call and choose the next call to measure
+
+        :param result: result of the measured call (None in marker mode)
+        :param begin: beginning of the measured call (``time.perf_counter_ns``)
+        :param overhead: time spent measuring the call (in nano seconds)
+        """
+        self.samples += 1
+        if result is not None:
+            self._duration.update([result.duration])
+            for device in Device:
+                values = result.energy(device)
+                if values is None:
+                    continue
+                if device not in self._energy:
+                    self._energy[device] = RunningStats(len(values))
+                self._energy[device].update(values)
+
+        elapsed = begin - self._last_sample if self._last_sample is not None else 0
+        skip = self._policy.next_skip(overhead, elapsed, self.calls - self._last_sample_call)
+        self._last_sample = begin
+        self._last_sample_call = self.calls
+        self.next_call = self.calls + 1 + skip
+
+    def estimate(self) -> EnergyEstimate:
+        """
+        :return: estimation of the energy consumption of all the calls of the function
+        """
+        duration, duration_error = _scale(self._duration, self.calls)
+        energy = {}
+        energy_error = {}
+        for device, stats in self._energy.items():
+            energy[device], energy_error[device] = _scale(stats, self.calls)
+        return EnergyEstimate(self.label, self.calls, self.samples, max(duration[0], 0), max(duration_error[0], 0),
+                              energy, energy_error)
@@ -17,33 +17,170 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
-from typing import List, Optional
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Tuple
 
-from pyRAPL import Device, DeviceAPIFactory, PyRAPLCantInitDeviceAPI, PyRAPLCantRecordEnergyConsumption
+from pyRAPL import Device, PyRAPLCantInitDeviceAPI, PyRAPLCantRecordEnergyConsumption
 from pyRAPL import PyRAPLBadSocketIdException
+from pyRAPL.backend import REGISTRY, BackendSelection
+from pyRAPL.device_api import RawEnergyReader
+from pyRAPL.topology import Topology, get_topology
+
+
+def counter_delta(end: float, begin: float, max_energy_range: float) -> float:
+    """
+    Compute the difference between two values of an energy counter that wraps around to 0 after max_energy_range
+
+    :param end: last value of the counter
+    :param begin: first value of the counter
+    :param max_energy_range: range of the counter, if negative, the counter is considered as never wrapping
+    :return: energy consumed between the two values (-1 if one of the values is negative)
+    """
+    if end < 0 or begin < 0:
+        return -1
+    if end < begin and max_energy_range > 0:
+        return end - begin + max_energy_range
+    return end - begin
 
 
 class SubstractableList(list):
     """
     Substract each element of a list to another list except if they are negative numbers
+
+    If the list has a ``max_energy_ranges`` attribute (range of each counter of the list), the substraction handles
+    the counters that wrapped around between the two values
+
+    :param values: values of the list
+    :param max_energy_ranges: range of each counter of the list (-1 if the range is unknown)
     """
+    def __init__(self, values=(), max_energy_ranges: Optional[List[float]] = None):
+        list.__init__(self, values)
+        self.max_energy_ranges = max_energy_ranges
+
     def __sub__(self, other):
         if len(other) != len(self):
             raise ValueError("List are not of the same length")
-        return [a - b if a >= 0 and b >= 0 else -1 for a, b in zip(self, other)]
+        if self.max_energy_ranges is None:
+            return [a - b if a >= 0 and b >= 0 else -1 for a, b in zip(self, other)]
+        return [counter_delta(a, b, r) for a, b, r in zip(self, other, self.max_energy_ranges)]
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    Values of the energy counters of a sensor read at once, with the time window of the read
+
+    :var energy: counter values, in the sensor layout
+    :vartype energy: SubstractableList
+    :var before: time just before the first counter read (``time.monotonic_ns``)
+    :vartype before: int
+    :var after: time just after the last counter read (``time.monotonic_ns``)
+    :vartype after: int
+    :var timestamp: wall clock time of the middle of the read window (in nano seconds since the epoch)
+    :vartype timestamp: int
+    """
+    energy: SubstractableList
+    before: int
+    after: int
+    timestamp: int
+
+    @property
+    def middle(self) -> int:
+        """
+        middle of the read window (``time.monotonic_ns``), the best estimation of the time of the snapshot
+        """
+        return (self.before + self.after) // 2
+
+    @property
+    def window(self) -> int:
+        """
+        duration of the read window (in nano seconds)
+        """
+        return self.after - self.before
+
+
+class ReadCache:
+    """
+    Values of energy counters recently read by the sensors, shared by all the sensors of the process
+
+    Entries are indexed by counter : the file of the counter for the APIs reading text counters (and the raw readers),
+    the device API class and the socket for the other APIs. Sensors monitoring overlapping devices or sockets share
+    the reads of their common counters
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, key: Hashable, now: int, window: int) -> Optional[float]:
+        """
+        :param key: counter identifier
+        :param now: current time (``time.perf_counter_ns``)
+        :param window: maximum age of the entry (in nano seconds)
+        :return: the value of the counter if it was read less than ``window`` nano seconds ago, None otherwise
+        """
+        entry = self._entries.get(key)
+        if entry is None or now - entry[0] > window:
+            return None
+        return entry[1]
+
+    def put(self, key: Hashable, now: int, value: float):
+        """
+        Store the value of a counter read at the given time
+        """
+        self._entries[key] = (now, value)
+
+    def clear(self):
+        """
+        Remove all the entries
+        """
+        self._entries = {}
+
+
+#: read cache shared by the sensors
+READ_CACHE = ReadCache()
 
 
 class Sensor:
     """
     Global singleton that return global energy consumption about monitored devices
+
+    The sensor can be read concurrently by several threads, and by the child processes created with ``fork`` (the
+    files of the device APIs are reopened in the child processes)
+
+    Several sensors can be used in the same process (with ``Measurement(..., sensor=sensor)``). Sensors with a
+    ``read_cache_window`` share their reads : a counter read by a sensor is reused by the other sensors during this
+    window
+
+    The energy values returned by the sensor are stored in a flat list, socket by socket. For each socket, the list
+    contains one value for each monitored device (sorted by device)::
+
+        (device 0 socket 0, ..., device M socket 0, ..., device 0 socket N, ..., device M socket N)
     """
 
-    def __init__(self, devices: Optional[List[Device]] = None, socket_ids: Optional[List[int]] = None):
+    def __init__(self, devices: Optional[List[Device]] = None, socket_ids: Optional[List[int]] = None,
+                 raw: bool = False, backend: Optional[str] = None, overflow_tracking: bool = False,
+                 topology: Optional[Topology] = None, read_cache_window: float = 0):
         """
         :param devices: list of device to get energy consumption if None, all the devices available on the machine will
                         be monitored
         :param socket_ids: if None, the API will get the energy consumption of the whole machine otherwise, it will
                            get the energy consumption of the devices on the given socket package
+        :param raw: if True, read all the energy counters with positional reads on raw file descriptors (low latency
+                    read path) instead of the buffered text files of the device APIs
+        :param backend: interface used to read the energy consumption (``'powercap'``, ``'msr'``, ``'amd'``,
+                        ``'amd-msr'``, ``'perf'`` or a third party backend), if None, the cheapest working backend is
+                        used for each device. See ``BackendRegistry.probe``
+        :param overflow_tracking: if True, the sensor accumulates the counter deltas of each read (taking counter
+                                  wraparound into account) and returns these accumulated values instead of the raw
+                                  counters. The accumulated values never wrap around as long as the sensor is read at
+                                  least once per counter wrap period
+        :param topology: topology of the machine, if None, the topology is discovered once and shared by all the
+                         device APIs of the sensor
+        :param read_cache_window: if positive, counters read by a sensor of the process less than
+                                  ``read_cache_window`` micro seconds ago are not read again (the cache is shared by
+                                  all the sensors with a positive window)
         :raise PyRAPLCantRecordEnergyConsumption: if the sensor can't get energy information about a device given in
                                                   parameter
         :raise PyRAPLBadSocketIdException: if the sensor can't get energy information about a device given in
@@ -51,12 +188,16 @@ class Sensor:
         """
         self._available_devices = []
         self._device_api = {}
+        self._backends = {}
         self._socket_ids = None
 
-        tmp_device = devices if devices is not None else [Device.PKG, Device.DRAM]
+        topology = topology if topology is not None else get_topology()
+        tmp_device = devices if devices is not None else list(Device)
         for device in tmp_device:
             try:
-                self._device_api[device] = DeviceAPIFactory.create_device_api(device, socket_ids)
+                selection = REGISTRY.probe(device, socket_ids, backend, topology)
+                self._backends[device] = selection
+                self._device_api[device] = selection.device_api
                 self._available_devices.append(device)
             except PyRAPLCantInitDeviceAPI:
                 if devices is not None:
@@ -69,16 +210,158 @@ class Sensor:
 
         self._socket_ids = socket_ids if socket_ids is not None else list(self._device_api.values())[0]._socket_ids
 
+        self._available_devices.sort()
+        self._stride = len(self._available_devices)
+        self._device_slots = {}
+        for position, device in enumerate(self._available_devices):
+            device_api = self._device_api[device]
+            self._device_slots[device] = [(socket_id, socket_id * self._stride + position)
+                                          for socket_id in device_api._socket_ids]
+
+        self._empty_result = [-1] * (self._stride * (max(self._socket_ids) + 1))
+        self._max_energy_ranges = list(self._empty_result)
+        for device, slots in self._device_slots.items():
+            max_energy_range = self._device_api[device].max_energy_range()
+            for socket_id, slot in slots:
+                self._max_energy_ranges[slot] = max_energy_range[socket_id]
+
+        self._overflow_tracking = overflow_tracking
+        self._overflow_lock = threading.Lock()
+        self._last_counters = None
+        self._accumulated_counters = None
+        # devices whose API doesn't read text counters (msr, ...) are still read with their energy method
+        self._raw_reader = None
+        self._raw_slots = []
+        self._read_devices = self._available_devices
+        if raw:
+            self._raw_reader, self._raw_keys = self._create_raw_reader()
+            self._read_devices = [device for device in self._available_devices
+                                  if not self._device_api[device].TEXT_COUNTER]
+
+        self._read_cache_window = int(read_cache_window * 1000)
+        # cache key, socket and slot of each counter of each device
+        self._cache_keys = {}
+        for device, device_api in self._device_api.items():
+            if device_api.TEXT_COUNTER:
+                keys = device_api._sys_file_names
+            else:
+                keys = [(type(device_api), socket_id) for socket_id in device_api._socket_ids]
+            self._cache_keys[device] = [(key, socket_id, slot)
+                                        for key, (socket_id, slot) in zip(keys, self._device_slots[device])]
+
+    def _create_raw_reader(self) -> Tuple[RawEnergyReader, List[str]]:
+        counters = []
+        for device in self._available_devices:
+            device_api = self._device_api[device]
+            if not device_api.TEXT_COUNTER:
+                continue
+            for (_, slot), file_name in zip(self._device_slots[device], device_api._sys_file_names):
+                counters.append((slot, file_name))
+        # read the counters socket by socket, so the domains of a socket are read back to back
+        counters.sort()
+        file_names = [file_name for _, file_name in counters]
+        self._raw_slots = [slot for slot, _ in counters]
+        return RawEnergyReader(file_names, self._raw_slots), file_names
+
+    @property
+    def devices(self) -> List[Device]:
+        """
+        sorted list of the monitored devices
+        """
+        return list(self._available_devices)
+
+    @property
+    def backends(self) -> Dict[Device, BackendSelection]:
+        """
+        backend chosen for each monitored device, with its measured read latency
+        """
+        return dict(self._backends)
+
+    def per_device(self, values: List[float]) -> Dict[Device, List[float]]:
+        """
+        split a list of values returned by the sensor (or a difference of such lists) by device
+
+        :param values: list of values in the sensor layout
+        :return: for each monitored device, the list of its values (one value for each socket)
+        """
+        return {device: values[position::self._stride] for position, device in enumerate(self._available_devices)}
+
     def energy(self) -> SubstractableList:
         """
         get the energy consumption of all the monitored devices
-        :return: a tuple containing the energy consumption of each device for each socket. The tuple structure is :
-                 (pkg energy socket 0, dram energy socket 0, ..., pkg energy socket N, dram energy socket N)
+        :return: a list containing the energy consumption of each monitored device for each socket. The list structure
+                 is : (device 0 socket 0, ..., device M socket 0, ..., device 0 socket N, ..., device M socket N)
         """
-        result = SubstractableList([-1, -1] * (self._socket_ids[-1] + 1))
-        # print((result, self._socket_ids))
-        for device in self._available_devices:
+        if not self._overflow_tracking:
+            return self._read_counters()
+        # counters must be accumulated in the read order
+        with self._overflow_lock:
+            return self._accumulate(self._read_counters())
+
+    def snapshot(self) -> Snapshot:
+        """
+        get the energy consumption of all the monitored devices (see ``energy``), with the time window of the read
+
+        The skew between the counters of the snapshot is bounded by the read window. Use a raw sensor (``raw=True``) to
+        read the text counters in one batch, socket by socket, and reduce this window. Other sensors read their
+        counters device by device (each device API reads all its sockets), the counters of a socket aren't read one
+        after another and the skew between them is only bounded by the whole read window. The ``perf`` backend is an
+        exception : all the devices of a socket are read with a single system call
+        """
+        timestamp = time.time_ns()
+        before = time.monotonic_ns()
+        energy = self.energy()
+        after = time.monotonic_ns()
+        return Snapshot(energy, before, after, timestamp + (after - before) // 2)
+
+    def _accumulate(self, counters: SubstractableList) -> SubstractableList:
+        if self._last_counters is None:
+            self._accumulated_counters = list(counters)
+        else:
+            for i, delta in enumerate(counters - self._last_counters):
+                if delta >= 0:
+                    self._accumulated_counters[i] += delta
+        self._last_counters = counters
+        return SubstractableList(self._accumulated_counters)
+
+    def _read_counters(self) -> SubstractableList:
+        if self._read_cache_window > 0:
+            return self._read_cached_counters()
+        result = SubstractableList(self._empty_result, self._max_energy_ranges)
+        if self._raw_reader is not None:
+            self._raw_reader.read_into(result)
+
+        for device in self._read_devices:
             energy = self._device_api[device].energy()
-            for socket_id in range(len(energy)):
-                result[socket_id * 2 + device] = energy[socket_id]
+            for socket_id, slot in self._device_slots[device]:
+                result[slot] = energy[socket_id]
+        return result
+
+    def _read_cached_counters(self) -> SubstractableList:
+        result = SubstractableList(self._empty_result, self._max_energy_ranges)
+        window = self._read_cache_window
+        now = time.perf_counter_ns()
+        if self._raw_reader is not None:
+            values = [READ_CACHE.get(key, now, window) for key in self._raw_keys]
+            if None in values:
+                # the counters are read in one batch
+                self._raw_reader.read_into(result)
+                now = time.perf_counter_ns()
+                for key, slot in zip(self._raw_keys, self._raw_slots):
+                    READ_CACHE.put(key, now, result[slot])
+            else:
+                for slot, value in zip(self._raw_slots, values):
+                    result[slot] = value
+
+        for device in self._read_devices:
+            keys = self._cache_keys[device]
+            values = [READ_CACHE.get(key, now, window) for key, _, _ in keys]
+            if None in values:
+                energy = self._device_api[device].energy()
+                now = time.perf_counter_ns()
+                values = [energy[socket_id] for _, socket_id, _ in keys]
+                for (key, _, _), value in zip(keys, values):
+                    READ_CACHE.put(key, now, value)
+            for (_, _, slot), value in zip(keys, values):
+                result[slot] = value
         return result
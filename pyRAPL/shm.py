@@ -0,0 +1,311 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Publication of the energy counters in a shared memory file
+
+A privileged process (``python -m pyRAPL.shmd``) samples a sensor and publishes the energy consumed by each device on
+each socket in a memory mapped file. Unprivileged processes read the counters with the ``shm`` backend : a read is a
+few memory loads in the mapped file, without system call.
+
+The file is protected by a sequence lock : the writer increments the sequence number before and after each update (the
+sequence number is odd during an update), a reader retries until it reads the same even sequence number before and
+after reading the values, for at most ``SNAPSHOT_TIMEOUT`` nano seconds.
+
+Readers only map files owned by root or by the user configured in ``ShmAPI.OWNER`` and not writable by the other users.
+
+File layout (little endian)::
+
+    magic (8 bytes) | sequence (u64) | stride (u32) | socket count (u32) | device ids (8 x u8) | timestamp (u64)
+    | values (stride x socket count x f64)
+
+The values are in the sensor layout, they are the energy consumed (in micro Joules) since the start of the publisher.
+They never wrap around, unmonitored values are -1. The timestamp is the ``time.monotonic_ns`` of the last update.
+"""
+import mmap
+import os
+import struct
+import time
+from typing import List, Optional
+
+from pyRAPL import Device, PyRAPLException, PyRAPLCantInitDeviceAPI
+from pyRAPL.backend import Backend, REGISTRY
+from pyRAPL.device_api import DeviceAPI
+from pyRAPL.sampler import Sampler
+from pyRAPL.sensor import Sensor
+from pyRAPL.topology import Topology
+
+SHM_FILE_NAME = '/dev/shm/pyRAPL'
+
+MAGIC = b'pyRAPL\x00\x01'
+HEADER = struct.Struct('<8sQII8BQ')
+SEQUENCE = struct.Struct('<Q')
+SEQUENCE_OFFSET = 8
+TIMESTAMP_OFFSET = 32
+VALUES_OFFSET = HEADER.size
+NO_DEVICE = 0xFF
+
+#: maximum age (in nano seconds) of the last update of a shared memory file used by a ShmAPI
+MAX_UPDATE_AGE = 1000000000
+
+#: maximum time (in nano seconds) spent by a reader waiting for a consistent copy of the published values
+SNAPSHOT_TIMEOUT = 100000000
+
+
+class SensorPublisher(Sampler):
+    """
+    Sample a sensor on a dedicated thread and publish the energy consumption in a shared memory file
+
+    The file is created with read permission for all the users. The temporary file used to initialise it must not
+    exist
+
+    :param file_name: name of the shared memory file
+    :param frequency: number of updates per second
+    :param sensor: sensor to publish, if None, the sensor configured by ``pyRAPL.setup`` is used
+    :raise OSError: if the temporary file already exists or can't be created
+    """
+
+    def __init__(self, file_name: str = SHM_FILE_NAME, frequency: float = 1000, sensor: Optional[Sensor] = None):
+        Sampler.__init__(self, frequency, 2, sensor)
+        self.file_name = file_name
+        devices = self.sensor.devices
+        width = self.buffer.width
+        self._values_format = struct.Struct('<' + 'd' * width)
+        device_ids = [int(device) for device in devices] + [NO_DEVICE] * (8 - len(devices))
+        header = HEADER.pack(MAGIC, 0, len(devices), width // len(devices), *device_ids, 0)
+
+        # the file is fully initialised before being visible to the readers
+        tmp_file_name = file_name + '.' + str(os.getpid())
+        # never follow or reuse a file planted by another user
+        fd = os.open(tmp_file_name, os.O_RDWR | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW, 0o644)
+        try:
+            os.fchmod(fd, 0o644)
+            os.write(fd, header + self._values_format.pack(*([-1] * width)))
+            self._map = mmap.mmap(fd, VALUES_OFFSET + self._values_format.size)
+        finally:
+            os.close(fd)
+        os.replace(tmp_file_name, file_name)
+        self._sequence = 0
+
+    def sample(self):
+        """
+        Read the sensor and publish the energy consumption
+        """
+        Sampler.sample(self)
+        self._sequence += 1
+        SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, self._sequence)
+        SEQUENCE.pack_into(self._map, TIMESTAMP_OFFSET, self.buffer.timestamps(1)[0])
+        self._values_format.pack_into(self._map, VALUES_OFFSET, *self._energy)
+        self._sequence += 1
+        SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, self._sequence)
+
+    def close(self):
+        """
+        Stop the publication and remove the shared memory file
+        """
+        self.stop()
+        self._map.close()
+        try:
+            os.remove(self.file_name)
+        except FileNotFoundError:
+            pass
+
+
+class SharedCounters:
+    """
+    Read only view on a shared memory file written by a ``SensorPublisher``
+
+    :param file_name: name of the shared memory file
+    :param owner: uid of the user allowed to own the file, in addition to root
+    :raise OSError: if the file can't be read
+    :raise ValueError: if the file isn't a pyRAPL shared memory file, isn't owned by root or ``owner`` or is writable by
+                       the other users
+    """
+
+    def __init__(self, file_name: str = SHM_FILE_NAME, owner: int = 0):
+        fd = os.open(file_name, os.O_RDONLY | os.O_NOFOLLOW)
+        try:
+            status = os.fstat(fd)
+            if status.st_uid not in (0, owner) or status.st_mode & 0o022:
+                raise ValueError(file_name + ' is not a trusted pyRAPL shared memory file')
+            self._map = mmap.mmap(fd, 0, prot=mmap.PROT_READ)
+        finally:
+            os.close(fd)
+        if self._map.size() < HEADER.size:
+            raise ValueError(file_name + ' is not a pyRAPL shared memory file')
+        magic, _, stride, socket_number, *device_ids, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(file_name + ' is not a pyRAPL shared memory file')
+        #: devices published in the file (sorted)
+        self.devices = [Device(device_id) for device_id in device_ids[:stride]]
+        self.stride = stride
+        self.socket_number = socket_number
+        self._values_format = struct.Struct('<' + 'd' * (stride * socket_number))
+
+    def snapshot(self):
+        """
+        :return: a tuple containing the timestamp of the last update and a consistent copy of the published values
+        :raise PyRAPLException: if no consistent copy could be read during ``SNAPSHOT_TIMEOUT`` nano seconds (the
+                                publisher died during an update)
+        """
+        shared_map = self._map
+        deadline = None
+        while True:
+            sequence = SEQUENCE.unpack_from(shared_map, SEQUENCE_OFFSET)[0]
+            if not sequence & 1:
+                timestamp = SEQUENCE.unpack_from(shared_map, TIMESTAMP_OFFSET)[0]
+                values = self._values_format.unpack_from(shared_map, VALUES_OFFSET)
+                if SEQUENCE.unpack_from(shared_map, SEQUENCE_OFFSET)[0] == sequence:
+                    return timestamp, values
+            # the clock is only read on retries
+            if deadline is None:
+                deadline = time.monotonic_ns() + SNAPSHOT_TIMEOUT
+            elif time.monotonic_ns() > deadline:
+                raise PyRAPLException('no consistent update of the shared memory file')
+
+    def close(self):
+        self._map.close()
+
+
+_shared_counters = {}
+
+
+def _get_shared_counters(file_name: str, owner: int) -> SharedCounters:
+    counters = _shared_counters.get(file_name)
+    try:
+        stale = counters is None or time.monotonic_ns() - counters.snapshot()[0] > MAX_UPDATE_AGE
+    except PyRAPLException:
+        stale = True
+    if stale:
+        # the file may have been replaced by a new publisher
+        counters = SharedCounters(file_name, owner)
+        _shared_counters[file_name] = counters
+    return counters
+
+
+class ShmAPI(DeviceAPI):
+    """
+    API to read energy consumption from a shared memory file written by a ``SensorPublisher``
+
+    The values are the energy consumed since the start of the publisher, they never wrap around. Implement the
+    ``DEVICE`` class attribute to define which device must be read. ``OWNER`` is the uid of the user allowed to run
+    the publisher, in addition to root
+
+    If the published values are older than ``MAX_UPDATE_AGE`` nano seconds, the file is opened again (the publisher
+    may have been restarted with a new file). The values of a restarted publisher start again from 0. Reading values
+    that stay older than ``MAX_UPDATE_AGE`` raises a ``PyRAPLException``
+    """
+
+    FILE_NAME = SHM_FILE_NAME
+    OWNER = 0
+    DEVICE = None
+    TEXT_COUNTER = False
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        DeviceAPI.__init__(self, socket_ids, topology)
+
+    def _get_rapl_file_names(self):
+        return [self.FILE_NAME]
+
+    def _open_rapl_files(self):
+        try:
+            counters = _get_shared_counters(self.FILE_NAME, self.OWNER)
+        except (OSError, ValueError, PyRAPLException):
+            raise PyRAPLCantInitDeviceAPI()
+        if self.DEVICE not in counters.devices or self._socket_ids[-1] >= counters.socket_number:
+            raise PyRAPLCantInitDeviceAPI()
+        position = counters.devices.index(self.DEVICE)
+        self._slots = [socket_id * counters.stride + position for socket_id in self._socket_ids]
+        try:
+            values = self._snapshot(counters)
+        except PyRAPLException:
+            # the publisher is stopped
+            raise PyRAPLCantInitDeviceAPI()
+        if any(values[slot] < 0 for slot in self._slots):
+            raise PyRAPLCantInitDeviceAPI()
+        return [counters]
+
+    @staticmethod
+    def _snapshot(counters: SharedCounters):
+        timestamp, values = counters.snapshot()
+        if time.monotonic_ns() - timestamp > MAX_UPDATE_AGE:
+            raise PyRAPLException('the shared memory file was not updated since ' + str(MAX_UPDATE_AGE) + 'ns')
+        return values
+
+    def _read_max_energy_ranges(self):
+        return [-1] * len(self._socket_ids)
+
+    def energy(self):
+        try:
+            values = self._snapshot(self._sys_files[0])
+        except PyRAPLException:
+            # the file may have been replaced by a restarted publisher
+            self._sys_files = self._open_rapl_files()
+            values = self._snapshot(self._sys_files[0])
+        result = [-1] * (self._socket_ids[-1] + 1)
+        for socket_id, slot in zip(self._socket_ids, self._slots):
+            result[socket_id] = values[slot]
+        return tuple(result)
+
+
+class ShmPkgAPI(ShmAPI):
+    DEVICE = Device.PKG
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        ShmAPI.__init__(self, socket_ids, topology)
+
+
+class ShmDramAPI(ShmAPI):
+    DEVICE = Device.DRAM
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        ShmAPI.__init__(self, socket_ids, topology)
+
+
+class ShmCoreAPI(ShmAPI):
+    DEVICE = Device.CORE
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        ShmAPI.__init__(self, socket_ids, topology)
+
+
+class ShmUncoreAPI(ShmAPI):
+    DEVICE = Device.UNCORE
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        ShmAPI.__init__(self, socket_ids, topology)
+
+
+class ShmPsysAPI(ShmAPI):
+    """
+    The psys energy consumption is published on the first socket
+    """
+    DEVICE = Device.PSYS
+
+    def __init__(self, socket_ids: Optional[List[int]] = None, topology: Optional[Topology] = None):
+        ShmAPI.__init__(self, socket_ids, topology)
+
+    def _get_rapl_file_names(self):
+        self._socket_ids = self._socket_ids[:1]
+        return ShmAPI._get_rapl_file_names(self)
+
+
+# memory loads only, only used when explicitly given : processes don't depend on a publisher unless they ask for it
+REGISTRY.register(Backend('shm', {Device.PKG: ShmPkgAPI, Device.DRAM: ShmDramAPI, Device.CORE: ShmCoreAPI,
+                                  Device.UNCORE: ShmUncoreAPI, Device.PSYS: ShmPsysAPI}, read_cost=0.5, probed=False))
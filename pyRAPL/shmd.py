@@ -0,0 +1,62 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Daemon publishing the energy consumption of the machine in a shared memory file, read by the ``shm`` backend::
+
+    python -m pyRAPL.shmd --file /dev/shm/pyRAPL --frequency 1000
+"""
+import argparse
+import time
+from typing import List, Optional
+
+from pyRAPL import Device, Sensor
+from pyRAPL.shm import SensorPublisher, SHM_FILE_NAME
+
+
+def main(args: Optional[List[str]] = None):
+    """
+    Publish the energy consumption of the machine in a shared memory file until the process is interrupted
+    """
+    parser = argparse.ArgumentParser(prog='python -m pyRAPL.shmd', description=main.__doc__)
+    parser.add_argument('--file', default=SHM_FILE_NAME, help='shared memory file (default: %(default)s)')
+    parser.add_argument('--frequency', type=float, default=1000, help='updates per second (default: %(default)s)')
+    parser.add_argument('--backend', default=None, help='backend used to read the energy consumption')
+    parser.add_argument('--devices', nargs='*', choices=[device.name.lower() for device in Device],
+                        help='published devices (default: all the available devices)')
+    options = parser.parse_args(args)
+
+    # the publisher must not read its own file (the shm backend is never probed)
+    if options.backend == 'shm':
+        parser.error('the shm backend can\'t be published')
+
+    devices = [Device[name.upper()] for name in options.devices] if options.devices else None
+    publisher = SensorPublisher(options.file, options.frequency, Sensor(devices=devices, backend=options.backend))
+    publisher.start()
+    try:
+        while publisher.running:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Running statistics on energy measures
+"""
+import bisect
+import math
+from dataclasses import dataclass
+from typing import List
+
+
+class RunningStats:
+    """
+    Mean and variance of a vector of values (one value for each socket for example), updated one vector at a time with
+    the Welford algorithm
+
+    Negative values (unmonitored sockets) are ignored
+
+    :param width: size of the vectors
+    """
+
+    def __init__(self, width: int):
+        self.counts = [0] * width
+        self.means = [0.0] * width
+        self._m2 = [0.0] * width
+
+    def update(self, values: List[float]):
+        """
+        add a vector of values to the statistics
+        """
+        for i, value in enumerate(values):
+            if value < 0:
+                continue
+            self.counts[i] += 1
+            delta = value - self.means[i]
+            self.means[i] += delta / self.counts[i]
+            self._m2[i] += delta * (value - self.means[i])
+
+    @property
+    def mean(self) -> List[float]:
+        """
+        mean of each value (-1 if no value was recorded)
+        """
+        return [mean if count > 0 else -1 for count, mean in zip(self.counts, self.means)]
+
+    @property
+    def variance(self) -> List[float]:
+        """
+        sample variance of each value (-1 if no value was recorded, ``inf`` if only one value was recorded)
+        """
+        return [m2 / (count - 1) if count > 1 else (math.inf if count == 1 else -1)
+                for count, m2 in zip(self.counts, self._m2)]
+
+
+@dataclass(frozen=True)
+class Distribution:
+    """
+    Distribution of a vector of values (one value for each socket for example). Each attribute contains one element for
+    each value of the vector
+
+    :var counts: number of recorded values
+    :vartype counts: List[int]
+    :var sums: sum of the recorded values
+    :vartype sums: List[float]
+    :var mins: minimum of the recorded values (-1 if no value was recorded)
+    :vartype mins: List[float]
+    :var maxs: maximum of the recorded values (-1 if no value was recorded)
+    :vartype maxs: List[float]
+    :var means: mean of the recorded values (-1 if no value was recorded)
+    :vartype means: List[float]
+    :var variances: sample variance of the recorded values (see ``RunningStats.variance``)
+    :vartype variances: List[float]
+    :var buckets: upper bounds of the histogram buckets (the last bucket contains the values greater than the last
+                  bound)
+    :vartype buckets: List[float]
+    :var histograms: number of recorded values in each bucket
+    :vartype histograms: List[List[int]]
+    """
+    counts: List[int]
+    sums: List[float]
+    mins: List[float]
+    maxs: List[float]
+    means: List[float]
+    variances: List[float]
+    buckets: List[float]
+    histograms: List[List[int]]
+
+
+class RunningDistribution(RunningStats):
+    """
+    Running statistics (see ``RunningStats``) with the sum, the minimum, the maximum and a fixed buckets histogram of
+    each value
+
+    :param width: size of the vectors
+    :param buckets: sorted upper bounds of the histogram buckets
+    """
+
+    def __init__(self, width: int, buckets: List[float]):
+        RunningStats.__init__(self, width)
+        self.buckets = list(buckets)
+        self.sums = [0.0] * width
+        self.mins = [math.inf] * width
+        self.maxs = [-math.inf] * width
+        self.histograms = [[0] * (len(buckets) + 1) for _ in range(width)]
+
+    def update(self, values: List[float]):
+        RunningStats.update(self, values)
+        for i, value in enumerate(values):
+            if value < 0:
+                continue
+            self.sums[i] += value
+            self.mins[i] = min(self.mins[i], value)
+            self.maxs[i] = max(self.maxs[i], value)
+            self.histograms[i][bisect.bisect_left(self.buckets, value)] += 1
+
+    def distribution(self) -> Distribution:
+        """
+        :return: the distribution of the recorded values
+        """
+        return Distribution(list(self.counts), list(self.sums),
+                            [value if count > 0 else -1 for count, value in zip(self.counts, self.mins)],
+                            [value if count > 0 else -1 for count, value in zip(self.counts, self.maxs)],
+                            self.mean, self.variance, list(self.buckets),
+                            [list(histogram) for histogram in self.histograms])
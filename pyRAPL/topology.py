@@ -0,0 +1,234 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+CPU_DIRECTORY = '/sys/devices/system/cpu'
+POWERCAP_DIRECTORY = '/sys/class/powercap'
+BOOT_ID_FILE = '/proc/sys/kernel/random/boot_id'
+
+#: powercap control types scanned to find RAPL zones. Zones of a control type are only used for the domains that were
+#: not found in the previous control types
+CONTROL_TYPES = ('intel-rapl', 'intel-rapl-mmio')
+
+
+def _read_first_line(file_name: str) -> str:
+    with open(file_name, 'r') as api_file:
+        return api_file.readline().strip()
+
+
+def parse_cpu_list(cpu_list: str) -> List[int]:
+    """
+    Parse a cpu list in the sysfs format (ex: ``0-3,8,10-11``)
+
+    :param cpu_list: string to parse
+    :return: list of the cpu ids, in the order they are given in the string
+    """
+    cpu_id_list = []
+    for cpu_range in cpu_list.split(','):
+        cpu_range = cpu_range.strip()
+        if not cpu_range:
+            continue
+        if '-' in cpu_range:
+            first, last = cpu_range.split('-')
+            cpu_id_list.extend(range(int(first), int(last) + 1))
+        else:
+            cpu_id_list.append(int(cpu_range))
+    return cpu_id_list
+
+
+def read_boot_id() -> Optional[str]:
+    """
+    :return: identifier of the current boot of the machine, None if it is not available
+    """
+    try:
+        return _read_first_line(BOOT_ID_FILE)
+    except OSError:
+        return None
+
+
+def read_cpu_ids() -> List[int]:
+    """
+    :return: id of the cpus present on the machine
+    """
+    return parse_cpu_list(_read_first_line(CPU_DIRECTORY + '/present'))
+
+
+def read_cpu_socket_ids() -> Dict[int, int]:
+    """
+    :return: cpu socket id of each cpu present on the machine
+    """
+    cpus = {}
+    for cpu_id in read_cpu_ids():
+        cpus[cpu_id] = int(_read_first_line(CPU_DIRECTORY + '/cpu' + str(cpu_id) + '/topology/physical_package_id'))
+    return cpus
+
+
+@dataclass
+class Topology:
+    """
+    Indexed model of the cpus and RAPL powercap zones of the machine
+
+    :var cpus: cpu socket id of each cpu
+    :vartype cpus: Dict[int, int]
+    :var zones: for each cpu socket, directory of each powercap zone of the socket indexed by domain name. The
+                package zone is indexed with ``'package'``, its subzones with their name (``'dram'``, ``'core'``, ...)
+    :vartype zones: Dict[int, Dict[str, str]]
+    :var platform_zones: directory of each powercap zone that isn't related to a socket (``'psys'``) indexed by
+                         domain name
+    :vartype platform_zones: Dict[str, str]
+    :var boot_id: identifier of the boot during which the topology was discovered
+    :vartype boot_id: Optional[str]
+    """
+    cpus: Dict[int, int] = field(default_factory=dict)
+    zones: Dict[int, Dict[str, str]] = field(default_factory=dict)
+    platform_zones: Dict[str, str] = field(default_factory=dict)
+    boot_id: Optional[str] = None
+
+    @staticmethod
+    def discover() -> 'Topology':
+        """
+        Scan sysfs once to build the topology of the machine
+        """
+        topology = Topology(cpus=read_cpu_socket_ids(), boot_id=read_boot_id())
+        for control_type in CONTROL_TYPES:
+            topology._discover_zones(control_type)
+        return topology
+
+    def _discover_zones(self, control_type: str):
+        control_type_directory = POWERCAP_DIRECTORY + '/' + control_type
+        zone_name_regexp = re.compile(re.escape(control_type) + r':\d+$')
+        try:
+            zone_directory_names = sorted(os.listdir(control_type_directory))
+        except OSError:
+            return
+
+        for zone_directory_name in zone_directory_names:
+            if not zone_name_regexp.match(zone_directory_name):
+                continue
+            zone_directory = control_type_directory + '/' + zone_directory_name
+            try:
+                zone_name = _read_first_line(zone_directory + '/name')
+            except OSError:
+                continue
+            if not zone_name.startswith('package-'):
+                self.platform_zones.setdefault(zone_name, zone_directory)
+                continue
+            socket_id = int(zone_name.split('-')[1])
+
+            socket_zones = self.zones.setdefault(socket_id, {})
+            socket_zones.setdefault('package', zone_directory)
+            subzone_name_regexp = re.compile(re.escape(zone_directory_name) + r':\d+$')
+            for subzone_directory_name in sorted(os.listdir(zone_directory)):
+                if not subzone_name_regexp.match(subzone_directory_name):
+                    continue
+                subzone_directory = zone_directory + '/' + subzone_directory_name
+                try:
+                    socket_zones.setdefault(_read_first_line(subzone_directory + '/name'), subzone_directory)
+                except OSError:
+                    continue
+
+    def socket_ids(self) -> List[int]:
+        """
+        :return: sorted list of the cpu socket ids of the machine
+        """
+        return sorted(set(self.cpus.values()))
+
+    def socket_cpus(self) -> Dict[int, List[int]]:
+        """
+        :return: for each cpu socket, the sorted list of the cpu ids of this socket
+        """
+        socket_cpus = {}
+        for cpu_id in sorted(self.cpus):
+            socket_cpus.setdefault(self.cpus[cpu_id], []).append(cpu_id)
+        return socket_cpus
+
+    def zone(self, socket_id: int, domain: str) -> Optional[str]:
+        """
+        :param socket_id: cpu socket id
+        :param domain: domain name (``'package'``, ``'dram'``, ...)
+        :return: directory of the powercap zone of the domain on the given socket, None if it doesn't exist
+        """
+        return self.zones.get(socket_id, {}).get(domain)
+
+    def to_dict(self) -> dict:
+        """
+        :return: a json serializable representation of the topology
+        """
+        return {'boot_id': self.boot_id,
+                'cpus': {str(cpu_id): socket_id for cpu_id, socket_id in self.cpus.items()},
+                'zones': {str(socket_id): zones for socket_id, zones in self.zones.items()},
+                'platform_zones': self.platform_zones}
+
+    @staticmethod
+    def from_dict(data: dict) -> 'Topology':
+        """
+        :param data: topology representation returned by ``to_dict``
+        """
+        return Topology(cpus={int(cpu_id): socket_id for cpu_id, socket_id in data['cpus'].items()},
+                        zones={int(socket_id): zones for socket_id, zones in data['zones'].items()},
+                        platform_zones=data['platform_zones'],
+                        boot_id=data['boot_id'])
+
+
+def _load_cached_topology(cache_file_name: str, boot_id: str) -> Optional[Topology]:
+    try:
+        with open(cache_file_name, 'r') as cache_file:
+            topology = Topology.from_dict(json.load(cache_file))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return topology if topology.boot_id == boot_id else None
+
+
+def _save_topology(cache_file_name: str, topology: Topology):
+    tmp_file_name = cache_file_name + '.' + str(os.getpid())
+    try:
+        with open(tmp_file_name, 'w') as cache_file:
+            json.dump(topology.to_dict(), cache_file)
+        os.replace(tmp_file_name, cache_file_name)
+    except OSError:
+        pass
+
+
+def get_topology(cache_file_name: Optional[str] = None) -> Topology:
+    """
+    Get the topology of the machine
+
+    :param cache_file_name: if not None, name of a file used to persist the topology. The topology is loaded from this
+                            file if it was discovered during the current boot of the machine, otherwise, it is
+                            discovered and saved in this file
+    :return: the topology of the machine
+    """
+    if cache_file_name is None:
+        return Topology.discover()
+
+    boot_id = read_boot_id()
+    if boot_id is not None:
+        topology = _load_cached_topology(cache_file_name, boot_id)
+        if topology is not None:
+            return topology
+
+    topology = Topology.discover()
+    if boot_id is not None:
+        _save_topology(cache_file_name, topology)
+    return topology
@@ -17,6 +17,7 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
+import time
 
 from tests.utils import fs_one_socket, write_new_energy_value, PKG_0_VALUE, DRAM_0_VALUE
 import pyRAPL
@@ -60,3 +61,40 @@ def test_context_measure(fs_one_socket):
 
     assert out.data.pkg == [(POWER_CONSUMPTION_PKG - PKG_0_VALUE)]
     assert out.data.dram == [(POWER_CONSUMPTION_DRAM - DRAM_0_VALUE)]
+
+
+def test_context_measure_with_sensor(fs_one_socket):
+    """
+    Test to measure the energy consumption of a function with a Measurement using an explicit sensor that only monitors
+    the package
+
+    Test if:
+      - the given sensor is used instead of the sensor configured by setup
+    """
+    pyRAPL.setup()
+    sensor = pyRAPL.Sensor(devices=[pyRAPL.Device.PKG])
+    out = dummyOutput()
+    with pyRAPL.Measurement('toto', output=out, sensor=sensor):
+        measurable_function(1)
+
+    assert out.data.pkg == [(POWER_CONSUMPTION_PKG - PKG_0_VALUE)]
+    assert out.data.dram is None
+
+
+def test_context_measure_monotonic_duration(fs_one_socket, monkeypatch):
+    """
+    Test to measure the energy consumption of a function while the wall clock jumps one hour forward
+
+    Test if:
+      - the duration is measured with a monotonic clock and isn't affected by the jump
+      - the result contains the uncertainty caused by the read windows of the sensor
+    """
+    pyRAPL.setup()
+    out = dummyOutput()
+    time_ns = time.time_ns
+    with pyRAPL.Measurement('toto', output=out):
+        monkeypatch.setattr(time, 'time_ns', lambda: time_ns() + 3600 * 10 ** 9)
+        measurable_function(1)
+
+    assert 0 <= out.data.duration < 3600 * 10 ** 6
+    assert out.data.duration_error >= 0
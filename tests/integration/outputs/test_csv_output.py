@@ -20,10 +20,23 @@
 import pytest
 import pyfakefs
 
+import csv
 import os
 
-from pyRAPL import Result
-from pyRAPL.outputs import CSVOutput
+import types
+
+import pyRAPL
+from pyRAPL import Device, Result
+from pyRAPL.outputs import AggregatedOutput, CSVOutput
+
+
+@pytest.fixture(autouse=True)
+def no_setup(monkeypatch):
+    """
+    remove the sensor configured by pyRAPL.setup in other tests
+    """
+    monkeypatch.setattr(pyRAPL, '_sensor', None)
+
 
 def test_add_2_result_in_empty_file(fs):
     """
@@ -46,12 +59,12 @@ def test_add_2_result_in_empty_file(fs):
     assert os.path.exists('toto.csv')
 
     csv_file = open('toto.csv', 'r')
-    assert csv_file.readline() == 'label,timestamp,duration,pkg,dram,socket\n'
+    assert csv_file.readline() == 'label,timestamp,duration,pkg,dram,duration_error,pkg_error,dram_error,socket\n'
 
     output.save()
     for result in result_list:
-        line1 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[0]},{result.dram[0]},0\n"""
-        line2 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[1]},{result.dram[1]},1\n"""
+        line1 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[0]},{result.dram[0]},None,None,None,0\n"""
+        line2 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[1]},{result.dram[1]},None,None,None,1\n"""
 
         assert line1 == csv_file.readline()
         assert line2 == csv_file.readline()
@@ -124,12 +137,12 @@ def test_add_2_result_in_non_empty_file_non_append(fs):
     assert os.path.exists('toto.csv')
 
     csv_file = open('toto.csv', 'r')
-    assert csv_file.readline() == 'label,timestamp,duration,pkg,dram,socket\n'
+    assert csv_file.readline() == 'label,timestamp,duration,pkg,dram,duration_error,pkg_error,dram_error,socket\n'
 
     output.save()
     for result in result_list:
-        line1 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[0]},{result.dram[0]},0\n"""
-        line2 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[1]},{result.dram[1]},1\n"""
+        line1 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[0]},{result.dram[0]},None,None,None,0\n"""
+        line2 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[1]},{result.dram[1]},None,None,None,1\n"""
 
         assert line1 == csv_file.readline()
         assert line2 == csv_file.readline()
@@ -158,15 +171,15 @@ def test_two_save_call(fs):
     output = CSVOutput('toto.csv')
     assert os.path.exists('toto.csv')
     csv_file = open('toto.csv', 'r')
-    assert csv_file.readline() == 'label,timestamp,duration,pkg,dram,socket\n'
+    assert csv_file.readline() == 'label,timestamp,duration,pkg,dram,duration_error,pkg_error,dram_error,socket\n'
     assert csv_file.readline() == ''  # end of file
 
     result = result_list[0]
     output.add(result)
     output.save()
 
-    line1 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[0]},{result.dram[0]},0\n"""
-    line2 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[1]},{result.dram[1]},1\n"""
+    line1 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[0]},{result.dram[0]},None,None,None,0\n"""
+    line2 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[1]},{result.dram[1]},None,None,None,1\n"""
 
     assert line1 == csv_file.readline()
     assert line2 == csv_file.readline()
@@ -177,10 +190,10 @@ def test_two_save_call(fs):
     output.save()
     csv_file = open('toto.csv', 'r')
 
-    assert csv_file.readline() == 'label,timestamp,duration,pkg,dram,socket\n'
+    assert csv_file.readline() == 'label,timestamp,duration,pkg,dram,duration_error,pkg_error,dram_error,socket\n'
     for result in result_list:
-        line1 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[0]},{result.dram[0]},0\n"""
-        line2 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[1]},{result.dram[1]},1\n"""
+        line1 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[0]},{result.dram[0]},None,None,None,0\n"""
+        line2 = f"""{result.label},{result.timestamp},{result.duration},{result.pkg[1]},{result.dram[1]},None,None,None,1\n"""
 
         assert line1 == csv_file.readline()
         assert line2 == csv_file.readline()
@@ -210,13 +223,85 @@ def test_add_2_result_in_empty_file_semicolon_separator(fs):
     assert os.path.exists('toto.csv')
 
     csv_file = open('toto.csv', 'r')
-    assert csv_file.readline() == 'label;timestamp;duration;pkg;dram;socket\n'
+    assert csv_file.readline() == 'label;timestamp;duration;pkg;dram;duration_error;pkg_error;dram_error;socket\n'
 
     output.save()
     for result in result_list:
-        line1 = f"""{result.label};{result.timestamp};{result.duration};{result.pkg[0]};{result.dram[0]};0\n"""
-        line2 = f"""{result.label};{result.timestamp};{result.duration};{result.pkg[1]};{result.dram[1]};1\n"""
+        line1 = f"""{result.label};{result.timestamp};{result.duration};{result.pkg[0]};{result.dram[0]};None;None;None;0\n"""
+        line2 = f"""{result.label};{result.timestamp};{result.duration};{result.pkg[1]};{result.dram[1]};None;None;None;1\n"""
 
         assert line1 == csv_file.readline()
         assert line2 == csv_file.readline()
     assert csv_file.readline() == ''
+
+
+def test_add_summary(fs):
+    """
+    Use a CSVOutput instance writing the summary columns to save the aggregation of 2 results labeled 'toto' and read
+    the csv file back
+
+    Test if:
+      - the header contains the count and the distribution columns of the duration and of each device
+      - the file contains one line by socket with the number of results, the distribution of each value and the
+        histograms (space separated)
+    """
+    output = CSVOutput('toto.csv', summary=True)
+    aggregated = AggregatedOutput(output, energy_buckets=[0.5], duration_buckets=[0.15])
+    aggregated.add(Result('toto', 0, 0.1, [0.1111, 0.2222], [0.3333, 0.4444]))
+    aggregated.add(Result('toto', 1, 0.2, [0.5555, 0.6666], [0.7777, 0.8888]))
+    aggregated.close()
+
+    with open('toto.csv', 'r') as csv_file:
+        lines = list(csv.DictReader(csv_file))
+    assert list(lines[0].keys()) == (
+        ['label', 'timestamp', 'count'] +
+        [column + suffix for column in ['duration', 'pkg', 'dram']
+         for suffix in ['', '_min', '_max', '_mean', '_variance', '_buckets', '_histogram']] + ['socket'])
+    assert len(lines) == 2
+    assert (lines[0]['label'], lines[0]['timestamp'], lines[0]['count']) == ('toto', '0', '2')
+    assert float(lines[0]['duration']) == pytest.approx(0.3)
+    assert lines[0]['duration_histogram'] == '1 1'
+    assert float(lines[1]['pkg']) == pytest.approx(0.8888)
+    assert float(lines[1]['pkg_min']) == pytest.approx(0.2222)
+    assert float(lines[1]['pkg_max']) == pytest.approx(0.6666)
+    assert float(lines[1]['dram_mean']) == pytest.approx(0.6666)
+    assert lines[1]['pkg_buckets'] == '0.5'
+    assert lines[1]['pkg_histogram'] == '1 1'
+    assert lines[1]['socket'] == '1'
+
+
+def test_add_summary_without_summary_columns(fs):
+    """
+    Test if a CSVOutput instance without the summary columns writes the total duration and energy consumption of the
+    aggregated results
+    """
+    output = CSVOutput('toto.csv')
+    aggregated = AggregatedOutput(output)
+    aggregated.add(Result('toto', 0, 0.1, [1, 2]))
+    aggregated.add(Result('toto', 1, 0.2, [3, 4]))
+    aggregated.close()
+
+    with open('toto.csv', 'r') as csv_file:
+        assert csv_file.read() == 'label,timestamp,duration,pkg,dram,duration_error,pkg_error,dram_error,socket\n' \
+                                  'toto,0,0.30000000000000004,4.0,None,None,None,None,0\n' \
+                                  'toto,0,0.30000000000000004,6.0,None,None,None,None,1\n'
+
+
+def test_default_columns_from_setup_sensor(fs, monkeypatch):
+    """
+    Test if a CSVOutput instance created without devices writes the energy and uncertainty columns of the devices of
+    the sensor configured by pyRAPL.setup
+    """
+    monkeypatch.setattr(pyRAPL, '_sensor', types.SimpleNamespace(devices=[Device.PKG, Device.CORE, Device.PSYS]))
+    output = CSVOutput('toto.csv')
+    output.add(Result('toto', 0, 0.1, [1, 2], core=[3, 4], psys=[5], error={Device.PKG: [0.5, 0.5]},
+                      duration_error=0.01))
+    output.save()
+
+    with open('toto.csv', 'r') as csv_file:
+        lines = list(csv.DictReader(csv_file))
+    assert list(lines[0].keys()) == ['label', 'timestamp', 'duration', 'pkg', 'core', 'psys', 'duration_error',
+                                     'pkg_error', 'core_error', 'psys_error', 'socket']
+    assert [line['psys'] for line in lines] == ['5', 'None']
+    assert [line['pkg_error'] for line in lines] == ['0.5', '0.5']
+    assert [line['duration_error'] for line in lines] == ['0.01', '0.01']
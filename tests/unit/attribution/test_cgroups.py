@@ -0,0 +1,113 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+
+import pytest
+
+from pyRAPL import Device
+from pyRAPL.attribution import CgroupAttribution
+from pyRAPL.attribution.cgroups import parse_usage_usec, read_machine_usage
+from tests.utils import FakeSensor
+
+CGROUP_DIR_NAME = '/sys/fs/cgroup'
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+
+def write_cpu_stat(cgroup, usage_usec):
+    with open(CGROUP_DIR_NAME + '/' + cgroup + '/cpu.stat', 'w') as stat_file:
+        stat_file.write('usage_usec ' + str(usage_usec) + '\nuser_usec 0\nsystem_usec 0\n')
+
+
+def write_proc_stat(busy_usec):
+    ticks = busy_usec * CLOCK_TICKS // 1000000
+    with open('/proc/stat', 'w') as stat_file:
+        stat_file.write('cpu  ' + str(ticks) + ' 0 0 5000 10 0 0 0 0 0\ncpu0 0 0 0 0 0 0 0 0 0 0\n')
+
+
+@pytest.fixture
+def fake_cgroupfs(fs):
+    """
+    create a cgroup file system with two cgroups (a and b) and a /proc/stat file
+    """
+    for cgroup in ('a', 'b'):
+        fs.create_dir(CGROUP_DIR_NAME + '/' + cgroup)
+        write_cpu_stat(cgroup, 0)
+    fs.create_file('/proc/stat')
+    write_proc_stat(0)
+    return fs
+
+
+#########
+# PARSE #
+#########
+def test_parse_usage_usec():
+    assert parse_usage_usec(b'usage_usec 1234\nuser_usec 1000\nsystem_usec 234\n') == 1234
+
+
+def test_read_machine_usage_without_idle(fake_cgroupfs):
+    write_proc_stat(1000000)
+    assert read_machine_usage() == 1000000
+
+
+###############
+# ATTRIBUTION #
+###############
+def test_attribute_cgroups(fake_cgroupfs):
+    """
+    cgroups a and b use 1 and 2 seconds of CPU time while the machine uses 4 seconds
+    Test if:
+      - the energy of each device on each socket is split between the cgroups proportionally to their usage
+      - the remaining energy is attributed to None
+    """
+    attribution = CgroupAttribution(['a', CGROUP_DIR_NAME + '/b'], sensor=FakeSensor([0] * 4, devices=[Device.PKG, Device.DRAM], increment=1000))
+    write_cpu_stat('a', 1000000)
+    write_cpu_stat('b', 2000000)
+    write_proc_stat(4000000)
+
+    results = {result.label: result for result in attribution.collect()}
+    assert results['a'].pkg == [250, 250]
+    assert results['a'].dram == [250, 250]
+    assert results[CGROUP_DIR_NAME + '/b'].pkg == [500, 500]
+    assert results[None].pkg == [250, 250]
+
+
+def test_removed_cgroup(fake_cgroupfs, monkeypatch):
+    attribution = CgroupAttribution(['a', 'b'], sensor=FakeSensor([0] * 4, devices=[Device.PKG, Device.DRAM], increment=1000))
+    original_read_usage = CgroupAttribution._read_usage
+
+    def read_usage(fd):
+        if fd == attribution._fds['b']:
+            raise OSError(19, 'No such device')
+        return original_read_usage(fd)
+    monkeypatch.setattr(CgroupAttribution, '_read_usage', staticmethod(read_usage))
+    write_cpu_stat('a', 1000000)
+    write_proc_stat(1000000)
+
+    assert [result.label for result in attribution.collect()] == ['a']
+    assert attribution.cgroups == ['a']
+
+
+def test_stream(fake_cgroupfs):
+    attribution = CgroupAttribution(['a'], sensor=FakeSensor([0] * 4, devices=[Device.PKG, Device.DRAM], increment=1000))
+    stream = attribution.stream(0.001)
+    assert [result.label for result in next(stream)] == [None]
+    assert [result.label for result in next(stream)] == [None]
+    attribution.close()
+    assert attribution.cgroups == []
@@ -0,0 +1,185 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import threading
+from array import array
+
+import pytest
+
+import pyRAPL
+import pyRAPL.attribution.markers
+from pyRAPL import Device, MarkerRecorder, Measurement, measureit, RingBuffer
+from pyRAPL.attribution import interpolate_energy
+from tests.utils import FakeSensor
+
+
+class FakeSampler:
+    """
+    Sampler containing 3 samples at 0, 1000 and 2000 ns
+    """
+
+    def __init__(self):
+        self.sensor = FakeSensor([-1] * 4, devices=[Device.PKG, Device.DRAM])
+        self.buffer = RingBuffer(4, 10)
+        self.buffer.append(1000, array('d', [0, 0, 0, -1]))
+        self.buffer.append(2000, array('d', [100, 10, 1000, -1]))
+        self.buffer.append(3000, array('d', [300, 20, 3000, -1]))
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def with_and_without_numpy(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(pyRAPL.attribution.markers, 'numpy', None)
+
+
+############
+# RECORDER #
+############
+def test_drain_markers_of_all_threads():
+    """
+    record markers from 4 threads
+    Test if:
+      - drain returns the markers of all the threads sorted by beginning
+      - the buffers are empty after the drain
+    """
+    recorder = MarkerRecorder()
+
+    def record(thread_id):
+        for i in range(100):
+            recorder.record('thread' + str(thread_id), i * 4 + thread_id, i * 4 + thread_id + 1)
+    threads = [threading.Thread(target=record, args=(thread_id,)) for thread_id in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    markers = recorder.drain()
+    assert len(markers) == 400
+    assert [marker[1] for marker in markers] == list(range(400))
+    assert markers[5] == ('thread1', 5, 6, 1)
+    assert recorder.drain() == []
+
+
+###############
+# INTERPOLATE #
+###############
+def test_interpolate_energy(with_and_without_numpy):
+    """
+    Test if:
+      - values are linearly interpolated between the surrounding samples
+      - values at a sample timestamp are the sample values
+      - negative columns are -1
+    """
+    buffer = FakeSampler().buffer
+    energy = interpolate_energy(buffer.timestamps(), buffer.values(), 4, [1000, 1500, 2000, 2750, 3000])
+    assert [list(row) for row in energy] == [[0, 0, 0, -1], [50, 5, 500, -1], [100, 10, 1000, -1],
+                                             [250, 17.5, 2500, -1], [300, 20, 3000, -1]]
+
+
+#############
+# ATTRIBUTE #
+#############
+def test_attribute_markers(with_and_without_numpy):
+    """
+    attribute 4 markers : one inside the samples, one covering two samples, one that began before the first sample and
+    one that ends after the last sample
+    Test if:
+      - the energy of the markers inside the samples is attributed, by device and socket
+      - the marker that began before the first sample is dropped
+      - the marker that ends after the last sample is kept for the next attribution
+    """
+    recorder = MarkerRecorder()
+    sampler = FakeSampler()
+    recorder.record('inside', 1500, 2000)
+    recorder.record('covering', 1500, 2750, number=2)
+    recorder.record('before', 500, 1500)
+    recorder.record('after', 2500, 3500)
+
+    results = recorder.attribute(sampler)
+    assert [result.label for result in results] == ['inside', 'covering']
+    assert results[0].pkg == [50, 500]
+    assert results[0].dram == [5, -1]
+    assert results[0].duration == 0.5
+    assert results[1].pkg == [100, 1000]
+    assert results[1].dram == [6.25, -1]
+    assert results[1].duration == 0.625
+    assert recorder.dropped == 1
+
+    sampler.buffer.append(4000, array('d', [400, 30, 4000, -1]))
+    results = recorder.attribute(sampler)
+    assert [result.label for result in results] == ['after']
+    assert results[0].pkg == [150, 1500]
+
+
+def test_attribute_while_sampling(with_and_without_numpy):
+    """
+    attribute a marker while the sampler appends a sample just after the copy of its buffer
+    Test if the marker ending after the last copied sample is kept for the next attribution
+    """
+    recorder = MarkerRecorder()
+    sampler = FakeSampler()
+    copy = sampler.buffer.copy
+
+    def copy_and_sample(n=None):
+        samples = copy(n)
+        sampler.buffer.append(4000, array('d', [400, 30, 4000, -1]))
+        return samples
+    sampler.buffer.copy = copy_and_sample
+    recorder.record('inside', 1500, 2000)
+    recorder.record('after', 2500, 3500)
+
+    results = recorder.attribute(sampler)
+    assert [result.label for result in results] == ['inside']
+    assert results[0].pkg == [50, 500]
+    assert [result.label for result in recorder.attribute(sampler)] == ['after']
+
+
+###############
+# MARKER MODE #
+###############
+def test_measurement_marker_mode(monkeypatch):
+    """
+    Test if a measurement in marker mode records a marker without reading the sensor nor exporting a result
+    """
+    sensor = FakeSensor([-1] * 4, devices=[Device.PKG, Device.DRAM])
+    monkeypatch.setattr(pyRAPL, '_sensor', sensor)
+    recorder = MarkerRecorder()
+    with Measurement('block', markers=recorder):
+        pass
+    assert sensor.reads == 0
+    markers = recorder.drain()
+    assert len(markers) == 1
+    label, start, end, number = markers[0]
+    assert label == 'block' and start <= end and number == 1
+
+
+def test_measureit_marker_mode(monkeypatch):
+    sensor = FakeSensor([-1] * 4, devices=[Device.PKG, Device.DRAM])
+    monkeypatch.setattr(pyRAPL, '_sensor', sensor)
+    recorder = MarkerRecorder()
+
+    @measureit(markers=recorder, number=3)
+    def foo():
+        return 42
+
+    assert foo() == 42
+    assert sensor.reads == 0
+    assert [(marker[0], marker[3]) for marker in recorder.drain()] == [('foo', 3)]
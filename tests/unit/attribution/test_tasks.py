@@ -0,0 +1,131 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import asyncio
+import time
+
+import pytest
+
+from pyRAPL import Device
+from pyRAPL.attribution import TaskAttribution, split_energy
+from tests.utils import FakeSensor
+
+
+class FakeClock:
+    """
+    CPU clock only advanced by the tests
+    """
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_process_time(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, 'process_time_ns', clock)
+    return clock
+
+
+#########
+# SPLIT #
+#########
+def test_split_energy_sum_to_total():
+    """
+    Test if:
+      - the energy is split proportionally to the weights
+      - the parts sum exactly to the total
+      - negative values are not split
+    """
+    parts = split_energy({Device.PKG: [0.3, -1]}, {'a': 1, 'b': 1, 'c': 1})
+    assert parts['a'][Device.PKG] == [pytest.approx(0.1), -1]
+    assert parts['a'][Device.PKG][0] + parts['b'][Device.PKG][0] + parts['c'][Device.PKG][0] == 0.3
+
+
+def test_split_energy_without_weight():
+    assert split_energy({Device.PKG: [100]}, {'a': 0}) == {}
+
+
+###############
+# ATTRIBUTION #
+###############
+def test_task_attribution(fake_process_time):
+    """
+    run 3 tasks : 2 tasks labeled 'a' and 'b' that use 10 and 30 ns of CPU time in two steps, and an unlabeled task
+    that uses 10 ns. The process uses 60 ns of CPU time
+    Test if:
+      - the energy (1000 uJ) is split proportionally to the CPU time of each label
+      - the CPU time of the unlabeled task and outside of the tasks is attributed to the label None
+      - the energy of the results sum to the measured energy
+    """
+    clock = FakeClock()
+
+    async def work(cost):
+        clock.now += cost // 2
+        await asyncio.sleep(0)
+        clock.now += cost // 2
+
+    async def main():
+        attribution = TaskAttribution(sensor=FakeSensor([0, -1], increment=1000), clock=clock)
+        attribution.install()
+
+        async def labeled(label, cost):
+            with attribution.label(label):
+                await work(cost)
+
+        await asyncio.gather(asyncio.ensure_future(labeled('a', 10)), asyncio.ensure_future(labeled('b', 30)),
+                             asyncio.ensure_future(work(10)))
+        attribution.uninstall()
+        fake_process_time.now = 60
+        return attribution.cpu_times, attribution.collect()
+
+    cpu_times, results = asyncio.run(main())
+    assert cpu_times == {'a': 10, 'b': 30, None: 10}
+    energy = {result.label: result.pkg for result in results}
+    assert energy == {'a': [pytest.approx(1000 / 6), -1], 'b': [pytest.approx(500), -1],
+                      None: [pytest.approx(1000 / 3), -1]}
+    assert sum(values[0] for values in energy.values()) == pytest.approx(1000)
+
+
+def test_child_tasks_inherit_label(fake_process_time):
+    clock = FakeClock()
+
+    async def main():
+        attribution = TaskAttribution(sensor=FakeSensor([0, -1], increment=1000), clock=clock)
+        attribution.install()
+
+        async def child():
+            clock.now += 5
+
+        with attribution.label('parent'):
+            await asyncio.ensure_future(child())
+        attribution.uninstall()
+        return attribution.cpu_times
+
+    assert asyncio.run(main()) == {'parent': 5}
+
+
+def test_collect_resets_window(fake_process_time):
+    attribution = TaskAttribution(sensor=FakeSensor([0, -1], increment=1000), clock=FakeClock())
+    fake_process_time.now = 10
+    assert [result.label for result in attribution.collect()] == [None]
+    assert attribution.collect() == []
@@ -0,0 +1,124 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import time
+
+import pytest
+
+from pyRAPL.attribution import ThreadAttribution, read_task_cpu_times
+from pyRAPL.attribution.threads import parse_stat_cpu_time
+from tests.utils import FakeSensor
+
+TASK_DIR_NAME = '/proc/self/task/'
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+
+def stat_content(tid, utime, stime):
+    return str(tid) + ' (worker (1) x) S 1 1 1 0 -1 4194560 100 0 0 0 ' + str(utime) + ' ' + str(stime) + ' 0 0 20 0\n'
+
+
+@pytest.fixture
+def fake_tasks(fs):
+    """
+    create the task directory of a process with 3 threads (100, 101, 102), the thread 102 has no schedstat file
+    """
+    fs.create_file(TASK_DIR_NAME + '100/schedstat', contents='1000 50 3\n')
+    fs.create_file(TASK_DIR_NAME + '101/schedstat', contents='3000 50 3\n')
+    fs.create_file(TASK_DIR_NAME + '102/stat', contents=stat_content(102, 0, 0))
+    return fs
+
+
+def set_cpu_time(tid, cpu_time):
+    with open(TASK_DIR_NAME + str(tid) + '/schedstat', 'w') as schedstat_file:
+        schedstat_file.write(str(cpu_time) + ' 0 0\n')
+
+
+########
+# READ #
+########
+def test_parse_stat_cpu_time():
+    assert parse_stat_cpu_time(stat_content(1, 3, 4).encode(), 100) == 70000000
+
+
+def test_read_task_cpu_times(fake_tasks):
+    """
+    Test if:
+      - the CPU time of each thread is read from its schedstat file
+      - the stat file is used when the schedstat file doesn't exist
+    """
+    fake_tasks.remove_object(TASK_DIR_NAME + '102/stat')
+    fake_tasks.create_file(TASK_DIR_NAME + '102/stat', contents=stat_content(102, 2, 3))
+    assert read_task_cpu_times() == {100: 1000, 101: 3000, 102: 5 * 1000000000 // CLOCK_TICKS}
+
+
+###############
+# ATTRIBUTION #
+###############
+def test_attribute_threads_and_labels(fake_tasks, monkeypatch):
+    """
+    threads 100 and 101 use 100 and 300 ns of CPU time, 200 ns of the thread 101 are used with the label 'job'
+    Test if:
+      - the energy is split between the threads proportionally to their CPU time
+      - the energy is split between the label and the unlabeled CPU time (label None)
+    """
+    clock = [0]
+    monkeypatch.setattr(time, 'clock_gettime_ns', lambda clock_id: clock[0])
+    attribution = ThreadAttribution(sensor=FakeSensor([0], increment=1000))
+
+    with attribution.label('job'):
+        clock[0] += 200
+    set_cpu_time(100, 1100)
+    set_cpu_time(101, 3300)
+
+    thread_results, label_results = attribution.collect()
+    assert {result.label: result.pkg for result in thread_results} == {'100': [250], '101': [750]}
+    assert {result.label: result.pkg for result in label_results} == {'job': [500], None: [500]}
+
+
+def test_open_label_counted_up_to_collect(fake_tasks, monkeypatch):
+    """
+    the thread 101 uses 200 ns of CPU time with the label 'job' before a first collect and 100 ns after it
+    Test if:
+      - the first collect attributes the CPU time used by the open label before the collect
+      - the second collect only attributes the CPU time used by the label after the first collect
+    """
+    clock = [0]
+    monkeypatch.setattr(time, 'clock_gettime_ns', lambda clock_id: clock[0])
+    attribution = ThreadAttribution(sensor=FakeSensor([0], increment=1000))
+
+    with attribution.label('job'):
+        clock[0] += 200
+        set_cpu_time(101, 3200)
+        _, label_results = attribution.collect()
+        assert {result.label: result.pkg for result in label_results} == {'job': [1000]}
+
+        clock[0] += 100
+        set_cpu_time(101, 3400)
+    _, label_results = attribution.collect()
+    assert {result.label: result.pkg for result in label_results} == {'job': [500], None: [500]}
+
+
+def test_new_thread_counted_from_creation(fake_tasks):
+    attribution = ThreadAttribution(sensor=FakeSensor([0], increment=1000))
+    fake_tasks.create_file(TASK_DIR_NAME + '103/schedstat', contents='100 0 0\n')
+    set_cpu_time(100, 1100)
+
+    thread_results, _ = attribution.collect()
+    assert {result.label: result.pkg for result in thread_results} == {'100': [500], '103': [500]}
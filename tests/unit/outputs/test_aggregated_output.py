@@ -0,0 +1,164 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import gc
+import time
+import weakref
+
+from pyRAPL import Device, Result
+from pyRAPL.outputs import AggregatedOutput, BufferedOutput
+from tests.utils import ListOutput
+
+
+class SummaryOutput(ListOutput):
+    def add_summary(self, summary):
+        self.results.append(summary)
+
+
+class ListBufferedOutput(BufferedOutput):
+    def __init__(self):
+        BufferedOutput.__init__(self)
+        self.saved = []
+
+    def _output_buffer(self):
+        self.saved += self._buffer
+
+
+RESULTS = [
+    Result('foo', 1, 10, [100, 1000], [5, -1]),
+    Result('foo', 2, 30, [300, 3000], [15, -1]),
+    Result('bar', 3, 1, [1, 1]),
+]
+
+
+def aggregate(output):
+    aggregated = AggregatedOutput(output, energy_buckets=[10, 100, 1000], duration_buckets=[10, 100])
+    for result in RESULTS:
+        aggregated.add(result)
+    return aggregated
+
+
+###############
+# AGGREGATION #
+###############
+def test_summary_by_label():
+    """
+    Aggregate two results labeled foo and one result labeled bar
+
+    Test if:
+      - one summary is exported for each label
+      - the summaries contain the count, sum, min, max, mean, variance and histogram of each device on each socket
+    """
+    output = SummaryOutput()
+    aggregate(output).close()
+
+    foo, bar = output.results
+    assert (foo.label, foo.timestamp, foo.count, bar.label, bar.count) == ('foo', 1, 2, 'bar', 1)
+    assert foo.duration.sums == [40]
+    assert foo.duration.histograms == [[1, 1, 0]]
+    pkg = foo.energy(Device.PKG)
+    assert pkg.counts == [2, 2]
+    assert pkg.sums == [400, 4000]
+    assert pkg.mins == [100, 1000]
+    assert pkg.maxs == [300, 3000]
+    assert pkg.means == [200, 2000]
+    assert pkg.variances == [20000, 2000000]
+    assert pkg.histograms == [[0, 1, 1, 0], [0, 0, 1, 1]]
+    assert foo.dram.counts == [2, 0]
+    assert foo.dram.mins == [5, -1]
+    assert bar.dram is None
+
+
+def test_summary_result():
+    """
+    Test if an output without add_summary method receives the number of measures, the total duration and the total
+    energy consumption of each label
+    """
+    output = ListOutput()
+    aggregate(output).close()
+    assert output.results == [Result('foo', 1, 40, [400, 4000], [20, -1], count=2),
+                              Result('bar', 3, 1, [1, 1], count=1)]
+
+
+def test_flush_resets_aggregation():
+    output = SummaryOutput()
+    aggregated = aggregate(output)
+    assert aggregated.summaries()['foo'].count == 2
+    aggregated.flush()
+    assert aggregated.summaries() == {}
+    aggregated.close()
+    assert len(output.results) == 2
+
+
+def test_periodic_flush():
+    """
+    Test if the summaries are exported by the timer
+    """
+    output = SummaryOutput()
+    aggregated = AggregatedOutput(output, interval=0.01)
+    aggregated.add(RESULTS[0])
+    deadline = time.monotonic() + 5
+    while not output.results and time.monotonic() < deadline:
+        time.sleep(0.01)
+    aggregated.close()
+    assert [summary.label for summary in output.results] == ['foo']
+
+
+def test_unclosed_output_garbage_collected():
+    """
+    Test if an output that isn't closed (with a flush thread) is garbage collected once it isn't referenced anymore
+    """
+    aggregated = AggregatedOutput(SummaryOutput(), interval=60)
+    thread = aggregated._thread
+    aggregated_ref = weakref.ref(aggregated)
+    del aggregated
+    gc.collect()
+    assert aggregated_ref() is None
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+###################
+# BUFFERED OUTPUT #
+###################
+def test_buffered_output_summary():
+    """
+    Test if a BufferedOutput receives one line per socket with the distribution columns, and is saved after the flush
+    """
+    output = ListBufferedOutput()
+    aggregate(output).close()
+
+    sockets = [(line['label'], line['socket']) for line in output.saved]
+    assert sockets == [('foo', 0), ('foo', 1), ('bar', 0), ('bar', 1)]
+    line = output.saved[1]
+    assert (line['count'], line['duration'], line['pkg'], line['pkg_min'], line['pkg_max']) == (2, 40, 4000, 1000, 3000)
+    assert line['pkg_histogram'] == [0, 0, 1, 1]
+    assert line['pkg_buckets'] == [10, 100, 1000]
+    assert line['dram'] is None
+    assert output.saved[0]['dram_mean'] == 10
+    assert output.buffer == []
+
+
+def test_buffered_output_summary_result():
+    """
+    Test if the count column is added by a BufferedOutput receiving the total of several measures
+    """
+    output = ListBufferedOutput()
+    output.add(Result('foo', 1, 40, [400, 4000], count=2))
+    assert [line['count'] for line in output.buffer] == [2, 2]
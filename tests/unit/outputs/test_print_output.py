@@ -45,3 +45,24 @@ DRAM :
     output = PrintOutput()
     print(output._format_output(result))
     assert output._format_output(result) == correct_value
+
+
+def test_non_raw_output_core_domain():
+    """
+    run PrintOutput._format_output to print non raw result containing only package and core energy consumption
+
+    Test if:
+      the returned string contains a CORE section
+    """
+    result = Result('toto', 0, 0.23456, [0.34567], core=[0.45678])
+    correct_value = f"""Label : toto
+Begin : {time.ctime(result.timestamp)}
+Duration :     0.2346 us
+-------------------------------
+PKG :
+\tsocket 0 :     0.3457 uJ
+-------------------------------
+CORE :
+\tsocket 0 :     0.4568 uJ
+-------------------------------"""
+    assert PrintOutput()._format_output(result) == correct_value
@@ -0,0 +1,171 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import asyncio
+
+import pytest
+
+import pyRAPL
+from pyRAPL import MarkerRecorder
+from pyRAPL.aio import AsyncMeasurement, AsyncSampler, ExportWriter, measureit, get_writer
+from pyRAPL.outputs import Output
+from tests.utils import FakeSensor, ListOutput
+
+
+@pytest.fixture
+def fake_sensor(monkeypatch):
+    sensor = FakeSensor([0], increment=100)
+    monkeypatch.setattr(pyRAPL, '_sensor', sensor)
+    return sensor
+
+
+###############
+# MEASUREMENT #
+###############
+def test_async_measurement(fake_sensor):
+    """
+    measure a block with async with
+    Test if:
+      - the sensor is read in the read thread
+      - the result is exported to the output in the writer thread
+    """
+    output = ListOutput()
+
+    async def main():
+        async with AsyncMeasurement('block', output=output) as measure:
+            await asyncio.sleep(0)
+        await get_writer().flush()
+        return measure
+
+    measure = asyncio.run(main())
+    assert measure.result.pkg == [100]
+    assert [result.label for result in output.results] == ['block']
+    assert all(name.startswith('pyRAPL-read') for name in fake_sensor.read_threads)
+    assert output.threads[0].startswith('pyRAPL-writer')
+
+
+def test_async_measurement_without_offload(fake_sensor):
+    async def main():
+        measure = AsyncMeasurement('block', offload=False)
+        await measure.abegin()
+        await measure.aend()
+        return measure
+
+    assert asyncio.run(main()).result.pkg == [100]
+    assert fake_sensor.read_threads == ['MainThread', 'MainThread']
+
+
+def test_async_measureit(fake_sensor):
+    """
+    decorate a coroutine function with the async measureit, with 2 runs
+    Test if:
+      - the coroutine result is returned
+      - the exported energy is the mean energy of a run
+    """
+    output = ListOutput()
+
+    @measureit(output=output, number=2)
+    async def foo():
+        await asyncio.sleep(0)
+        return 42
+
+    async def main():
+        value = await foo()
+        await get_writer().flush()
+        return value
+
+    assert asyncio.run(main()) == 42
+    assert output.results[0].label == 'foo'
+    assert output.results[0].pkg == [50]
+
+
+def test_async_measureit_marker_mode(fake_sensor):
+    recorder = MarkerRecorder()
+
+    @measureit(markers=recorder)
+    async def foo():
+        return 42
+
+    assert asyncio.run(foo()) == 42
+    assert fake_sensor.read_threads == []
+    assert [marker[0] for marker in recorder.drain()] == ['foo']
+
+
+##########
+# WRITER #
+##########
+def test_writer_keeps_order_and_survives_output_errors():
+    """
+    Test if:
+      - results are exported in the order of submission
+      - an output error doesn't stop the writer
+    """
+    class BrokenOutput(Output):
+        def add(self, result):
+            raise IOError('disk full')
+    output = ListOutput()
+
+    async def main():
+        writer = ExportWriter()
+        writer.submit(output, 1)
+        writer.submit(BrokenOutput(), 2)
+        writer.submit(output, 3)
+        await writer.close()
+
+    asyncio.run(main())
+    assert output.results == [1, 3]
+
+
+###########
+# SAMPLER #
+###########
+def test_async_sampler(fake_sensor):
+    """
+    sample the sensor at 100 Hz during 50 ms with an asyncio task
+    Test if:
+      - samples are recorded while other tasks are running on the loop
+      - the sampling task is stopped
+    """
+    async def main():
+        async with AsyncSampler(frequency=100) as sampler:
+            await asyncio.sleep(0.05)
+        return sampler
+
+    sampler = asyncio.run(main())
+    assert not sampler.running
+    assert len(sampler.buffer) + sampler.missed_samples >= 3
+    assert list(sampler.buffer.values())[:2] == [0, 100]
+
+
+def test_async_sampler_first_read_in_read_thread(fake_sensor):
+    """
+    Test if:
+      - the constructor doesn't read the sensor
+      - the first read of the sensor is done in the read thread
+    """
+    async def main():
+        sampler = AsyncSampler(frequency=100)
+        assert fake_sensor.read_threads == []
+        async with sampler:
+            await asyncio.sleep(0.02)
+        return sampler
+
+    sampler = asyncio.run(main())
+    assert fake_sensor.read_threads[0].startswith('pyRAPL-read')
+    assert sampler.buffer.width == 1
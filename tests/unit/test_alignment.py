@@ -0,0 +1,150 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import time
+
+import pytest
+
+from pyRAPL import Device, Measurement
+from pyRAPL.alignment import scale_energy, wait_update
+from pyRAPL.sensor import SubstractableList
+
+
+class TickingSensor:
+    """
+    Sensor of one device on two sockets (socket 1 unmonitored) whose counter is updated every ``interval`` nano seconds
+    with a power of 1W (1 micro Joule per micro second). If interval is None, the counter is never updated
+    """
+
+    def __init__(self, interval=1000000):
+        self.interval = interval
+
+    def energy(self):
+        if self.interval is None:
+            return SubstractableList([0, -1])
+        return SubstractableList([time.perf_counter_ns() // self.interval * self.interval / 1000, -1])
+
+    def per_device(self, values):
+        return {Device.PKG: values}
+
+
+class PhasedSensor:
+    """
+    Sensor of two devices on one socket whose counters are updated every millisecond with a power of 1W, the dram
+    counter being updated half a millisecond after the package counter
+    """
+
+    def energy(self):
+        now = time.perf_counter_ns()
+        return SubstractableList([now // 1000000 * 1000, (now - 500000) // 1000000 * 1000 + 500])
+
+    def per_device(self, values):
+        return {Device.PKG: values[0::2], Device.DRAM: values[1::2]}
+
+
+###############
+# WAIT UPDATE #
+###############
+def test_wait_update():
+    """
+    Test if wait_update returns the values read just after an update and the time of this update
+    """
+    sensor = TickingSensor()
+    energy, updates, spin, updated = wait_update(sensor)
+    assert updated
+    assert spin <= 2000000
+    assert abs(updates[0] - energy[0] * 1000) <= 200000
+    assert energy[1] == -1
+
+
+def test_wait_update_each_counter():
+    """
+    Test if wait_update waits for the update of each counter and returns the value and the update time of each counter
+    """
+    energy, updates, spin, updated = wait_update(PhasedSensor())
+    assert updated
+    assert abs(updates[0] - energy[0] * 1000) <= 200000
+    assert abs(updates[1] - energy[1] * 1000) <= 200000
+    assert abs(abs(updates[1] - updates[0]) - 500000) <= 200000
+
+
+def test_wait_update_bounded():
+    """
+    Test if wait_update stops after max_spin micro seconds when the counters aren't updated
+    """
+    energy, updates, spin, updated = wait_update(TickingSensor(None), max_spin=500)
+    assert not updated
+    assert 500000 <= spin < 50000000
+    assert energy == [0, -1]
+    assert updates[0] == updates[1] > 0
+
+
+def test_scale_energy():
+    assert scale_energy([3000, -1], 2500, [3000, 3000]) == [2500, -1]
+    assert scale_energy([3000, -1], 4000, [3000, 3000]) == [3000, -1]
+    assert scale_energy([3000, -1], 10, [0, 0]) == [3000, -1]
+    assert scale_energy([3000, 2000], 1000, [3000, 2000]) == [1000, 1000]
+
+
+###############
+# MEASUREMENT #
+###############
+def test_precise_measurement():
+    """
+    Measure a 2.5ms sleep with a counter updated every millisecond
+
+    Test if:
+      - the measurement is aligned on the counter updates
+      - the energy consumption is scaled to the measurement duration (1W during the measurement)
+      - the busy-wait time is reported
+    """
+    measure = Measurement('foo', sensor=TickingSensor(), precise=True)
+    measure.begin()
+    time.sleep(0.0025)
+    measure.end()
+
+    assert measure.aligned
+    assert 0 < measure.spin_time < 4000
+    assert measure.result.duration >= 2500
+    assert measure.result.pkg[0] == pytest.approx(measure.result.duration, rel=0.05)
+    assert measure.result.pkg[1] == -1
+
+
+def test_precise_measurement_each_counter():
+    """
+    Measure a 2.5ms sleep with two counters updated every millisecond, half a millisecond apart
+    Test if the energy consumption of each counter is scaled with its own update times (1W during the measurement)
+    """
+    measure = Measurement('foo', sensor=PhasedSensor(), precise=True)
+    measure.begin()
+    time.sleep(0.0025)
+    measure.end()
+
+    assert measure.aligned
+    assert measure.result.pkg[0] == pytest.approx(measure.result.duration, rel=0.05)
+    assert measure.result.dram[0] == pytest.approx(measure.result.duration, rel=0.05)
+
+
+def test_precise_measurement_without_update():
+    measure = Measurement('foo', sensor=TickingSensor(None), precise=True, max_spin=200)
+    measure.begin()
+    measure.end()
+    assert not measure.aligned
+    assert measure.spin_time >= 400
+    assert measure.result.pkg == [0, -1]
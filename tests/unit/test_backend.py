@@ -0,0 +1,192 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import pytest
+
+import pyRAPL.backend
+from pyRAPL import Device, PyRAPLCantInitDeviceAPI, Sensor, Topology, DramAPI
+from pyRAPL.backend import Backend, BackendRegistry, REGISTRY
+from tests.utils import fs_one_socket, PKG_0_VALUE, DRAM_0_VALUE
+
+
+class BrokenAPI:
+    """
+    DeviceAPI that can't be initialised
+    """
+    def __init__(self, socket_ids=None, topology=None):
+        raise PyRAPLCantInitDeviceAPI()
+
+
+class UnreadableAPI:
+    """
+    DeviceAPI that can be initialised but not read
+    """
+    def __init__(self, socket_ids=None, topology=None):
+        pass
+
+    def energy(self):
+        raise OSError(13, 'Permission denied')
+
+
+class FakeAPI:
+    """
+    DeviceAPI returning a constant value on socket 0
+    """
+    def __init__(self, socket_ids=None, topology=None):
+        self._socket_ids = [0]
+
+    def energy(self):
+        return (42,)
+
+    def max_energy_range(self):
+        return (-1,)
+
+
+class FakeEntryPoint:
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def load(self):
+        return self.value
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(pyRAPL.backend, '_load_entry_points', lambda: [])
+    monkeypatch.delenv('PYRAPL_BACKEND', raising=False)
+    return BackendRegistry()
+
+
+############
+# REGISTRY #
+############
+def test_backends_sorted_by_read_cost(registry):
+    registry.register(Backend('slow', {Device.PKG: FakeAPI}, read_cost=10))
+    registry.register(Backend('fast', {Device.PKG: FakeAPI, Device.DRAM: FakeAPI}, read_cost=1))
+    registry.register(Backend('dram', {Device.DRAM: FakeAPI}, read_cost=0))
+
+    assert [backend.name for backend in registry.backends()] == ['dram', 'fast', 'slow']
+    assert [backend.name for backend in registry.backends(Device.PKG)] == ['fast', 'slow']
+
+
+def test_unknown_backend(registry):
+    with pytest.raises(ValueError):
+        registry.backend('unknown')
+    with pytest.raises(ValueError):
+        registry.probe(Device.PKG, backend='unknown')
+
+
+def test_builtin_backends():
+    """
+    Test if the built in backends are registered from the cheapest to the most expensive one
+    """
+    assert [backend.name for backend in REGISTRY.backends(Device.DRAM)] == ['shm', 'perf', 'msr', 'powercap']
+    assert REGISTRY.backend('powercap').devices == list(Device)
+
+
+def test_entry_points_loaded_once(monkeypatch):
+    """
+    Test if:
+      - backends referenced by entry points are registered on the first lookup
+      - entry points are only loaded once
+      - an entry point that doesn't reference a Backend raise a TypeError
+    """
+    loads = []
+
+    def load_entry_points():
+        loads.append(None)
+        return [FakeEntryPoint('third-party', Backend('third-party', {Device.PKG: FakeAPI}, read_cost=5))]
+    monkeypatch.setattr(pyRAPL.backend, '_load_entry_points', load_entry_points)
+    registry = BackendRegistry()
+
+    assert registry.backend('third-party').read_cost == 5
+    assert [backend.name for backend in registry.backends()] == ['third-party']
+    assert len(loads) == 1
+
+    monkeypatch.setattr(pyRAPL.backend, '_load_entry_points', lambda: [FakeEntryPoint('bad', object())])
+    with pytest.raises(TypeError):
+        BackendRegistry().backends()
+
+
+#########
+# PROBE #
+#########
+def test_probe_cheapest_working_backend(registry):
+    """
+    Test if:
+      - backends that can't be initialised or read are skipped
+      - the cheapest working backend is chosen and its read latency is measured
+    """
+    registry.register(Backend('broken', {Device.PKG: BrokenAPI}, read_cost=1))
+    registry.register(Backend('unreadable', {Device.PKG: UnreadableAPI}, read_cost=2))
+    registry.register(Backend('working', {Device.PKG: FakeAPI}, read_cost=3))
+    registry.register(Backend('expensive', {Device.PKG: FakeAPI}, read_cost=4))
+
+    selection = registry.probe(Device.PKG)
+    assert selection.backend == 'working'
+    assert selection.device == Device.PKG
+    assert isinstance(selection.device_api, FakeAPI)
+    assert selection.read_latency >= 0
+
+
+def test_probe_given_backend(registry):
+    registry.register(Backend('working', {Device.PKG: FakeAPI}, read_cost=3))
+    registry.register(Backend('expensive', {Device.PKG: FakeAPI, Device.DRAM: FakeAPI}, read_cost=4))
+
+    assert registry.probe(Device.PKG, backend='expensive').backend == 'expensive'
+    with pytest.raises(PyRAPLCantInitDeviceAPI):
+        registry.probe(Device.DRAM, backend='working')
+
+
+def test_probe_environment_backend(registry, monkeypatch):
+    """
+    Test if:
+      - the backend given by the PYRAPL_BACKEND environment variable is used when no backend is given
+      - a given backend is used instead of the environment variable one
+    """
+    registry.register(Backend('working', {Device.PKG: FakeAPI}, read_cost=3))
+    registry.register(Backend('expensive', {Device.PKG: FakeAPI}, read_cost=4))
+    monkeypatch.setenv('PYRAPL_BACKEND', 'expensive')
+
+    assert registry.probe(Device.PKG).backend == 'expensive'
+    assert registry.probe(Device.PKG, backend='working').backend == 'working'
+
+
+def test_probe_without_working_backend(registry):
+    registry.register(Backend('broken', {Device.PKG: BrokenAPI}, read_cost=1))
+    with pytest.raises(PyRAPLCantInitDeviceAPI):
+        registry.probe(Device.PKG)
+
+
+##########
+# SENSOR #
+##########
+def test_sensor_report_chosen_backends(fs_one_socket):
+    """
+    create a sensor on a machine with powercap files only
+    Test if:
+      - the powercap backend is chosen for the pkg and dram devices
+      - the sensor reads the powercap files
+    """
+    sensor = Sensor(devices=[Device.PKG, Device.DRAM], topology=Topology.discover())
+    backends = {device: selection.backend for device, selection in sensor.backends.items()}
+    assert backends == {Device.PKG: 'powercap', Device.DRAM: 'powercap'}
+    assert isinstance(sensor.backends[Device.DRAM].device_api, DramAPI)
+    assert sensor.energy() == [PKG_0_VALUE, DRAM_0_VALUE]
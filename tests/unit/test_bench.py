@@ -0,0 +1,228 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import statistics
+
+import pytest
+
+import pyRAPL.bench
+from pyRAPL import Device, Result
+from pyRAPL.bench import Benchmark, BenchmarkResult, analyze, bench, describe, load, outliers, save, t_quantile
+from pyRAPL.bench import bootstrap_difference, compare, mann_whitney, wilcoxon
+from tests.utils import FakeSensor
+
+requires_numpy = pytest.mark.skipif(pyRAPL.bench.numpy is None, reason='numpy is not installed')
+
+
+VALUES = [[10, 1, -1], [12, 2, -1], [11, 4, -1], [15, 3, -1]]
+
+
+##############
+# STATISTICS #
+##############
+def check_describe(stats):
+    first = [row[0] for row in VALUES]
+    assert stats.mean[0] == pytest.approx(statistics.mean(first))
+    assert stats.median[0] == pytest.approx(statistics.median(first))
+    assert stats.stddev[0] == pytest.approx(statistics.stdev(first))
+    half_width = t_quantile(3) * statistics.stdev(first) / 2
+    assert stats.ci_low[0] == pytest.approx(statistics.mean(first) - half_width)
+    assert stats.ci_high[0] == pytest.approx(statistics.mean(first) + half_width)
+    assert stats.mean[1] == pytest.approx(2.5)
+    assert (stats.mean[2], stats.median[2], stats.stddev[2], stats.ci_low[2], stats.ci_high[2]) == (-1, -1, -1, -1, -1)
+
+
+@requires_numpy
+def test_describe_numpy():
+    check_describe(describe(VALUES))
+
+
+def test_describe_without_numpy(monkeypatch):
+    monkeypatch.setattr(pyRAPL.bench, 'numpy', None)
+    check_describe(describe(VALUES))
+
+
+def test_describe_one_run():
+    stats = describe([[10]])
+    assert (stats.mean, stats.stddev, stats.ci_low, stats.ci_high) == ([10], [0], [10], [10])
+
+
+def test_t_quantile():
+    assert t_quantile(1) == 12.706
+    assert t_quantile(30) == 2.042
+    assert t_quantile(1000) == 1.96
+
+
+def test_outliers():
+    assert outliers([10, 11, 9, 10, 12, 100]) == [5]
+    assert outliers([10, 10, 10, 10]) == []
+    assert outliers([1, 100]) == []
+
+
+def test_analyze_rejects_outliers():
+    """
+    Test if the runs whose energy consumption or duration is an outlier are rejected from the statistics
+    """
+    runs = [Result('foo', 0, 9 + i % 3, [99 + i % 3, -1]) for i in range(9)] + [Result('foo', 0, 10, [10000, -1]),
+                                                                                Result('foo', 0, 1000, [100, -1])]
+    result = analyze('foo', 1, runs)
+    assert result.rejected == [9, 10]
+    assert len(result.kept_runs) == 9
+    assert result.energy[Device.PKG].mean == [pytest.approx(100), -1]
+    assert result.duration.mean == [pytest.approx(10)]
+    assert analyze('foo', 1, runs, threshold=None).rejected == []
+
+
+#############
+# BENCHMARK #
+#############
+def test_bench():
+    """
+    Benchmark a function consuming 100uJ per call, with 2 warmup runs, 5 measured runs and 3 calls per run
+
+    Test if:
+      - the function is called (2 + 5) * 3 times
+      - each run result gives the energy consumption of one call
+      - the statistics are computed on the runs
+    """
+    sensor = FakeSensor([0, -1])
+    calls = []
+
+    def foo():
+        calls.append(1)
+        sensor.counters[0] += 100
+
+    result = bench(foo, warmup=2, repeat=5, number=3, sensor=sensor)
+    assert len(calls) == 21
+    assert (result.name, result.number, len(result.runs)) == ('foo', 3, 5)
+    assert all(run.pkg[0] == 100 for run in result.runs)
+    assert result.energy[Device.PKG].mean == [100, -1]
+    assert result.energy[Device.PKG].stddev == [0, -1]
+    assert result.duration.mean[0] >= 0
+
+
+def test_bad_parameters():
+    with pytest.raises(ValueError):
+        Benchmark(lambda: None, repeat=0)
+
+
+########
+# JSON #
+########
+def test_save_load(tmp_path):
+    """
+    Test if benchmark results are identical after being stored and loaded
+    """
+    runs = [Result('foo', 1, 10, [100, -1], error={Device.PKG: [1, -1]}), Result('foo', 2, 12, [110, -1])]
+    result = analyze('foo', 1, runs)
+    filename = str(tmp_path / 'bench.json')
+    save([result], filename)
+    assert load(filename) == [result]
+    assert isinstance(load(filename)[0], BenchmarkResult)
+
+
+###########
+# COMPARE #
+###########
+def test_mann_whitney():
+    """
+    Test if the p-value matches the asymptotic Mann-Whitney U test with continuity correction
+    """
+    assert mann_whitney([1, 2, 3], [4, 5, 6]) == pytest.approx(0.0809, abs=1e-4)
+    assert mann_whitney([1, 2, 3, 4], [1, 2, 3, 4]) == 1
+    assert mann_whitney([5, 5, 5], [5, 5, 5]) == 1
+
+
+def test_wilcoxon():
+    """
+    Test if:
+      - the p-value matches the asymptotic Wilcoxon signed-rank test with continuity correction
+      - a small difference between paired runs is detected while the Mann-Whitney U test doesn't detect it
+      - pairs without difference are discarded
+    """
+    a = [10, 20, 30, 40, 50, 60, 70, 80]
+    b = [11, 22, 33, 44, 55, 66, 77, 88]
+    assert wilcoxon(a, b) == pytest.approx(0.0143, abs=1e-4)
+    assert mann_whitney(a, b) > 0.5
+    assert wilcoxon([10, 20, 30, 40], [12, 20, 28, 40]) == 1
+    assert wilcoxon(a, a) == 1
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_bootstrap_difference(use_numpy, monkeypatch):
+    if not use_numpy:
+        monkeypatch.setattr(pyRAPL.bench, 'numpy', None)
+    elif pyRAPL.bench.numpy is None:
+        pytest.skip('numpy is not installed')
+
+    assert bootstrap_difference([1, 2, 3], [11, 12, 13], resamples=100, seed=0) == (10, 10, 10)
+    difference, low, high = bootstrap_difference([1, 2, 3, 4, 5], [2, 4, 3, 6, 5], paired=False, resamples=1000,
+                                                 seed=0)
+    assert difference == 1
+    assert low < 1 < high
+
+
+def make_candidates(sensor, runs):
+    def make(name, energy):
+        def candidate():
+            runs.append(name)
+            # the energy of the calls drifts over time
+            sensor.counters[0] += energy + len(runs) % 7
+        return candidate
+    return {'a': make('a', 100), 'b': make('b', 200), 'c': make('c', 100)}
+
+
+def test_compare_interleaved():
+    """
+    Compare three candidates consuming 100, 200 and 100 uJ per call (plus a drift)
+
+    Test if:
+      - the order of the candidates is rotated at each round
+      - the energy consumption difference between a and b is significant, the one between a and c is not
+    """
+    sensor = FakeSensor([0, -1])
+    runs = []
+    comparison = compare(make_candidates(sensor, runs), repeat=12, warmup=1, sensor=sensor, resamples=1000, seed=0)
+
+    assert runs[:3] == ['a', 'b', 'c']
+    assert comparison.order[:9] == ['a', 'b', 'c', 'b', 'c', 'a', 'c', 'a', 'b']
+    assert set(comparison.results) == {'a', 'b', 'c'}
+    assert len(comparison.results['a'].runs) == 12
+
+    tests = {(test.candidate, test.metric): test for test in comparison.tests}
+    assert set(tests) == {('b', 'duration'), ('b', 'PKG'), ('c', 'duration'), ('c', 'PKG')}
+    assert tests[('b', 'PKG')].significant
+    assert tests[('b', 'PKG')].relative_difference == pytest.approx(1, rel=0.1)
+    assert tests[('b', 'PKG')].p_value < 0.05
+    assert tests[('b', 'PKG')].paired_p_value < 0.05
+    assert not tests[('c', 'PKG')].significant
+
+
+def test_compare_random():
+    sensor = FakeSensor([0, -1])
+    comparison = compare(make_candidates(sensor, []), repeat=5, order='random', sensor=sensor, resamples=100, seed=1)
+    for i in range(5):
+        assert sorted(comparison.order[3 * i:3 * i + 3]) == ['a', 'b', 'c']
+
+
+def test_compare_bad_parameters():
+    with pytest.raises(ValueError):
+        compare({'a': lambda: None})
+    with pytest.raises(ValueError):
+        compare({'a': lambda: None, 'b': lambda: None}, order='sequential')
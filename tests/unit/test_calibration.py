@@ -0,0 +1,144 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import functools
+import itertools
+import time
+
+import pytest
+
+import pyRAPL.measurement
+from pyRAPL import Device, Result, measureit
+from pyRAPL.calibration import Calibration, autorange, calibrate, correct, quantization_error, _numbers
+from tests.utils import FakeSensor, ListOutput
+
+
+CALIBRATION = Calibration(2, {Device.PKG: [10, -1]}, {Device.PKG: [1, -1]},
+                          0.5, {Device.PKG: [1, -1]}, {Device.PKG: [0.1, -1]})
+
+
+#############
+# AUTORANGE #
+#############
+def test_numbers():
+    assert list(itertools.islice(_numbers(), 7)) == [1, 2, 5, 10, 20, 50, 100]
+
+
+def test_autorange_min_duration():
+    """
+    Test if the number of runs is the first number of the sequence giving a measure longer than min_duration
+    """
+    def foo():
+        time.sleep(0.001)
+
+    number, result = autorange(foo, sensor=FakeSensor([0, -1], power=1.0), min_duration=0.01, min_energy=0)
+    assert result.label == 'foo'
+    assert result.duration >= 10000
+    assert number > 1
+    assert result.pkg[0] > 0
+    assert result.pkg[1] == -1
+
+
+def test_autorange_min_energy():
+    """
+    Test if the runs are repeated until max_duration when the energy consumption stays under min_energy
+    """
+    number, result = autorange(lambda: None, 'empty', FakeSensor([0, -1]), min_duration=0, min_energy=1,
+                               max_duration=0.01)
+    assert result.duration >= 10000
+    assert result.pkg == [0, -1]
+
+
+###############
+# CALIBRATION #
+###############
+def test_calibrate():
+    sensor = FakeSensor([0, -1], power=1.0)
+    calibration = calibrate(sensor, min_duration=0.005, min_energy=0)
+    assert calibration.read_duration > 0
+    assert calibration.read_energy[Device.PKG][0] > 0
+    assert calibration.read_energy[Device.PKG][1] == -1
+    assert calibration.call_duration < calibration.read_duration
+    assert sensor.reads > 4
+
+
+def test_quantization_error():
+    """
+    Test if the quantization error is two update intervals and two energy units : a measure of 10ms consuming
+    10000uJ can miss 1000uJ at each read
+    """
+    result = Result('foo', 0, 10000, [10000, -1])
+    assert quantization_error(result) == {Device.PKG: [pytest.approx(2 * (1000 + 61.04)), -1]}
+
+
+def test_correct():
+    """
+    Test if the overhead of the reads and of the loop iterations is subtracted before dividing by the number of runs
+    """
+    result = Result('foo', 0, 10000, [10000, -1])
+    corrected = correct(result, 10, CALIBRATION)
+    assert corrected.duration == pytest.approx((10000 - 2 - 10 * 0.5) / 10)
+    assert corrected.pkg == [pytest.approx((10000 - 10 - 10 * 1) / 10), -1]
+    assert corrected.error[Device.PKG] == [pytest.approx((2 * (1000 + 61.04) + 1 + 10 * 0.1) / 10), -1]
+
+
+def test_correct_never_negative():
+    corrected = correct(Result('foo', 0, 1, [5, -1]), 1, CALIBRATION)
+    assert corrected.pkg == [0, -1]
+    assert corrected.duration == 0
+
+
+#############
+# MEASUREIT #
+#############
+def test_measureit_autorange(monkeypatch):
+    """
+    Test if:
+      - the number of runs is chosen on the first call and reused on the next calls
+      - the next calls are measured like the calibration and the first call (measure_runs)
+      - the exported results are corrected and have an uncertainty
+    """
+    monkeypatch.setattr(pyRAPL.measurement, 'get_calibration', lambda sensor: CALIBRATION)
+    monkeypatch.setattr(pyRAPL.measurement, 'autorange_runs',
+                        functools.partial(pyRAPL.measurement.autorange_runs, min_duration=0.005, min_energy=0))
+    measured_numbers = []
+
+    def measure_runs(func, number, label, sensor):
+        measured_numbers.append(number)
+        return pyRAPL.calibration.measure_runs(func, number, label, sensor)
+    monkeypatch.setattr(pyRAPL.measurement, 'measure_runs', measure_runs)
+    output = ListOutput()
+    runs = []
+
+    @measureit(autorange=True, output=output, sensor=FakeSensor([0, -1], power=1.0))
+    def foo():
+        runs.append(1)
+        time.sleep(0.0005)
+        return 42
+
+    assert foo() == 42
+    first_call_runs = len(runs)
+    runs.clear()
+    foo()
+    assert len(runs) > 1
+    assert first_call_runs >= len(runs)
+    assert measured_numbers == [len(runs)]
+    assert [result.label for result in output.results] == ['foo', 'foo']
+    assert all(result.error[Device.PKG][0] > 0 for result in output.results)
+    assert all(result.pkg[0] > 0 for result in output.results)
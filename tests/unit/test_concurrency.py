@@ -0,0 +1,117 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import threading
+
+import pytest
+
+from pyRAPL import Device, Sensor, Topology
+
+THREAD_NUMBER = 16
+PROCESS_NUMBER = 4
+READ_NUMBER = 2000
+
+# values of different lengths, a shared file offset gives partial or empty reads
+PKG_VALUES = [123456789012, 42]
+DRAM_VALUES = [7, 98765]
+
+
+@pytest.fixture
+def sysfs_files(tmp_path):
+    """
+    create real package and dram energy files for two sockets and the corresponding topology
+    """
+    zones = {}
+    for socket_id in (0, 1):
+        package_directory = tmp_path / ('intel-rapl:' + str(socket_id))
+        dram_directory = package_directory / ('intel-rapl:' + str(socket_id) + ':0')
+        dram_directory.mkdir(parents=True)
+        (package_directory / 'energy_uj').write_text(str(PKG_VALUES[socket_id]) + '\n')
+        (dram_directory / 'energy_uj').write_text(str(DRAM_VALUES[socket_id]) + '\n')
+        zones[socket_id] = {'package': str(package_directory), 'dram': str(dram_directory)}
+    return Topology(cpus={0: 0, 1: 1}, zones=zones)
+
+
+EXPECTED = [PKG_VALUES[0], DRAM_VALUES[0], PKG_VALUES[1], DRAM_VALUES[1]]
+
+
+def read_many(sensor, errors):
+    for _ in range(READ_NUMBER):
+        values = sensor.energy()
+        if values != EXPECTED:
+            errors.append(values)
+            return
+
+
+def stress(sensor):
+    """
+    read the sensor from THREAD_NUMBER threads and PROCESS_NUMBER forked processes at the same time
+
+    :return: the wrong values read by the threads and the exit codes of the processes
+    """
+    sensor.energy()
+    pids = []
+    for _ in range(PROCESS_NUMBER):
+        pid = os.fork()
+        if pid == 0:
+            errors = []
+            read_many(sensor, errors)
+            os._exit(1 if errors else 0)
+        pids.append(pid)
+
+    errors = []
+    threads = [threading.Thread(target=read_many, args=(sensor, errors)) for _ in range(THREAD_NUMBER)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    exit_codes = [os.WEXITSTATUS(os.waitpid(pid, 0)[1]) for pid in pids]
+    return errors, exit_codes
+
+
+##########
+# STRESS #
+##########
+@pytest.mark.parametrize('raw', [False, True])
+def test_concurrent_reads(sysfs_files, raw):
+    """
+    read a sensor from many threads and forked processes
+    Test if:
+      - no thread reads partial or stale values
+      - no forked process reads partial or stale values
+    """
+    sensor = Sensor(devices=[Device.PKG, Device.DRAM], raw=raw, backend='powercap', topology=sysfs_files)
+    errors, exit_codes = stress(sensor)
+    assert errors == []
+    assert exit_codes == [0] * PROCESS_NUMBER
+
+
+def test_concurrent_reads_overflow_tracking(sysfs_files):
+    """
+    read a sensor tracking the counter overflows from many threads and forked processes
+    Test if:
+      - no thread reads partial or stale values
+      - no forked process reads partial or stale values
+    """
+    sensor = Sensor(devices=[Device.PKG, Device.DRAM], backend='powercap', overflow_tracking=True,
+                    topology=sysfs_files)
+    errors, exit_codes = stress(sensor)
+    assert errors == []
+    assert exit_codes == [0] * PROCESS_NUMBER
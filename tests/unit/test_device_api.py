@@ -20,11 +20,18 @@
 
 import pytest
 
+import pyRAPL.device_api
 from pyRAPL import PkgAPI, DramAPI, DeviceAPIFactory, Device, PyRAPLCantInitDeviceAPI, PyRAPLBadSocketIdException
-from pyRAPL.device_api import cpu_ids, get_socket_ids
+from pyRAPL import MsrAPI, MsrPkgAPI, MsrDramAPI, CoreAPI, UncoreAPI, PsysAPI, AmdEnergyAPI, AmdMsrAPI
+from pyRAPL.device_api import cpu_ids, get_socket_ids, RawEnergyReader
 from tests.utils import PKG_0_FILE_NAME, PKG_0_VALUE, PKG_1_FILE_NAME, PKG_1_VALUE
 from tests.utils import DRAM_0_FILE_NAME, DRAM_0_VALUE, DRAM_1_FILE_NAME, DRAM_1_VALUE
-from tests.utils import empty_fs, fs_one_socket, fs_two_socket, fs_one_socket_no_dram
+from tests.utils import empty_fs, fs_one_socket, fs_two_socket, fs_one_socket_no_dram, SOCKET_1_DIR_NAME
+from tests.utils import msr_two_socket, MSR_ENERGY_UNIT, MSR_PKG_0_VALUE, MSR_PKG_1_VALUE, MSR_DRAM_0_VALUE
+from tests.utils import MSR_DRAM_1_VALUE, write_cpuinfo
+from tests.utils import fs_one_socket_all_domains, CORE_0_VALUE, UNCORE_0_VALUE, PSYS_VALUE
+from tests.utils import fs_amd_energy, amd_msr_two_socket, AMD_HWMON_DIR_NAME, AMD_SOCKET_0_VALUE, AMD_SOCKET_1_VALUE
+from tests.utils import AMD_CORE_VALUES
 
 class DeviceParameters:
     def __init__(self, device_class, socket0_filename, socket0_value, socket1_filename, socket1_value):
@@ -380,3 +387,255 @@ def test_creating_pkg_device(fs_two_socket):
       - the returned instance is an instance of PkgAPI
     """
     assert isinstance(DeviceAPIFactory.create_device_api(Device.PKG, None), PkgAPI)
+
+
+##############
+# RAW READER #
+##############
+def test_raw_reader_read_into(tmp_path):
+    """
+    create a RawEnergyReader on two counter files and read them into a list
+    Test if:
+      - each counter value is written as a float at its slot
+      - the slots that are not given to the reader are not modified
+    """
+    pkg_file = tmp_path / 'pkg_energy_uj'
+    dram_file = tmp_path / 'dram_energy_uj'
+    pkg_file.write_text(str(PKG_0_VALUE) + '\n')
+    dram_file.write_text(str(DRAM_0_VALUE) + '\n')
+
+    reader = RawEnergyReader([str(pkg_file), str(dram_file)], [0, 3])
+    result = [-1, -1, -1, -1]
+    reader.read_into(result)
+    reader.close()
+
+    assert result == [PKG_0_VALUE, -1, -1, DRAM_0_VALUE]
+    assert isinstance(result[0], float)
+
+
+def test_raw_reader_counter_with_less_digits(tmp_path):
+    """
+    create a RawEnergyReader on a counter file, read it, then write a shorter value in the file (counter wraparound)
+    Test if:
+      - the second read returns the new value without digits of the first one
+    """
+    counter_file = tmp_path / 'energy_uj'
+    counter_file.write_text('123456789\n')
+
+    reader = RawEnergyReader([str(counter_file)], [0])
+    result = [-1]
+    reader.read_into(result)
+    assert result == [123456789]
+
+    counter_file.write_text('42\n')
+    reader.read_into(result)
+    reader.close()
+    assert result == [42]
+
+
+def test_raw_reader_failed_reopen(tmp_path):
+    """
+    create a RawEnergyReader on two counter files, remove the second file and reopen the reader
+    Test if:
+      - an OSError is raised
+      - the reader still reads the counters with its old file descriptors
+    """
+    pkg_file = tmp_path / 'pkg_energy_uj'
+    dram_file = tmp_path / 'dram_energy_uj'
+    pkg_file.write_text(str(PKG_0_VALUE) + '\n')
+    dram_file.write_text(str(DRAM_0_VALUE) + '\n')
+    reader = RawEnergyReader([str(pkg_file), str(dram_file)], [0, 1])
+    dram_file.unlink()
+
+    with pytest.raises(OSError):
+        reader._reopen()
+    result = [-1, -1]
+    reader.read_into(result)
+    reader.close()
+    assert result == [PKG_0_VALUE, DRAM_0_VALUE]
+
+
+#######
+# MSR #
+#######
+def test_msr_energy_two_socket(msr_two_socket):
+    """
+    create a MsrPkgAPI and a MsrDramAPI instance on a fake msr file tree containing registers for socket 0 and 1
+    Test if:
+      - the registers are read on the first cpu of each socket
+      - the energy is the register value multiplied by the energy unit (in micro Joules)
+      - the raw_energy method returns the register values
+    """
+    pkg_api = MsrPkgAPI()
+    dram_api = MsrDramAPI()
+
+    assert pkg_api._sys_file_names == [msr_two_socket.format(0), msr_two_socket.format(2)]
+    assert pkg_api.energy() == (MSR_PKG_0_VALUE * MSR_ENERGY_UNIT, MSR_PKG_1_VALUE * MSR_ENERGY_UNIT)
+    assert dram_api.energy() == (MSR_DRAM_0_VALUE * MSR_ENERGY_UNIT, MSR_DRAM_1_VALUE * MSR_ENERGY_UNIT)
+    assert pkg_api.raw_energy() == (MSR_PKG_0_VALUE, MSR_PKG_1_VALUE)
+
+
+def test_msr_dram_energy_unit_server_cpu(msr_two_socket, monkeypatch):
+    """
+    create a MsrPkgAPI and a MsrDramAPI instance on a fake msr file tree of a Skylake-SP server
+    Test if:
+      - the dram energy is the register value multiplied by 2^-16 J, whatever the power unit register says
+      - the package energy is the register value multiplied by the energy unit of the power unit register
+    """
+    write_cpuinfo(pyRAPL.device_api.CPUINFO_FILE_NAME, 'GenuineIntel', 6, 0x55)
+    dram_unit = 1000000 / 2 ** 16
+
+    assert MsrDramAPI().energy() == (MSR_DRAM_0_VALUE * dram_unit, MSR_DRAM_1_VALUE * dram_unit)
+    assert MsrDramAPI().max_energy_range() == (2 ** 32 * dram_unit, 2 ** 32 * dram_unit)
+    assert MsrPkgAPI().energy() == (MSR_PKG_0_VALUE * MSR_ENERGY_UNIT, MSR_PKG_1_VALUE * MSR_ENERGY_UNIT)
+
+
+def test_msr_energy_socket_1(msr_two_socket):
+    """
+    create a MsrPkgAPI instance to measure energy consumption of socket 1 on a fake msr file tree
+    Test if:
+      - the first value of the tuple is -1
+      - the second value of the tuple is the energy consumption of socket 1
+    """
+    assert MsrPkgAPI(socket_ids=[1]).energy() == (-1, MSR_PKG_1_VALUE * MSR_ENERGY_UNIT)
+
+
+def test_msr_no_msr_file(msr_two_socket, monkeypatch):
+    """
+    create a MsrPkgAPI instance on a machine without msr files
+    Test if:
+      - a PyRAPLCantInitDeviceAPI is raised
+    """
+    monkeypatch.setattr(MsrAPI, 'MSR_FILE_NAME', '/nonexistent/{}/msr')
+    with pytest.raises(PyRAPLCantInitDeviceAPI):
+        MsrPkgAPI()
+
+
+def test_creating_msr_device(msr_two_socket):
+    """
+    use the DeviceAPIFactory to create a MsrDramAPI instance
+    Test if:
+      - the returned instance is an instance of MsrDramAPI
+    """
+    assert isinstance(DeviceAPIFactory.create_device_api(Device.DRAM, None, 'msr'), MsrDramAPI)
+
+
+####################
+# MAX ENERGY RANGE #
+####################
+def test_max_energy_range_two_socket(fs_two_socket):
+    """
+    create a PkgAPI instance on a filesystem containing a max_energy_range_uj file only for socket 1
+    Test if:
+      - the range of socket 0 is -1
+      - the range of socket 1 is the value of the max_energy_range_uj file
+    """
+    fs_two_socket.create_file(SOCKET_1_DIR_NAME + '/max_energy_range_uj', contents='262143328850\n')
+    assert PkgAPI().max_energy_range() == (-1, 262143328850)
+
+
+def test_msr_max_energy_range(msr_two_socket):
+    """
+    create a MsrPkgAPI instance on a fake msr file tree
+    Test if:
+      - the range is the range of a 32 bits counter multiplied by the energy unit
+    """
+    assert MsrPkgAPI().max_energy_range() == (2 ** 32 * MSR_ENERGY_UNIT, 2 ** 32 * MSR_ENERGY_UNIT)
+
+
+###########
+# DOMAINS #
+###########
+def test_energy_core_uncore_psys(fs_one_socket_all_domains):
+    """
+    create a CoreAPI, UncoreAPI and PsysAPI instance on a filesystem containing core, uncore and psys zones
+    Test if:
+      - each API returns the value of its zone
+    """
+    assert CoreAPI().energy() == (CORE_0_VALUE,)
+    assert UncoreAPI().energy() == (UNCORE_0_VALUE,)
+    assert PsysAPI().energy() == (PSYS_VALUE,)
+
+
+def test_init_core_api_without_core_zone(fs_one_socket):
+    """
+    create a CoreAPI instance on a filesystem without core zone
+    Test if:
+      - a PyRAPLCantInitDeviceAPI is raised
+    """
+    with pytest.raises(PyRAPLCantInitDeviceAPI):
+        CoreAPI()
+
+
+def test_energy_mmio_zone(fs):
+    """
+    create a PkgAPI instance on a filesystem where the package zone is only available in the intel-rapl-mmio control
+    type
+    Test if:
+      - the PkgAPI reads the intel-rapl-mmio package zone
+    """
+    fs.create_file('/sys/devices/system/cpu/present', contents='0')
+    fs.create_file('/sys/devices/system/cpu/cpu0/topology/physical_package_id', contents='0')
+    fs.create_file('/sys/class/powercap/intel-rapl/intel-rapl:0/name', contents='psys\n')
+    mmio_directory = '/sys/class/powercap/intel-rapl-mmio/intel-rapl-mmio:0'
+    fs.create_file(mmio_directory + '/name', contents='package-0\n')
+    fs.create_file(mmio_directory + '/energy_uj', contents=str(PKG_0_VALUE) + '\n')
+
+    device_api = PkgAPI()
+    assert device_api._sys_files[0].name == mmio_directory + '/energy_uj'
+    assert device_api.energy() == (PKG_0_VALUE,)
+
+
+#######
+# AMD #
+#######
+def test_amd_energy_socket_counters(fs_amd_energy):
+    """
+    create an AmdEnergyAPI instance on a filesystem containing amd_energy hwmon counters for two sockets
+    Test if:
+      - the API reads the Esocket counter of each socket
+    """
+    device_api = AmdEnergyAPI()
+    assert device_api._sys_files[1].name == AMD_HWMON_DIR_NAME + '/energy6_input'
+    assert device_api.energy() == (AMD_SOCKET_0_VALUE, AMD_SOCKET_1_VALUE)
+
+
+def test_amd_energy_core_counters(fs_amd_energy):
+    """
+    use the AmdEnergyAPI core_energy method to get the energy consumption of cpu 1 and 2
+    Test if:
+      - the value of each cpu is the counter of its physical core
+    """
+    assert AmdEnergyAPI().core_energy([1, 2]) == {1: AMD_CORE_VALUES[1], 2: AMD_CORE_VALUES[2]}
+
+
+def test_amd_energy_without_driver(fs_two_socket):
+    """
+    create an AmdEnergyAPI instance on a filesystem without amd_energy hwmon
+    Test if:
+      - a PyRAPLCantInitDeviceAPI is raised
+    """
+    with pytest.raises(PyRAPLCantInitDeviceAPI):
+        AmdEnergyAPI()
+
+
+def test_default_backend_amd_energy(fs_amd_energy):
+    """
+    use the DeviceAPIFactory, without backend, to create a package DeviceAPI on a filesystem without powercap zones
+    but with amd_energy counters
+    Test if:
+      - the returned instance is an instance of AmdEnergyAPI
+    """
+    assert isinstance(DeviceAPIFactory.create_device_api(Device.PKG, None), AmdEnergyAPI)
+
+
+def test_amd_msr_energy(amd_msr_two_socket):
+    """
+    create an AmdMsrAPI instance on a fake msr file tree containing AMD RAPL registers
+    Test if:
+      - the package energy is read in the AMD package energy status register of each socket
+      - the core energy is read in the AMD core energy status register of each cpu
+    """
+    device_api = AmdMsrAPI()
+    assert device_api.energy() == (MSR_PKG_0_VALUE * MSR_ENERGY_UNIT, MSR_PKG_1_VALUE * MSR_ENERGY_UNIT)
+    assert device_api.core_energy([1, 3]) == {1: 11 * MSR_ENERGY_UNIT, 3: 13 * MSR_ENERGY_UNIT}
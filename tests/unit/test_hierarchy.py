@@ -0,0 +1,207 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import asyncio
+
+import pytest
+
+from pyRAPL import Device, Measurement, MeasurementTree, Sensor, measureit
+from tests.utils import ListOutput, fs_one_socket, write_new_energy_value, PKG_0_VALUE, DRAM_0_VALUE
+
+
+class CountingSensor(Sensor):
+    reads = 0
+
+    def energy(self):
+        self.reads += 1
+        return Sensor.energy(self)
+
+
+def consume(pkg, dram=0):
+    """
+    add energy consumption to the counters of the socket 0
+    """
+    consume.pkg += pkg
+    consume.dram += dram
+    write_new_energy_value(PKG_0_VALUE + consume.pkg, Device.PKG, 0)
+    write_new_energy_value(DRAM_0_VALUE + consume.dram, Device.DRAM, 0)
+
+
+@pytest.fixture
+def sensor(fs_one_socket):
+    consume.pkg = 0
+    consume.dram = 0
+    return CountingSensor()
+
+
+def run_request(tree):
+    with tree.region('request'):
+        consume(100, 10)
+        with tree.region('parse'):
+            consume(200, 20)
+        with tree.region('query'):
+            consume(300, 30)
+        consume(50, 5)
+
+
+########
+# TREE #
+########
+def test_nested_regions(sensor):
+    """
+    Test if:
+      - nested regions form a tree
+      - the inclusive energy of a region is the energy consumed between its boundaries
+      - the exclusive energy of a region is its inclusive energy minus the inclusive energy of its children
+    """
+    tree = MeasurementTree(sensor, snapshot_window=0)
+    run_request(tree)
+
+    [request] = tree.roots
+    assert [child.path for child in request.children] == [('request', 'parse'), ('request', 'query')]
+    assert request.result().pkg == [650]
+    assert request.result().dram == [65]
+    assert request.result(exclusive=True).pkg == [150]
+    assert request.result(exclusive=True).dram == [15]
+    assert request.children[1].result().label == 'request/query'
+    assert request.children[1].result().pkg == [300]
+    assert request.children[1].result(exclusive=True).pkg == [300]
+
+
+def test_snapshot_shared_at_boundaries(sensor):
+    """
+    Test if boundaries of different regions inside the snapshot window share one sensor read : the outer and inner
+    beginnings share a read, the inner and outer ends share another one
+    """
+    tree = MeasurementTree(sensor, snapshot_window=10 ** 9)
+    with tree.region('outer'):
+        with tree.region('inner'):
+            pass
+    assert sensor.reads == 2
+
+    tree = MeasurementTree(sensor, snapshot_window=0)
+    with tree.region('outer'):
+        with tree.region('inner'):
+            pass
+    assert sensor.reads == 6
+
+
+def test_short_regions_not_empty(sensor, monkeypatch):
+    """
+    Measure short regions with a counter increased on each sensor read and a large snapshot window
+
+    Test if a region never ends on the snapshot it began with : short regions have a positive energy consumption
+    """
+    energy = Sensor.energy
+
+    def moving_energy(self):
+        consume(1)
+        return energy(self)
+    monkeypatch.setattr(CountingSensor, 'energy', moving_energy)
+    tree = MeasurementTree(sensor, snapshot_window=10 ** 9)
+
+    with tree.region('single'):
+        pass
+    with tree.region('outer'):
+        with tree.region('inner'):
+            pass
+
+    single, outer = tree.roots
+    assert single.result().pkg[0] > 0
+    assert outer.result().pkg[0] > 0
+    assert outer.children[0].result().pkg[0] > 0
+
+
+def test_end_without_region(sensor):
+    with pytest.raises(RuntimeError):
+        MeasurementTree(sensor).end()
+
+
+def test_regions_of_concurrent_tasks(sensor):
+    """
+    Test if regions begun in concurrent asyncio tasks are children of the region running when the tasks were created
+    and not of each other
+    """
+    tree = MeasurementTree(sensor, snapshot_window=0)
+
+    async def handler(name):
+        with tree.region(name):
+            await asyncio.sleep(0)
+
+    async def main():
+        with tree.region('main'):
+            await asyncio.gather(handler('a'), handler('b'))
+
+    asyncio.run(main())
+    [root] = tree.roots
+    assert sorted(child.path for child in root.children) == [('main', 'a'), ('main', 'b')]
+    assert all(child.children == [] for child in root.children)
+
+
+#############
+# AGGREGATE #
+#############
+def test_aggregate_by_path(sensor):
+    """
+    Test if the regions with the same path are aggregated
+    """
+    tree = MeasurementTree(sensor, snapshot_window=0)
+    run_request(tree)
+    run_request(tree)
+
+    aggregated = tree.aggregate()
+    assert list(aggregated) == [('request',), ('request', 'parse'), ('request', 'query')]
+    assert aggregated[('request',)].count == 2
+    assert aggregated[('request',)].inclusive.pkg == [1300]
+    assert aggregated[('request',)].exclusive.pkg == [300]
+    assert aggregated[('request', 'parse')].inclusive.pkg == [400]
+
+
+def test_export_and_clear(sensor):
+    tree = MeasurementTree(sensor, snapshot_window=0)
+    run_request(tree)
+    output = ListOutput()
+    tree.export(output, exclusive=True)
+    results = [(result.label, result.pkg) for result in output.results]
+    assert results == [('request', [150]), ('request/parse', [200]), ('request/query', [300])]
+    tree.clear()
+    assert tree.roots == []
+
+
+###############
+# MEASUREMENT #
+###############
+def test_measurement_in_tree(sensor):
+    """
+    Test if Measurement and measureit with a tree are recorded as regions of the tree
+    """
+    tree = MeasurementTree(sensor, snapshot_window=0)
+
+    @measureit(tree=tree, output=ListOutput())
+    def parse():
+        consume(200)
+
+    measure = Measurement('request', tree=tree)
+    measure.begin()
+    consume(100)
+    parse()
+    measure.end()
+
+    assert measure.result.pkg == [300]
+    assert tree.aggregate()[('request', 'parse')].inclusive.pkg == [200]
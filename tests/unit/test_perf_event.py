@@ -0,0 +1,267 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import gc
+import struct
+import types
+import weakref
+
+import pytest
+
+import pyRAPL
+from pyRAPL import Device, PyRAPLCantInitDeviceAPI, Topology, Sensor
+from pyRAPL.perf_event import PerfEventAPI, PerfEventSyscalls, PerfPkgAPI, PerfDramAPI, PerfPsysAPI, read_power_events
+from pyRAPL.perf_event import PERF_FORMAT_GROUP
+
+POWER_DIR_NAME = '/sys/bus/event_source/devices/power'
+POWER_TYPE = 17
+ENERGY_SCALE = 2.3283064365386962890625e-10
+EVENT_CONFIGS = {'energy-pkg': 0x02, 'energy-ram': 0x03, 'energy-psys': 0x05}
+
+
+class FakeSyscalls(PerfEventSyscalls):
+    """
+    perf_event_open shim returning the counters of the ``counters`` dictionary (indexed by cpu and config)
+    """
+
+    def __init__(self, counters):
+        PerfEventSyscalls.__init__(self)
+        self.counters = counters
+        self.events = {}
+        self.reads = 0
+        self.closed = []
+
+    def perf_event_open(self, attr, pid, cpu, group_fd, flags):
+        if attr.config not in self.counters[cpu]:
+            raise OSError(2, 'No such file or directory')
+        fd = 100 + len(self.events)
+        self.events[fd] = (attr.type, attr.config, attr.read_format, pid, cpu, group_fd)
+        return fd
+
+    def read(self, fd, size):
+        self.reads += 1
+        cpu = self.events[fd][4]
+        configs = [self.events[fd][1]] + [config for (_, config, _, _, _, group_fd) in self.events.values()
+                                          if group_fd == fd]
+        return struct.pack('<' + 'Q' * (len(configs) + 1), len(configs),
+                           *[self.counters[cpu][config] for config in configs])[:size]
+
+    def close(self, fd):
+        self.closed.append(fd)
+
+
+@pytest.fixture
+def fs_power_pmu(fs, monkeypatch):
+    """
+    create the power PMU sysfs files (pkg, ram and psys events) of a machine with two sockets (cpu 0 and 1 on socket
+    0, cpu 2 on socket 1) and use a fake syscall shim
+    """
+    fs.create_file(POWER_DIR_NAME + '/type', contents=str(POWER_TYPE) + '\n')
+    for event_name, config in EVENT_CONFIGS.items():
+        fs.create_file(POWER_DIR_NAME + '/events/' + event_name, contents='event=' + hex(config) + '\n')
+        fs.create_file(POWER_DIR_NAME + '/events/' + event_name + '.scale', contents=str(ENERGY_SCALE) + '\n')
+        fs.create_file(POWER_DIR_NAME + '/events/' + event_name + '.unit', contents='Joules\n')
+    syscalls = FakeSyscalls({0: {0x02: 1000, 0x03: 2000, 0x05: 3000}, 2: {0x02: 4000, 0x03: 5000, 0x05: 6000}})
+    monkeypatch.setattr(PerfEventAPI, 'SYSCALLS', syscalls)
+    monkeypatch.setattr(pyRAPL.perf_event, '_GROUPS', weakref.WeakValueDictionary())
+    return syscalls
+
+
+TOPOLOGY = Topology(cpus={0: 0, 1: 0, 2: 1})
+
+
+##########
+# EVENTS #
+##########
+def test_read_power_events(fs_power_pmu):
+    """
+    Test if:
+      - each available event is returned with its config and its scale in micro Joules
+      - unavailable events are not returned
+    """
+    events = read_power_events()
+    assert set(events.keys()) == {'energy-pkg', 'energy-ram', 'energy-psys'}
+    assert events['energy-ram'] == (0x03, ENERGY_SCALE * 1000000)
+
+
+def test_read_power_events_without_power_pmu(fs):
+    assert read_power_events() == {}
+
+
+#############
+# PERF INIT #
+#############
+def test_init_without_power_pmu(fs):
+    with pytest.raises(PyRAPLCantInitDeviceAPI):
+        PerfPkgAPI(topology=TOPOLOGY)
+
+
+def test_init_unavailable_event(fs_power_pmu):
+    with pytest.raises(PyRAPLCantInitDeviceAPI):
+        pyRAPL.perf_event.PerfCoreAPI(topology=TOPOLOGY)
+
+
+def test_init_open_events_in_one_group_per_socket(fs_power_pmu):
+    """
+    Test if:
+      - events are opened on the first cpu of each socket, for all processes, with the power PMU type
+      - the events of a socket are opened in the same group, with the group read format
+    """
+    PerfPkgAPI(topology=TOPOLOGY)
+    events = fs_power_pmu.events
+    assert len(events) == 6
+    assert {cpu for (_, _, _, _, cpu, _) in events.values()} == {0, 2}
+    for (power_type, _, read_format, pid, cpu, group_fd) in events.values():
+        assert power_type == POWER_TYPE
+        assert read_format == PERF_FORMAT_GROUP
+        assert pid == -1
+        assert group_fd == -1 or events[group_fd][4] == cpu
+
+
+def test_init_open_events_on_power_pmu_cpumask(fs_power_pmu):
+    """
+    Test if the events of each socket are opened on the cpu of the socket given by the power PMU cpumask
+    """
+    fs_power_pmu.counters[1] = fs_power_pmu.counters[0]
+    with open(POWER_DIR_NAME + '/cpumask', 'w') as cpumask_file:
+        cpumask_file.write('1-2\n')
+    PerfPkgAPI(topology=TOPOLOGY)
+    assert {cpu for (_, _, _, _, cpu, _) in fs_power_pmu.events.values()} == {1, 2}
+
+
+def test_init_event_open_failure_drop_event(fs_power_pmu):
+    """
+    the dram event can't be opened on the second socket
+    Test if:
+      - the other events of the socket are opened in a group without the dram event
+      - the device APIs of the other events can be used
+      - the dram device API can't be initialized
+    """
+    del fs_power_pmu.counters[2][0x03]
+    pkg_api = PerfPkgAPI(topology=TOPOLOGY)
+    assert pkg_api.energy() == pytest.approx((1000 * ENERGY_SCALE * 1000000, 4000 * ENERGY_SCALE * 1000000))
+    with pytest.raises(PyRAPLCantInitDeviceAPI):
+        PerfDramAPI(topology=TOPOLOGY)
+    assert PerfDramAPI(socket_ids=[0], topology=TOPOLOGY).energy() == pytest.approx((2000 * ENERGY_SCALE * 1000000,))
+
+
+def test_init_no_event_opened(fs_power_pmu):
+    fs_power_pmu.counters[2] = {}
+    with pytest.raises(PyRAPLCantInitDeviceAPI):
+        PerfPkgAPI(topology=TOPOLOGY)
+
+
+def test_group_closed_when_unused(fs_power_pmu):
+    """
+    create two device APIs sharing the same groups and delete them
+    Test if the events of the groups are closed once both device APIs are deleted
+    """
+    pkg_api = PerfPkgAPI(topology=TOPOLOGY)
+    dram_api = PerfDramAPI(topology=TOPOLOGY)
+    del pkg_api
+    gc.collect()
+    assert fs_power_pmu.closed == []
+
+    del dram_api
+    gc.collect()
+    assert sorted(fs_power_pmu.closed) == sorted(fs_power_pmu.events)
+    assert len(pyRAPL.perf_event._GROUPS) == 0
+
+
+def test_group_lock_renewed_after_fork(fs_power_pmu):
+    """
+    Test if the lock of a group held by a thread of the parent process is free in the child process
+    """
+    device_api = PerfPkgAPI(topology=TOPOLOGY)
+    group = device_api._sys_files[0]
+    group._lock.acquire()
+    pyRAPL.device_api._reopen_after_fork()
+    assert not group._lock.locked()
+    assert device_api.energy()[0] == pytest.approx(1000 * ENERGY_SCALE * 1000000)
+
+
+###############
+# PERF ENERGY #
+###############
+def test_energy(fs_power_pmu):
+    """
+    Test if:
+      - the energy of each socket is the counter value multiplied by the event scale (in micro Joules)
+      - the counters don't wrap around
+    """
+    device_api = PerfDramAPI(topology=TOPOLOGY)
+    assert device_api.energy() == pytest.approx((2000 * ENERGY_SCALE * 1000000, 5000 * ENERGY_SCALE * 1000000))
+    assert device_api.max_energy_range() == (-1, -1)
+
+
+def test_energy_psys_on_first_socket(fs_power_pmu):
+    device_api = PerfPsysAPI(topology=TOPOLOGY)
+    assert device_api.energy() == pytest.approx((3000 * ENERGY_SCALE * 1000000,))
+
+
+def test_energy_group_read_once_for_all_devices(fs_power_pmu):
+    """
+    read the energy of two device APIs sharing the same groups, twice
+    Test if:
+      - each group is read once for the two devices
+      - each group is read again on the second read of the devices
+    """
+    pkg_api = PerfPkgAPI(topology=TOPOLOGY)
+    dram_api = PerfDramAPI(topology=TOPOLOGY)
+    pkg_api.energy()
+    dram_api.energy()
+    assert fs_power_pmu.reads == 2
+
+    fs_power_pmu.counters[0][0x02] = 1500
+    assert pkg_api.energy()[0] == pytest.approx(1500 * ENERGY_SCALE * 1000000)
+    dram_api.energy()
+    assert fs_power_pmu.reads == 4
+
+
+def test_sensor_perf_backend(fs_power_pmu):
+    """
+    Test if a sensor using the perf backend returns the pkg and dram energy of the two sockets
+    """
+    sensor = Sensor(devices=[Device.PKG, Device.DRAM], backend='perf', topology=TOPOLOGY)
+    assert sensor.energy() == pytest.approx([value * ENERGY_SCALE * 1000000 for value in (1000, 2000, 4000, 5000)])
+
+
+def test_energy_second_sensor_read_fresh_values(fs_power_pmu, monkeypatch):
+    """
+    read the energy of the package with a first sensor, update the counters and read them with a second sensor sharing
+    the same groups
+    Test if:
+      - the second sensor shares the values read by the first one while they are recent
+      - the second sensor reads the new values of the counters once the values read by the first one are too old
+      - the first sensor then reads the new values of the counters
+    """
+    clock = [0]
+    monkeypatch.setattr(pyRAPL.perf_event, 'time', types.SimpleNamespace(monotonic_ns=lambda: clock[0]))
+    first_sensor = Sensor(devices=[Device.PKG], backend='perf', topology=TOPOLOGY)
+    second_sensor = Sensor(devices=[Device.PKG], backend='perf', topology=TOPOLOGY)
+    reads = fs_power_pmu.reads
+    first_sensor.energy()
+    second_sensor.energy()
+    assert fs_power_pmu.reads == reads + 2
+
+    fs_power_pmu.counters[0][0x02] = 1500
+    clock[0] += (pyRAPL.perf_event.SHARED_READ_WINDOW + 1) * 1000
+    assert second_sensor.energy()[0] == pytest.approx(1500 * ENERGY_SCALE * 1000000)
+    assert fs_power_pmu.reads == reads + 4
+    assert first_sensor.energy()[0] == pytest.approx(1500 * ENERGY_SCALE * 1000000)
@@ -19,7 +19,7 @@
 # SOFTWARE.
 
 import pytest
-from pyRAPL import Result
+from pyRAPL import Device, Result
 
 
 def test_fulldiv():
@@ -33,3 +33,13 @@ def test_fulldiv():
     assert [round(x, 6) for x in result.dram] == correct_value.dram
     assert len(result.pkg) == 1
     assert len(result.dram) == 2
+
+
+def test_div_error():
+    """
+    Test if the energy uncertainty of a result is divided with its energy consumption
+    """
+    val = Result('toto', 0, 10, [100], error={Device.PKG: [20]})
+    result = val / 10
+    assert result.pkg == [10]
+    assert result.error == {Device.PKG: [2]}
@@ -0,0 +1,180 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import time
+
+import pytest
+
+import pyRAPL.sampler
+from pyRAPL import Sampler, RingBuffer
+from tests.utils import FakeSensor
+
+requires_numpy = pytest.mark.skipif(pyRAPL.sampler.numpy is None, reason='numpy is not installed')
+
+
+def append_samples(ring, n):
+    for i in range(n):
+        ring.append(i * 10, pyRAPL.sampler.array('d', [i, i * 2]))
+
+
+###############
+# RING BUFFER #
+###############
+def test_ring_buffer_not_full():
+    ring = RingBuffer(2, 4)
+    append_samples(ring, 3)
+    assert len(ring) == 3
+    assert list(ring.timestamps()) == [0, 10, 20]
+    assert list(ring.values(2)) == [1, 2, 2, 4]
+
+
+def test_ring_buffer_wrap_around_contiguous_views():
+    """
+    append 6 samples in a buffer of capacity 4
+    Test if:
+      - only the 4 latest samples are kept, oldest first
+      - the views of the latest samples are contiguous even if the samples wrapped around the buffer
+    """
+    ring = RingBuffer(2, 4)
+    append_samples(ring, 6)
+    assert len(ring) == 4
+    assert ring.count == 6
+    assert list(ring.timestamps()) == [20, 30, 40, 50]
+    assert list(ring.values()) == [2, 4, 3, 6, 4, 8, 5, 10]
+    assert ring.values().contiguous
+
+
+def test_ring_buffer_copy():
+    ring = RingBuffer(2, 4)
+    append_samples(ring, 6)
+    timestamps, values = ring.copy(3)
+    append_samples(ring, 2)
+    assert list(timestamps) == [30, 40, 50]
+    assert list(values) == [3, 6, 4, 8, 5, 10]
+
+
+def test_ring_buffer_copy_during_append():
+    """
+    append 6 samples in a buffer of capacity 4 and copy the buffer while 2 samples are appended between the copy of
+    the timestamps and the copy of the values
+    Test if the 2 oldest samples, overwritten during the copy, are dropped from both the timestamps and the values
+    """
+    ring = RingBuffer(2, 4)
+    append_samples(ring, 6)
+
+    class ConcurrentAppends(pyRAPL.sampler.array):
+        def __getitem__(self, index):
+            ring._values = values
+            ring.append(60, pyRAPL.sampler.array('d', [6, 12]))
+            ring.append(70, pyRAPL.sampler.array('d', [7, 14]))
+            return values[index]
+    values = ring._values
+    ring._values = ConcurrentAppends('d', values)
+
+    timestamps, copied_values = ring.copy()
+    assert list(timestamps) == [40, 50]
+    assert list(copied_values) == [4, 8, 5, 10]
+
+
+@requires_numpy
+def test_ring_buffer_numpy_views_without_copy():
+    ring = RingBuffer(2, 4)
+    append_samples(ring, 5)
+    timestamps, values = ring.numpy(3)
+    assert timestamps.tolist() == [20, 30, 40]
+    assert values.tolist() == [[2, 4], [3, 6], [4, 8]]
+    assert not timestamps.flags.owndata
+    assert not values.flags.owndata
+
+
+###########
+# SAMPLER #
+###########
+def test_sample_accumulate_energy_with_wraparound():
+    """
+    Test if:
+      - the first sample values are 0 for the monitored devices and -1 for the unmonitored ones
+      - the sample values are the energy consumed since the first sample, even when the counter wraps around
+    """
+    sensor = FakeSensor([10, -1], max_energy_ranges=[100, -1])
+    sampler = Sampler(frequency=10, capacity=10, sensor=sensor)
+    sampler.sample()
+    sensor.counters = [90, -1]
+    sampler.sample()
+    sensor.counters = [5, -1]
+    sampler.sample()
+    assert list(sampler.buffer.values()) == [0, -1, 80, -1, 95, -1]
+
+
+@requires_numpy
+def test_power():
+    """
+    Test if the power is the energy difference between consecutive samples divided by their duration (in Watts) and
+    -1 for the unmonitored devices
+    """
+    sampler = Sampler(frequency=10, capacity=10, sensor=FakeSensor([10, -1], max_energy_ranges=[100, -1]))
+    sampler.buffer.append(0, pyRAPL.sampler.array('d', [0, -1]))
+    sampler.buffer.append(1000000, pyRAPL.sampler.array('d', [2000, -1]))
+    sampler.buffer.append(3000000, pyRAPL.sampler.array('d', [3000, -1]))
+
+    timestamps, power = sampler.power()
+    assert timestamps.tolist() == [1000000, 3000000]
+    assert power.tolist() == [[2, -1], [0.5, -1]]
+
+
+def test_power_without_numpy(monkeypatch):
+    monkeypatch.setattr(pyRAPL.sampler, 'numpy', None)
+    sampler = Sampler(frequency=10, capacity=10, sensor=FakeSensor([10, -1], max_energy_ranges=[100, -1]))
+    sampler.buffer.append(0, pyRAPL.sampler.array('d', [0, -1]))
+    sampler.buffer.append(1000000, pyRAPL.sampler.array('d', [2000, -1]))
+
+    assert sampler.power() == ([1000000], [[2, -1]])
+    with pytest.raises(ImportError):
+        sampler.buffer.numpy()
+
+
+def test_sampling_thread():
+    """
+    sample a sensor at 200 Hz during 0.1 second
+    Test if:
+      - samples are recorded with increasing timestamps
+      - the thread is stopped
+    """
+    sampler = Sampler(frequency=200, sensor=FakeSensor([10, -1], max_energy_ranges=[100, -1]))
+    with sampler:
+        assert sampler.running
+        time.sleep(0.1)
+    assert not sampler.running
+    assert len(sampler.buffer) + sampler.missed_samples >= 5
+    timestamps = list(sampler.buffer.timestamps())
+    assert timestamps == sorted(timestamps)
+
+
+def test_sampling_thread_error_raised_on_stop():
+    sensor = FakeSensor([10, -1], max_energy_ranges=[100, -1])
+    sampler = Sampler(frequency=1000, sensor=sensor)
+
+    def broken_energy():
+        raise OSError('read error')
+    sensor.energy = broken_energy
+    sampler.start()
+    time.sleep(0.01)
+    assert not sampler.running
+    with pytest.raises(OSError):
+        sampler.stop()
@@ -0,0 +1,127 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import math
+
+import pytest
+
+from pyRAPL import Device, Sensor, measureit, OneInN, RandomSampling, TimeBudgetSampling
+from pyRAPL.sampling import SampledCalls
+from tests.utils import ListOutput, fs_one_socket, write_new_energy_value, PKG_0_VALUE
+
+
+############
+# POLICIES #
+############
+def test_one_in_n():
+    policy = OneInN(10)
+    assert policy.first_skip() == 0
+    assert policy.next_skip(100, 1000, 10) == 9
+
+
+def test_one_in_n_bad_period():
+    with pytest.raises(ValueError):
+        OneInN(0)
+
+
+def test_random_sampling_rate():
+    """
+    Test if the mean number of skipped calls matches the sampling probability
+    """
+    policy = RandomSampling(0.1, seed=42)
+    skips = [policy.next_skip(0, 0, 0) for _ in range(20000)]
+    assert min(skips) >= 0
+    assert 1 / (1 + sum(skips) / len(skips)) == pytest.approx(0.1, rel=0.05)
+
+
+def test_random_sampling_always():
+    assert RandomSampling(1).next_skip(0, 0, 0) == 0
+
+
+def test_time_budget():
+    """
+    Test if the number of skipped calls keeps the measuring time under the budget : with an overhead of 10us, a budget
+    of 1% and one call per micro second, the next measure is done 1ms (1000 calls) later
+    """
+    policy = TimeBudgetSampling(0.01)
+    assert policy.next_skip(10000, 0, 0) == 0
+    assert policy.next_skip(10000, 100000, 100) == 1000
+
+
+#############
+# MEASUREIT #
+#############
+def sampled_function(sampling, output):
+    @measureit(sampling=sampling, output=output, sensor=Sensor(devices=[Device.PKG]))
+    def foo(energy):
+        foo.pkg += energy
+        write_new_energy_value(PKG_0_VALUE + foo.pkg, Device.PKG, 0)
+        return energy
+    foo.pkg = 0
+    return foo
+
+
+def test_measureit_one_in_n(fs_one_socket):
+    """
+    Call a function 100 times, consuming 10uJ on each call, with a 1 in 10 sampling policy
+
+    Test if:
+      - only 10 calls are measured and exported
+      - the estimated energy consumption is the energy consumption of the 100 calls, with a null error
+    """
+    output = ListOutput()
+    foo = sampled_function(OneInN(10), output)
+    for _ in range(100):
+        assert foo(10) == 10
+
+    assert len(output.results) == 10
+    assert all(result.pkg == [10] for result in output.results)
+    estimate = foo.sampling.estimate()
+    assert (estimate.calls, estimate.samples) == (100, 10)
+    assert estimate.energy[Device.PKG] == [pytest.approx(1000)]
+    assert estimate.energy_error[Device.PKG] == [pytest.approx(0)]
+    assert Device.DRAM not in estimate.energy
+
+
+def test_measureit_estimate_error(fs_one_socket):
+    """
+    Test if the real energy consumption is in the error bounds of the estimation
+    """
+    output = ListOutput()
+    foo = sampled_function(RandomSampling(0.2, seed=1), output)
+    for i in range(1000):
+        foo(i % 7)
+
+    estimate = foo.sampling.estimate()
+    assert 0 < estimate.samples < 1000
+    assert abs(estimate.energy[Device.PKG][0] - foo.pkg) <= estimate.energy_error[Device.PKG][0]
+
+
+def test_estimate_without_measure():
+    sampled_calls = SampledCalls('foo', OneInN(10))
+    sampled_calls.calls = 5
+    estimate = sampled_calls.estimate()
+    assert estimate.samples == 0
+    assert estimate.energy == {}
+
+
+def test_estimate_with_one_measure(fs_one_socket):
+    foo = sampled_function(OneInN(10), ListOutput())
+    foo(10)
+    assert math.isinf(foo.sampling.estimate().energy_error[Device.PKG][0])
@@ -18,12 +18,21 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import time
+
 import pytest
 
 from pyRAPL import Sensor, Device, PkgAPI
 from pyRAPL import PyRAPLCantRecordEnergyConsumption, PyRAPLCantRecordEnergyConsumption, PyRAPLBadSocketIdException
-from tests.utils import PKG_0_VALUE, PKG_1_VALUE, DRAM_0_VALUE, DRAM_1_VALUE
+from pyRAPL.device_api import RawEnergyReader
+from pyRAPL.sensor import SubstractableList, READ_CACHE
+from tests.utils import PKG_0_VALUE, PKG_1_VALUE, DRAM_0_VALUE, DRAM_1_VALUE, SOCKET_0_DIR_NAME
+from tests.utils import write_new_energy_value
+from tests.utils import fs_one_socket_all_domains, CORE_0_VALUE, UNCORE_0_VALUE, PSYS_VALUE
+from tests.utils import fs_amd_energy, AMD_SOCKET_0_VALUE, AMD_SOCKET_1_VALUE
 from tests.utils import empty_fs, fs_one_socket, fs_two_socket, fs_one_socket_no_dram
+from tests.utils import msr_two_socket, MSR_ENERGY_UNIT, MSR_PKG_0_VALUE, MSR_PKG_1_VALUE, MSR_DRAM_0_VALUE
+from tests.utils import MSR_DRAM_1_VALUE
 
 
 ########
@@ -99,14 +108,14 @@ class SensorParam:
 
 @pytest.fixture(params=[
     SensorParam(None, None, [PKG_0_VALUE, DRAM_0_VALUE], [PKG_0_VALUE, DRAM_0_VALUE, PKG_1_VALUE, DRAM_1_VALUE]),
-    SensorParam([Device.PKG], None, [PKG_0_VALUE, -1], [PKG_0_VALUE, -1, PKG_1_VALUE, -1]),
-    SensorParam([Device.DRAM], None, [-1, DRAM_0_VALUE], [-1, DRAM_0_VALUE, -1, DRAM_1_VALUE]),
+    SensorParam([Device.PKG], None, [PKG_0_VALUE], [PKG_0_VALUE, PKG_1_VALUE]),
+    SensorParam([Device.DRAM], None, [DRAM_0_VALUE], [DRAM_0_VALUE, DRAM_1_VALUE]),
     SensorParam([Device.PKG, Device.DRAM], None, [PKG_0_VALUE, DRAM_0_VALUE], [PKG_0_VALUE, DRAM_0_VALUE, PKG_1_VALUE,
                                                                                DRAM_1_VALUE]),
 
     SensorParam(None, [0], [PKG_0_VALUE, DRAM_0_VALUE], [PKG_0_VALUE, DRAM_0_VALUE]),
-    SensorParam([Device.PKG], [0], [PKG_0_VALUE, -1], [PKG_0_VALUE, -1]),
-    SensorParam([Device.DRAM], [0], [-1, DRAM_0_VALUE], [-1, DRAM_0_VALUE]),
+    SensorParam([Device.PKG], [0], [PKG_0_VALUE], [PKG_0_VALUE]),
+    SensorParam([Device.DRAM], [0], [DRAM_0_VALUE], [DRAM_0_VALUE]),
     SensorParam([Device.PKG, Device.DRAM], [0], [PKG_0_VALUE, DRAM_0_VALUE], [PKG_0_VALUE, DRAM_0_VALUE]),
 ])
 def sensor_param(request):
@@ -125,13 +134,13 @@ def sensor_param(request):
 
 @pytest.fixture(params=[
     SensorParam(None, [1], None, [-1, -1, PKG_1_VALUE, DRAM_1_VALUE]),
-    SensorParam([Device.PKG], [1], None, [-1, -1, PKG_1_VALUE, -1]),
-    SensorParam([Device.DRAM], [1], None, [-1, -1, -1, DRAM_1_VALUE]),
+    SensorParam([Device.PKG], [1], None, [-1, PKG_1_VALUE]),
+    SensorParam([Device.DRAM], [1], None, [-1, DRAM_1_VALUE]),
     SensorParam([Device.PKG, Device.DRAM], [1], None, [-1, -1, PKG_1_VALUE, DRAM_1_VALUE]),
 
     SensorParam(None, [0, 1], [PKG_0_VALUE, DRAM_0_VALUE], [PKG_0_VALUE, DRAM_0_VALUE, PKG_1_VALUE, DRAM_1_VALUE]),
-    SensorParam([Device.PKG], [0, 1], [PKG_0_VALUE, -1], [PKG_0_VALUE, -1, PKG_1_VALUE, -1]),
-    SensorParam([Device.DRAM], [0, 1], [-1, DRAM_0_VALUE], [-1, DRAM_0_VALUE, -1, DRAM_1_VALUE]),
+    SensorParam([Device.PKG], [0, 1], [PKG_0_VALUE], [PKG_0_VALUE, PKG_1_VALUE]),
+    SensorParam([Device.DRAM], [0, 1], [DRAM_0_VALUE], [DRAM_0_VALUE, DRAM_1_VALUE]),
     SensorParam([Device.PKG, Device.DRAM], [0, 1], [PKG_0_VALUE, DRAM_0_VALUE], [PKG_0_VALUE, DRAM_0_VALUE, PKG_1_VALUE,
                                                                                  DRAM_1_VALUE])
 ])
@@ -179,3 +188,237 @@ def test_energy_monitor_socket_1_two_socket(fs_two_socket, sensor_param_monitor_
     """
     sensor = Sensor(sensor_param_monitor_socket_1.devices, sensor_param_monitor_socket_1.sockets)
     assert sensor.energy() == sensor_param_monitor_socket_1.two_socket_result
+
+
+def test_energy_msr_backend(msr_two_socket):
+    """
+    Create a sensor that use the msr backend and get energy of monitored devices
+    The machine contains two sockets
+    Test:
+      - return value of the function
+    """
+    sensor = Sensor(devices=[Device.PKG, Device.DRAM], backend='msr')
+    assert sensor.energy() == [MSR_PKG_0_VALUE * MSR_ENERGY_UNIT, MSR_DRAM_0_VALUE * MSR_ENERGY_UNIT,
+                               MSR_PKG_1_VALUE * MSR_ENERGY_UNIT, MSR_DRAM_1_VALUE * MSR_ENERGY_UNIT]
+
+
+##############
+# WRAPAROUND #
+##############
+def test_substract_wrapped_counter():
+    """
+    substract two SubstractableList whose first counter wrapped around between the two values
+    Test if:
+      - the delta of the wrapped counter is computed modulo the counter range
+      - the delta of a counter with an unknown range is a plain difference
+      - the delta of a non monitored counter is -1
+    """
+    begin = SubstractableList([900, 100, -1], [1000, -1, -1])
+    end = SubstractableList([50, 150, -1], [1000, -1, -1])
+    assert end - begin == [150, 50, -1]
+
+
+def test_energy_wrapped_counter(fs_one_socket):
+    """
+    Create a sensor on a filesystem containing a max_energy_range_uj file for package and write a package counter
+    value lower than the first one (counter wraparound)
+    Test if:
+      - the substraction of the two energy values is the delta modulo the counter range
+    """
+    fs_one_socket.create_file(SOCKET_0_DIR_NAME + '/max_energy_range_uj', contents='100000\n')
+    sensor = Sensor()
+    begin = sensor.energy()
+    write_new_energy_value(345, Device.PKG, 0)
+    end = sensor.energy()
+    assert (end - begin)[0] == 100000 - PKG_0_VALUE + 345
+
+
+def test_energy_overflow_tracking(fs_one_socket):
+    """
+    Create a sensor with overflow tracking on a filesystem containing a max_energy_range_uj file for package and make
+    the package counter wrap around two times
+    Test if:
+      - the returned package value is the first counter value plus the accumulated deltas
+    """
+    fs_one_socket.create_file(SOCKET_0_DIR_NAME + '/max_energy_range_uj', contents='100000\n')
+    sensor = Sensor(devices=[Device.PKG], overflow_tracking=True)
+    assert sensor.energy() == [PKG_0_VALUE]
+    write_new_energy_value(345, Device.PKG, 0)
+    sensor.energy()
+    write_new_energy_value(90000, Device.PKG, 0)
+    sensor.energy()
+    write_new_energy_value(10, Device.PKG, 0)
+    assert sensor.energy() == [2 * 100000 + 10]
+
+
+def test_energy_all_domains(fs_one_socket_all_domains):
+    """
+    Create a sensor to monitor all the available devices on a machine with package, dram, core, uncore and psys zones
+    Test if:
+      - all the devices are monitored
+      - the returned list contains the value of each device, sorted by device
+      - the per_device method splits the list by device
+    """
+    sensor = Sensor()
+    assert sensor.devices == [Device.PKG, Device.DRAM, Device.CORE, Device.UNCORE, Device.PSYS]
+    energy = sensor.energy()
+    assert energy == [PKG_0_VALUE, DRAM_0_VALUE, CORE_0_VALUE, UNCORE_0_VALUE, PSYS_VALUE]
+    assert sensor.per_device(energy)[Device.CORE] == [CORE_0_VALUE]
+
+
+def test_energy_two_socket_layout(fs_two_socket):
+    """
+    Create a sensor to monitor dram and package (given in this order) on a machine with two sockets
+    Test if:
+      - the returned list contains the values socket by socket, sorted by device
+    """
+    sensor = Sensor(devices=[Device.DRAM, Device.PKG])
+    assert sensor.energy() == [PKG_0_VALUE, DRAM_0_VALUE, PKG_1_VALUE, DRAM_1_VALUE]
+
+
+def test_energy_amd_energy(fs_amd_energy):
+    """
+    Create a sensor to monitor all the available devices on an AMD machine without powercap zones but with amd_energy
+    hwmon counters
+    Test if:
+      - only the package is monitored
+      - the returned list contains the socket counters of the amd_energy driver
+    """
+    sensor = Sensor()
+    assert sensor.devices == [Device.PKG]
+    assert sensor.energy() == [AMD_SOCKET_0_VALUE, AMD_SOCKET_1_VALUE]
+
+
+##############
+# READ CACHE #
+##############
+@pytest.fixture
+def clean_read_cache():
+    READ_CACHE.clear()
+    yield READ_CACHE
+    READ_CACHE.clear()
+
+
+def count_energy_calls(monkeypatch, device_api_class):
+    calls = []
+    energy = device_api_class.energy
+
+    def counted_energy(self):
+        calls.append(self)
+        return energy(self)
+    monkeypatch.setattr(device_api_class, 'energy', counted_energy)
+    return calls
+
+
+def test_read_cache_shared_between_sensors(fs_two_socket, clean_read_cache, monkeypatch):
+    """
+    Create two sensors monitoring the package (and the dram for the first one) with a read cache window of 1 second
+    Test if:
+      - the package counters read by the first sensor are reused by the second sensor
+      - the sensors return the same package values
+    """
+    sensor_a = Sensor(devices=[Device.PKG, Device.DRAM], read_cache_window=1000000)
+    sensor_b = Sensor(devices=[Device.PKG], read_cache_window=1000000)
+    calls = count_energy_calls(monkeypatch, PkgAPI)
+
+    assert sensor_a.energy() == [PKG_0_VALUE, DRAM_0_VALUE, PKG_1_VALUE, DRAM_1_VALUE]
+    assert sensor_b.energy() == [PKG_0_VALUE, PKG_1_VALUE]
+    assert len(calls) == 1
+
+
+def test_read_cache_shared_between_overlapping_sockets(fs_two_socket, clean_read_cache, monkeypatch):
+    """
+    Create a sensor monitoring the package of the two sockets and a sensor monitoring the package of socket 0, with a
+    read cache window of 1 second
+    Test if:
+      - the package counter of socket 0 read by the first sensor is reused by the second sensor
+      - the second sensor doesn't provide every counter of the first sensor, so the first sensor read its counters
+        again after the second one
+    """
+    sensor_a = Sensor(devices=[Device.PKG], read_cache_window=1000000)
+    sensor_b = Sensor(devices=[Device.PKG], socket_ids=[0], read_cache_window=1000000)
+    calls = count_energy_calls(monkeypatch, PkgAPI)
+
+    assert sensor_a.energy() == [PKG_0_VALUE, PKG_1_VALUE]
+    assert sensor_b.energy() == [PKG_0_VALUE]
+    assert len(calls) == 1
+
+    clean_read_cache.clear()
+    assert sensor_b.energy() == [PKG_0_VALUE]
+    assert sensor_a.energy() == [PKG_0_VALUE, PKG_1_VALUE]
+    assert len(calls) == 3
+
+
+def test_read_cache_shared_between_overlapping_raw_sensors(fs_two_socket, clean_read_cache, monkeypatch):
+    """
+    Create a raw sensor monitoring the package and the dram and a raw sensor monitoring the package, with a read cache
+    window of 1 second
+    Test if the package counters read by the first sensor are reused by the second sensor
+    """
+    reads = []
+
+    def read_into(self, result):
+        reads.append(self)
+        for slot in self._slots:
+            result[slot] = slot
+    monkeypatch.setattr(RawEnergyReader, 'read_into', read_into)
+    sensor_a = Sensor(devices=[Device.PKG, Device.DRAM], raw=True, read_cache_window=1000000)
+    sensor_b = Sensor(devices=[Device.PKG], raw=True, read_cache_window=1000000)
+
+    assert sensor_a.energy() == [0, 1, 2, 3]
+    assert sensor_b.energy() == [0, 2]
+    assert reads == [sensor_a._raw_reader]
+
+
+def test_read_cache_expired(fs_two_socket, clean_read_cache, monkeypatch):
+    """
+    Test if counters are read again once the cache window is over
+    """
+    sensor_a = Sensor(devices=[Device.PKG], read_cache_window=1)
+    sensor_b = Sensor(devices=[Device.PKG], read_cache_window=1)
+    calls = count_energy_calls(monkeypatch, PkgAPI)
+    sensor_a.energy()
+    write_new_energy_value(PKG_0_VALUE + 10, Device.PKG, 0)
+    monkeypatch.setattr(READ_CACHE, 'get', lambda key, now, window: None)
+
+    assert sensor_b.energy() == [PKG_0_VALUE + 10, PKG_1_VALUE]
+    assert len(calls) == 2
+
+
+def test_read_cache_disabled_by_default(fs_two_socket, clean_read_cache, monkeypatch):
+    sensor_a = Sensor(devices=[Device.PKG])
+    sensor_b = Sensor(devices=[Device.PKG])
+    calls = count_energy_calls(monkeypatch, PkgAPI)
+    sensor_a.energy()
+    sensor_b.energy()
+    assert len(calls) == 2
+
+
+############
+# SNAPSHOT #
+############
+def test_snapshot(fs_two_socket):
+    """
+    Test if:
+      - the snapshot contains the energy of the monitored devices
+      - the read window is bounded by monotonic timestamps taken before and after the read
+      - the timestamp of the snapshot is the wall clock time of the middle of the read window
+    """
+    sensor = Sensor(devices=[Device.PKG, Device.DRAM])
+    before = time.monotonic_ns()
+    ts_before = time.time_ns()
+    snapshot = sensor.snapshot()
+    ts_after = time.time_ns()
+
+    assert snapshot.energy == [PKG_0_VALUE, DRAM_0_VALUE, PKG_1_VALUE, DRAM_1_VALUE]
+    assert before <= snapshot.before <= snapshot.middle <= snapshot.after <= time.monotonic_ns()
+    assert snapshot.window == snapshot.after - snapshot.before
+    assert ts_before <= snapshot.timestamp <= ts_after
+
+
+def test_raw_reads_socket_by_socket(fs_two_socket):
+    """
+    Test if the raw sensor reads the domains of a socket back to back
+    """
+    sensor = Sensor(devices=[Device.PKG, Device.DRAM], raw=True)
+    assert sensor._raw_slots == [0, 1, 2, 3]
@@ -0,0 +1,225 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import time
+
+import pytest
+
+import pyRAPL.shm
+from pyRAPL import Device, PyRAPLException, PyRAPLCantInitDeviceAPI, Sensor, Topology
+from pyRAPL.backend import REGISTRY
+from pyRAPL.shm import SensorPublisher, SharedCounters, ShmAPI
+from pyRAPL.shm import ShmPkgAPI, ShmDramAPI, ShmCoreAPI
+from tests.utils import FakeSensor
+
+TOPOLOGY = Topology(cpus={0: 0, 1: 1})
+
+#: pkg and dram counters of the two sockets of the fake sensor, with a pkg counter range of 1000 on socket 0
+COUNTERS = [100, 200, 300, 400]
+
+
+@pytest.fixture
+def publisher(tmp_path, monkeypatch):
+    """
+    publisher of a fake sensor in a temporary file, used by the ShmAPI
+    """
+    file_name = str(tmp_path / 'pyRAPL')
+    monkeypatch.setattr(ShmAPI, 'FILE_NAME', file_name)
+    monkeypatch.setattr(ShmAPI, 'OWNER', os.getuid())
+    monkeypatch.setattr(pyRAPL.shm, '_shared_counters', {})
+    publisher = SensorPublisher(file_name, sensor=FakeSensor(COUNTERS, devices=[Device.PKG, Device.DRAM], max_energy_ranges=[1000, -1, -1, -1]))
+    yield publisher
+    publisher.close()
+
+
+###########
+# PUBLISH #
+###########
+def test_publish_energy_since_start(publisher):
+    """
+    Test if:
+      - the file describes the published devices and sockets
+      - the published values are the energy consumed since the first sample, counter wraparounds included
+    """
+    publisher.sample()
+    publisher.sensor.counters = [50, 250, 310, 400]
+    publisher.sample()
+
+    counters = SharedCounters(publisher.file_name, owner=os.getuid())
+    assert counters.devices == [Device.PKG, Device.DRAM]
+    assert counters.socket_number == 2
+    timestamp, values = counters.snapshot()
+    assert timestamp > 0
+    assert values == (950, 50, 10, 0)
+    counters.close()
+
+
+def test_publish_refuse_existing_temporary_file(tmp_path):
+    """
+    Test if the publisher doesn't follow a symbolic link planted at the name of its temporary file
+    """
+    file_name = str(tmp_path / 'pyRAPL')
+    target = tmp_path / 'target'
+    os.symlink(str(target), file_name + '.' + str(os.getpid()))
+    with pytest.raises(OSError):
+        SensorPublisher(file_name, sensor=FakeSensor(COUNTERS, devices=[Device.PKG, Device.DRAM], max_energy_ranges=[1000, -1, -1, -1]))
+    assert not target.exists()
+
+
+def test_not_a_shared_memory_file(tmp_path):
+    file_name = tmp_path / 'other'
+    file_name.write_bytes(b'x' * 100)
+    with pytest.raises(ValueError):
+        SharedCounters(str(file_name), owner=os.getuid())
+
+
+def test_untrusted_file_owner(publisher, monkeypatch):
+    """
+    Test if:
+      - a file owned by another user than root and the configured owner is refused
+      - a file owned by the configured owner is accepted
+    """
+    real_fstat = os.fstat
+
+    def fstat(fd):
+        status = list(real_fstat(fd))
+        status[4] = 12345
+        return os.stat_result(status)
+    with monkeypatch.context() as patch:
+        patch.setattr(os, 'fstat', fstat)
+        with pytest.raises(ValueError):
+            SharedCounters(publisher.file_name, owner=1000)
+        SharedCounters(publisher.file_name, owner=12345).close()
+
+
+def test_file_writable_by_other_users(publisher):
+    os.chmod(publisher.file_name, 0o666)
+    with pytest.raises(ValueError):
+        SharedCounters(publisher.file_name, owner=os.getuid())
+
+
+def test_snapshot_retry_during_update(publisher, monkeypatch):
+    """
+    Test if a reader retries while the sequence number is odd (update in progress) or changed during the read
+    """
+    publisher.sample()
+    counters = SharedCounters(publisher.file_name, owner=os.getuid())
+    sequences = iter([3, 4, 5, 4, 4])
+    real_unpack_from = pyRAPL.shm.SEQUENCE.unpack_from
+
+    class Sequence:
+        @staticmethod
+        def unpack_from(buffer, offset):
+            if offset == pyRAPL.shm.SEQUENCE_OFFSET:
+                return (next(sequences),)
+            return real_unpack_from(buffer, offset)
+    monkeypatch.setattr(pyRAPL.shm, 'SEQUENCE', Sequence)
+    assert counters.snapshot()[1] == (0, 0, 0, 0)
+    assert next(sequences, None) is None
+    counters.close()
+
+
+def test_snapshot_timeout_during_update(publisher, monkeypatch):
+    """
+    Test if a reader stops waiting for a publisher that died during an update (odd sequence number)
+    """
+    publisher.sample()
+    counters = SharedCounters(publisher.file_name, owner=os.getuid())
+    pyRAPL.shm.SEQUENCE.pack_into(publisher._map, pyRAPL.shm.SEQUENCE_OFFSET, 3)
+    monkeypatch.setattr(pyRAPL.shm, 'SNAPSHOT_TIMEOUT', 1000000)
+    with pytest.raises(PyRAPLException):
+        counters.snapshot()
+    counters.close()
+
+
+##########
+# CLIENT #
+##########
+def test_shm_api(publisher):
+    publisher.sample()
+    publisher.sensor.counters = [150, 250, 310, 400]
+    publisher.sample()
+
+    assert ShmPkgAPI(topology=TOPOLOGY).energy() == (50, 10)
+    assert ShmDramAPI(socket_ids=[1], topology=TOPOLOGY).energy() == (-1, 0)
+
+
+def test_shm_api_unpublished_device(publisher):
+    publisher.sample()
+    with pytest.raises(PyRAPLCantInitDeviceAPI):
+        ShmCoreAPI(topology=TOPOLOGY)
+
+
+def test_shm_api_stopped_publisher(publisher, monkeypatch):
+    monkeypatch.setattr(pyRAPL.shm, 'MAX_UPDATE_AGE', -1)
+    publisher.sample()
+    with pytest.raises(PyRAPLCantInitDeviceAPI):
+        ShmPkgAPI(topology=TOPOLOGY)
+
+
+def test_shm_api_publisher_stopped_after_init(publisher, monkeypatch):
+    """
+    Test if reading the energy after the publisher stopped raises an exception instead of returning old values
+    """
+    publisher.sample()
+    device_api = ShmPkgAPI(topology=TOPOLOGY)
+    monkeypatch.setattr(pyRAPL.shm, 'MAX_UPDATE_AGE', -1)
+    with pytest.raises(PyRAPLException):
+        device_api.energy()
+
+
+def test_shm_api_publisher_restarted(publisher, monkeypatch):
+    """
+    Stop the publisher and start a new one publishing in a new file with the same name
+    Test if the device API maps the new file and reads the values of the new publisher
+    """
+    monkeypatch.setattr(pyRAPL.shm, 'MAX_UPDATE_AGE', 50000000)
+    publisher.sample()
+    device_api = ShmPkgAPI(topology=TOPOLOGY)
+    publisher.close()
+
+    time.sleep(0.06)
+    new_publisher = SensorPublisher(publisher.file_name, sensor=FakeSensor(COUNTERS, devices=[Device.PKG, Device.DRAM], max_energy_ranges=[1000, -1, -1, -1]))
+    new_publisher.sample()
+    new_publisher.sensor.counters = [150, 250, 310, 400]
+    new_publisher.sample()
+    try:
+        assert device_api.energy() == (50, 10)
+    finally:
+        new_publisher.close()
+
+
+def test_shm_api_without_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(ShmAPI, 'FILE_NAME', str(tmp_path / 'missing'))
+    with pytest.raises(PyRAPLCantInitDeviceAPI):
+        ShmPkgAPI(topology=TOPOLOGY)
+
+
+def test_sensor_shm_backend(publisher):
+    """
+    Test if:
+      - a sensor reads the published counters with the shm backend
+      - the shm backend is never probed when no backend is given
+    """
+    publisher.sample()
+    sensor = Sensor(devices=[Device.PKG, Device.DRAM], backend='shm', topology=TOPOLOGY)
+    assert {selection.backend for selection in sensor.backends.values()} == {'shm'}
+    assert sensor.energy() == [0, 0, 0, 0]
+    assert not REGISTRY.backend('shm').probed
@@ -0,0 +1,45 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import math
+import statistics
+
+from pyRAPL.stats import RunningStats
+
+
+def test_running_stats():
+    """
+    Test if the mean and the variance are the mean and the sample variance of the recorded values
+    """
+    stats = RunningStats(2)
+    values = [1.0, 4.0, 2.5, 10.0]
+    for value in values:
+        stats.update([value, -1])
+    assert stats.counts == [4, 0]
+    assert math.isclose(stats.mean[0], statistics.mean(values))
+    assert math.isclose(stats.variance[0], statistics.variance(values))
+    assert stats.mean[1] == -1
+    assert stats.variance[1] == -1
+
+
+def test_running_stats_one_value():
+    stats = RunningStats(1)
+    stats.update([3])
+    assert stats.mean == [3]
+    assert stats.variance == [math.inf]
@@ -0,0 +1,96 @@
+# MIT License
+# Copyright (c) 2019, INRIA
+# Copyright (c) 2019, University of Lille
+# All rights reserved.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import json
+
+from pyRAPL.topology import Topology, get_topology, parse_cpu_list
+from tests.utils import SOCKET_0_DIR_NAME, SOCKET_1_DIR_NAME, DRAM_0_DIR_NAME, DRAM_1_DIR_NAME
+from tests.utils import fs_two_socket
+
+BOOT_ID_FILE = '/proc/sys/kernel/random/boot_id'
+
+
+##################
+# CPU LIST PARSE #
+##################
+def test_parse_cpu_list_ranges():
+    assert parse_cpu_list('0-3,8-11') == [0, 1, 2, 3, 8, 9, 10, 11]
+
+
+def test_parse_cpu_list_single_cpu_range_and_newline():
+    assert parse_cpu_list('2,5-5,7\n') == [2, 5, 7]
+
+
+############
+# DISCOVER #
+############
+def test_discover_two_socket(fs_two_socket):
+    """
+    discover the topology of a filesystem containing package and dram zones on two sockets and a psys zone
+    Test if:
+      - each cpu is associated to its socket
+      - the package and dram zones of each socket are indexed
+      - the psys zone is not associated to a socket
+    """
+    fs_two_socket.create_file('/sys/class/powercap/intel-rapl/intel-rapl:2/name', contents='psys\n')
+    topology = Topology.discover()
+
+    assert topology.cpus == {0: 0, 1: 1}
+    assert topology.socket_ids() == [0, 1]
+    assert topology.socket_cpus() == {0: [0], 1: [1]}
+    assert topology.zones == {0: {'package': SOCKET_0_DIR_NAME, 'dram': DRAM_0_DIR_NAME},
+                              1: {'package': SOCKET_1_DIR_NAME, 'dram': DRAM_1_DIR_NAME}}
+    assert topology.zone(1, 'dram') == DRAM_1_DIR_NAME
+    assert topology.zone(1, 'core') is None
+    assert topology.platform_zones == {'psys': '/sys/class/powercap/intel-rapl/intel-rapl:2'}
+
+
+#########
+# CACHE #
+#########
+def test_cache_saved_and_loaded_during_same_boot(fs_two_socket):
+    """
+    get the topology with a cache file, then remove a zone from the filesystem and get the topology again
+    Test if:
+      - the cache file is created
+      - the second topology is loaded from the cache file (the removed zone is still in the topology)
+    """
+    fs_two_socket.create_file(BOOT_ID_FILE, contents='boot-1\n')
+    topology = get_topology('/tmp/topology.json')
+    assert json.load(open('/tmp/topology.json'))['boot_id'] == 'boot-1'
+
+    fs_two_socket.remove_object(DRAM_1_DIR_NAME + '/name')
+    assert get_topology('/tmp/topology.json') == topology
+
+
+def test_cache_discarded_after_reboot(fs_two_socket):
+    """
+    get the topology with a cache file, then change the boot id and remove a zone from the filesystem
+    Test if:
+      - the topology is discovered again (the removed zone isn't in the topology)
+    """
+    fs_two_socket.create_file(BOOT_ID_FILE, contents='boot-1\n')
+    get_topology('/tmp/topology.json')
+
+    fs_two_socket.remove_object(BOOT_ID_FILE)
+    fs_two_socket.create_file(BOOT_ID_FILE, contents='boot-2\n')
+    fs_two_socket.remove_object(DRAM_1_DIR_NAME + '/name')
+    topology = get_topology('/tmp/topology.json')
+    assert topology.boot_id == 'boot-2'
+    assert topology.zone(1, 'dram') is None
@@ -19,7 +19,12 @@
 # SOFTWARE.
 
 from pyRAPL import Device
+from pyRAPL.outputs import Output
+from pyRAPL.sensor import Sensor, SubstractableList
 import os
+import struct
+import threading
+import time
 import pytest
 # import pyfakefs
 
@@ -40,6 +45,81 @@ DRAM_1_FILE_NAME = DRAM_1_DIR_NAME + '/energy_uj'
 DRAM_1_VALUE = 9876
 
 
+# value of the MSR_RAPL_POWER_UNIT register : energy status unit = 1/2^14 J = 61.03515625 uJ
+MSR_POWER_UNIT_VALUE = 0xa0e03
+MSR_ENERGY_UNIT = 1000000 / 2 ** 14
+MSR_PKG_0_VALUE = 1000
+MSR_PKG_1_VALUE = 2000
+MSR_DRAM_0_VALUE = 3000
+MSR_DRAM_1_VALUE = 4000
+
+
+class FakeSensor:
+    """
+    Sensor returning the values of the ``counters`` list, in the sensor layout of the monitored ``devices`` (one value
+    by device for each socket, -1 for the unmonitored values)
+
+    Each read adds ``increment`` micro Joules to the monitored counters. If ``power`` isn't 0, the returned values also
+    grow by ``power`` micro Joules per micro second of ``time.perf_counter_ns``. The number of reads and the name of
+    the thread of each read are recorded
+
+    :param counters: initial values of the counters
+    :param devices: monitored devices
+    :param max_energy_ranges: range of each counter, if None, the counters don't wrap around
+    :param increment: energy added to the monitored counters by each read
+    :param power: growth of the returned values with the time
+    """
+
+    def __init__(self, counters, devices=(Device.PKG,), max_energy_ranges=None, increment=0, power=0):
+        self.counters = list(counters)
+        self.devices = list(devices)
+        self.max_energy_ranges = max_energy_ranges
+        self.increment = increment
+        self.power = power
+        self.reads = 0
+        self.read_threads = []
+
+    def energy(self):
+        self.reads += 1
+        self.read_threads.append(threading.current_thread().name)
+        if self.increment:
+            self.counters = [value + self.increment if value >= 0 else value for value in self.counters]
+        values = self.counters
+        if self.power:
+            energy = time.perf_counter_ns() / 1000 * self.power
+            values = [value + energy if value >= 0 else value for value in values]
+        return SubstractableList(values, self.max_energy_ranges)
+
+    snapshot = Sensor.snapshot
+
+    def per_device(self, values):
+        return {device: values[i::len(self.devices)] for i, device in enumerate(self.devices)}
+
+
+class ListOutput(Output):
+    """
+    Output storing the added results in the ``results`` list and the name of the thread of each add
+    """
+
+    def __init__(self):
+        Output.__init__(self)
+        self.results = []
+        self.threads = []
+
+    def add(self, result):
+        self.threads.append(threading.current_thread().name)
+        self.results.append(result)
+
+
+def write_msr(msr_file_name, msr, value):
+    """
+    write the value of a register in a fake msr file
+    """
+    with open(msr_file_name, 'r+b') as msr_file:
+        msr_file.seek(msr)
+        msr_file.write(struct.pack('<Q', value))
+
+
 def write_new_energy_value(val, device, socket_id):
     file_names = {
         Device.PKG: [PKG_0_FILE_NAME, PKG_1_FILE_NAME],
@@ -116,4 +196,135 @@ def fs_one_socket_no_dram(fs):
     fs.create_file(PKG_0_FILE_NAME, contents=str(PKG_0_VALUE) + '\n')
 
     fs.create_file(SOCKET_0_DIR_NAME + '/intel-rapl:0:0' + '/name', contents='gpu\n')
-    fs.create_file(SOCKET_0_DIR_NAME + '/intel-rapl:0:1' + '/name', contents='sys\n')
\ No newline at end of file
+    fs.create_file(SOCKET_0_DIR_NAME + '/intel-rapl:0:1' + '/name', contents='sys\n')
+
+@pytest.fixture
+def msr_two_socket(tmp_path, monkeypatch):
+    """
+    create a fake msr file tree (in a real temporary directory) for a machine with two sockets of two cpus each
+    the msr files of the first cpu of each socket contain energy status registers for package and dram
+
+    :return: template of the msr file names
+    """
+    import pyRAPL.device_api
+    import pyRAPL.sensor
+    from pyRAPL.device_api import MsrAPI, MSR_RAPL_POWER_UNIT, MSR_PKG_ENERGY_STATUS, MSR_DRAM_ENERGY_STATUS
+    from pyRAPL.topology import Topology
+
+    values = {0: (MSR_PKG_0_VALUE, MSR_DRAM_0_VALUE), 2: (MSR_PKG_1_VALUE, MSR_DRAM_1_VALUE)}
+    for cpu_id in range(4):
+        os.makedirs(str(tmp_path / str(cpu_id)))
+        msr_file_name = str(tmp_path / str(cpu_id) / 'msr')
+        with open(msr_file_name, 'wb') as msr_file:
+            msr_file.write(bytes(0x1000))
+        if cpu_id in values:
+            write_msr(msr_file_name, MSR_RAPL_POWER_UNIT, MSR_POWER_UNIT_VALUE)
+            write_msr(msr_file_name, MSR_PKG_ENERGY_STATUS, values[cpu_id][0])
+            write_msr(msr_file_name, MSR_DRAM_ENERGY_STATUS, values[cpu_id][1])
+
+    msr_file_template = str(tmp_path) + '/{}/msr'
+    topology = Topology(cpus={0: 0, 1: 0, 2: 1, 3: 1})
+    monkeypatch.setattr(pyRAPL.device_api, 'get_topology', lambda: topology)
+    monkeypatch.setattr(pyRAPL.sensor, 'get_topology', lambda: topology)
+    monkeypatch.setattr(MsrAPI, 'MSR_FILE_NAME', msr_file_template)
+    # client cpu (Skylake) : every register uses the unit of the power unit register
+    cpuinfo_file_name = str(tmp_path / 'cpuinfo')
+    write_cpuinfo(cpuinfo_file_name, 'GenuineIntel', 6, 0x5e)
+    monkeypatch.setattr(pyRAPL.device_api, 'CPUINFO_FILE_NAME', cpuinfo_file_name)
+    return msr_file_template
+
+
+def write_cpuinfo(file_name, vendor, family, model):
+    """
+    write a cpuinfo file describing two cpus of the given model
+    """
+    with open(file_name, 'w') as cpuinfo_file:
+        for cpu_id in range(2):
+            cpuinfo_file.write('processor\t: ' + str(cpu_id) + '\nvendor_id\t: ' + vendor + '\ncpu family\t: ' +
+                               str(family) + '\nmodel\t\t: ' + str(model) + '\n\n')
+
+
+CORE_0_VALUE = 1111
+UNCORE_0_VALUE = 2222
+PSYS_VALUE = 33333
+
+
+@pytest.fixture
+def fs_one_socket_all_domains(fs):
+    """
+    create a file system containing energy metric for package, dram, core and uncore on one socket and for psys
+    """
+    fs.create_file('/sys/devices/system/cpu/present', contents='0')
+    fs.create_file('/sys/devices/system/cpu/cpu0/topology/physical_package_id', contents='0')
+
+    fs.create_file(SOCKET_0_DIR_NAME + '/name', contents='package-0\n')
+    fs.create_file(PKG_0_FILE_NAME, contents=str(PKG_0_VALUE) + '\n')
+
+    fs.create_file(SOCKET_0_DIR_NAME + '/intel-rapl:0:0/name', contents='core\n')
+    fs.create_file(SOCKET_0_DIR_NAME + '/intel-rapl:0:0/energy_uj', contents=str(CORE_0_VALUE) + '\n')
+    fs.create_file(SOCKET_0_DIR_NAME + '/intel-rapl:0:1/name', contents='uncore\n')
+    fs.create_file(SOCKET_0_DIR_NAME + '/intel-rapl:0:1/energy_uj', contents=str(UNCORE_0_VALUE) + '\n')
+    fs.create_file(SOCKET_0_DIR_NAME + '/intel-rapl:0:2/name', contents='dram\n')
+    fs.create_file(SOCKET_0_DIR_NAME + '/intel-rapl:0:2/energy_uj', contents=str(DRAM_0_VALUE) + '\n')
+
+    fs.create_file('/sys/class/powercap/intel-rapl/intel-rapl:1/name', contents='psys\n')
+    fs.create_file('/sys/class/powercap/intel-rapl/intel-rapl:1/energy_uj', contents=str(PSYS_VALUE) + '\n')
+    return fs
+
+
+AMD_SOCKET_0_VALUE = 100000
+AMD_SOCKET_1_VALUE = 200000
+AMD_CORE_VALUES = [1000, 1001, 1002, 1003]
+AMD_HWMON_DIR_NAME = '/sys/class/hwmon/hwmon3'
+
+
+@pytest.fixture
+def fs_amd_energy(fs):
+    """
+    create a file system without powercap zones but with amd_energy hwmon counters for a machine with two sockets of
+    two cores each
+    """
+    fs.create_file('/sys/devices/system/cpu/present', contents='0-3')
+    for cpu_id in range(4):
+        fs.create_file('/sys/devices/system/cpu/cpu' + str(cpu_id) + '/topology/physical_package_id',
+                       contents=str(cpu_id // 2))
+        fs.create_file('/sys/devices/system/cpu/cpu' + str(cpu_id) + '/topology/core_id', contents=str(cpu_id % 2))
+
+    fs.create_file('/sys/class/hwmon/hwmon0/name', contents='k10temp\n')
+    fs.create_file(AMD_HWMON_DIR_NAME + '/name', contents='amd_energy\n')
+    for core_id in range(4):
+        fs.create_file(AMD_HWMON_DIR_NAME + '/energy' + str(core_id + 1) + '_label', contents='Ecore00' + str(core_id))
+        fs.create_file(AMD_HWMON_DIR_NAME + '/energy' + str(core_id + 1) + '_input',
+                       contents=str(AMD_CORE_VALUES[core_id]) + '\n')
+    fs.create_file(AMD_HWMON_DIR_NAME + '/energy5_label', contents='Esocket0\n')
+    fs.create_file(AMD_HWMON_DIR_NAME + '/energy5_input', contents=str(AMD_SOCKET_0_VALUE) + '\n')
+    fs.create_file(AMD_HWMON_DIR_NAME + '/energy6_label', contents='Esocket1\n')
+    fs.create_file(AMD_HWMON_DIR_NAME + '/energy6_input', contents=str(AMD_SOCKET_1_VALUE) + '\n')
+    return fs
+
+
+@pytest.fixture
+def amd_msr_two_socket(msr_two_socket, monkeypatch):
+    """
+    add AMD RAPL registers to the fake msr file tree of ``msr_two_socket``
+    package registers contains the package values of ``msr_two_socket``, core registers contains the cpu id + 10
+
+    AMD registers addresses are contiguous and can't be stored in a flat file, so the registers values are stored in a
+    dictionary indexed by msr file name and register address
+    """
+    from pyRAPL.device_api import MsrAPI, MSR_AMD_RAPL_POWER_UNIT, MSR_AMD_PKG_ENERGY_STATUS
+    from pyRAPL.device_api import MSR_AMD_CORE_ENERGY_STATUS
+
+    registers = {}
+    for cpu_id in range(4):
+        msr_file_name = os.path.realpath(msr_two_socket.format(cpu_id))
+        registers[(msr_file_name, MSR_AMD_RAPL_POWER_UNIT)] = MSR_POWER_UNIT_VALUE
+        registers[(msr_file_name, MSR_AMD_CORE_ENERGY_STATUS)] = cpu_id + 10
+    registers[(os.path.realpath(msr_two_socket.format(0)), MSR_AMD_PKG_ENERGY_STATUS)] = MSR_PKG_0_VALUE
+    registers[(os.path.realpath(msr_two_socket.format(2)), MSR_AMD_PKG_ENERGY_STATUS)] = MSR_PKG_1_VALUE
+
+    def read_msr(fd, msr):
+        return registers[(os.readlink('/proc/self/fd/' + str(fd)), msr)]
+
+    monkeypatch.setattr(MsrAPI, '_read_msr', staticmethod(read_msr))
+    return msr_two_socket